@@ -0,0 +1,106 @@
+# benchmarks/bench_deletes.py
+"""
+Statements and time to delete a user with many listings, each favorited
+and swiped by many users, two ways:
+
+- orm: what the old ORM cascade did, every child row loaded into the
+  session and deleted one by one.
+- cascade: app.deletion.delete_users, which leaves the child rows to the
+  database's ON DELETE CASCADE.
+
+Uses a fresh SQLite file database per run.
+
+Run from the repository root:
+    python benchmarks/bench_deletes.py [pets ...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from app import create_app, deletion  # noqa: E402
+from app.db import db  # noqa: E402
+from app.models import Favorite, Pet, Swipe, User  # noqa: E402
+
+FANS = 50
+
+
+def populate(pets: int):
+    """
+    One owner with `pets` listings; FANS users favorite and swipe each one.
+    Returns the owner id.
+    """
+    db.session.execute(User.__table__.insert(), [
+        {"id": i, "username": f"user{i}", "password_hash": "x"} for i in range(1, FANS + 2)
+    ])
+    db.session.execute(Pet.__table__.insert(), [
+        {"id": i, "name": f"Pet {i}", "species": "Dog", "breed": "Mixed", "age": "1 year",
+         "gender": "Male", "location": "Baku", "description": "x",
+         "image": "https://example.com/p.jpg", "owner_id": 1}
+        for i in range(1, pets + 1)
+    ])
+    pairs = [{"user_id": u, "pet_id": p} for p in range(1, pets + 1) for u in range(2, FANS + 2)]
+    db.session.execute(Favorite.__table__.insert(), pairs)
+    db.session.execute(Swipe.__table__.insert(), [dict(pair, liked=True) for pair in pairs])
+    db.session.commit()
+    return 1
+
+
+def orm_delete(user_id: int):
+    user = db.session.get(User, user_id)
+    for pet in user.pets:
+        for child in pet.favorited_by + pet.swiped_by:
+            db.session.delete(child)
+        db.session.delete(pet)
+    for child in user.favorites + user.swipes:
+        db.session.delete(child)
+    db.session.delete(user)
+    db.session.commit()
+
+
+def cascade_delete(user_id: int):
+    deletion.delete_users([user_id])
+    db.session.commit()
+
+
+def measure(pets: int, delete):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp}/bench.db"})
+        with app.app_context():
+            db.create_all()
+            user_id = populate(pets)
+            rows = (Pet.query.count() + Favorite.query.count() + Swipe.query.count())
+            db.session.remove()
+
+            statements = []
+
+            def count(*args):
+                statements.append(1)
+
+            event.listen(db.engine, "before_cursor_execute", count)
+            start = time.perf_counter()
+            delete(user_id)
+            seconds = time.perf_counter() - start
+            event.remove(db.engine, "before_cursor_execute", count)
+
+            assert Favorite.query.count() == Swipe.query.count() == 0
+            db.session.remove()
+            db.engine.dispose()
+    return rows, len(statements), seconds
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10, 100, 1000]
+    print(f"{'pets':>6} {'child rows':>10} {'orm stmts':>10} {'orm s':>7} {'cascade stmts':>14} {'cascade s':>10}")
+    for pets in sizes:
+        rows, orm_stmts, orm_s = measure(pets, orm_delete)
+        _, cascade_stmts, cascade_s = measure(pets, cascade_delete)
+        print(f"{pets:>6} {rows:>10} {orm_stmts:>10} {orm_s:>7.2f} {cascade_stmts:>14} {cascade_s:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# benchmarks/bench_import.py
+"""
+Throughput of the bulk catalog importer (app/importer.py) on a synthetic
+shelter feed, loaded into a fresh SQLite file database.
+
+Each size is imported twice: the first run inserts everything, the second
+is the same feed again and should only find duplicates.
+
+Run from the repository root:
+    python benchmarks/bench_import.py [rows ...]
+"""
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from app import create_app, importer  # noqa: E402
+from app.db import db  # noqa: E402
+
+SPECIES = ("Dog", "Cat", "Rabbit", "Bird")
+AGES = ("Puppy", "1 year", "2 years", "5 years", "Senior")
+CITIES = ("Baku", "Ganja", "Sumqayit", "Tbilisi", "Istanbul", "Somewhere else")
+
+
+def synthetic_feed(rows: int, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(importer.REQUIRED + ("home_type",))
+    for i in range(rows):
+        writer.writerow([
+            f"feed-{i}", f"Pet {i}", rng.choice(SPECIES), "Mixed", rng.choice(AGES),
+            rng.choice(("Male", "Female")), rng.choice(CITIES),
+            "Friendly and vaccinated.", f"https://shelter.example/img/{i}.jpg",
+            rng.choice(("Apartment", "House with yard", "")),
+        ])
+    return out.getvalue().encode()
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000]
+    print(f"{'rows':>8} {'MB':>6} {'import s':>9} {'rows/s':>9} {'re-run s':>9} {'dupes':>8}")
+    for rows in sizes:
+        feed = synthetic_feed(rows)
+        with tempfile.TemporaryDirectory() as tmp:
+            app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp}/bench.db"})
+            with app.app_context():
+                db.create_all()
+                start = time.perf_counter()
+                first = importer.import_pets(io.BytesIO(feed), "csv").as_dict()
+                import_s = time.perf_counter() - start
+
+                start = time.perf_counter()
+                again = importer.import_pets(io.BytesIO(feed), "csv").as_dict()
+                rerun_s = time.perf_counter() - start
+                db.session.remove()
+                db.engine.dispose()
+        assert first["inserted"] == rows, first["errors"][:5]
+        print(
+            f"{rows:>8} {len(feed) / 2**20:>6.1f} {import_s:>9.2f} {rows / import_s:>9,.0f}"
+            f" {rerun_s:>9.2f} {again['duplicates']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# benchmarks/bench_quiz_scoring.py
+"""
+Latency of the quiz scoring engine (app/matching.py) on synthetic catalogs:
+building the result table, a precomputed lookup (results) and the refresh
+cost of one new listing.
+
+Run from the repository root:
+    python benchmarks/bench_quiz_scoring.py
+"""
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from app.matching import TRAITS, MatchIndex  # noqa: E402
+
+
+def build(n, seed=0):
+    rng = np.random.default_rng(seed)
+    values = [[None] + options for options in TRAITS.values()]
+    index = MatchIndex()
+    start = time.perf_counter()
+    index.load(
+        (i, *[vals[rng.integers(len(vals))] for vals in values])
+        for i in range(1, n + 1)
+    )
+    return index, time.perf_counter() - start
+
+
+def main():
+    answers = {
+        "home_type": "apartment",
+        "activity_level": "medium",
+        "experience": "beginner",
+        "time_commitment": "low",
+        "family_situation": "small_children",
+    }
+    print(f"{'pets':>9} {'build s':>9} {'p50 us':>8} {'p99 us':>8} {'insert ms':>10}")
+    for n in (1_000, 10_000, 100_000, 1_000_000):
+        index, build_s = build(n)
+        timings = []
+        for _ in range(1000):
+            start = time.perf_counter()
+            index.results(answers)
+            timings.append((time.perf_counter() - start) * 1_000_000)
+        timings.sort()
+        p99 = timings[int(len(timings) * 0.99) - 1]
+
+        rng = np.random.default_rng(n)
+        start = time.perf_counter()
+        for i in range(100):
+            codes = np.array([rng.integers(len(o) + 1) for o in TRAITS.values()], dtype=np.int8)
+            index.upsert(n + 1 + i, codes)
+        insert_ms = (time.perf_counter() - start) * 10
+
+        print(
+            f"{n:>9} {build_s:>9.2f} {statistics.median(timings):>8.2f} {p99:>8.2f}"
+            f" {insert_ms:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
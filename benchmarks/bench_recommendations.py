@@ -0,0 +1,111 @@
+# benchmarks/bench_recommendations.py
+"""
+Build time, memory, lookup latency and offline quality of the co-favorite
+recommender (app/recommend.py) on synthetic favorites.
+
+Users have one or two favorite "kinds" of pet (think species + size) and
+pick most favorites from those, the rest from the whole catalog; either way
+popular pets are picked more often. That leaves real co-favorite signal to
+find on top of plain popularity. Quality is the leave-last-out hit rate@10,
+next to the popularity baseline.
+
+Run from the repository root:
+    python benchmarks/bench_recommendations.py [favorites ...]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from app.recommend import CoFavoriteIndex, evaluate  # noqa: E402
+
+PETS_PER_FAVORITE = 0.05
+USERS_PER_FAVORITE = 0.1
+CLUSTERS = 400
+IN_CLUSTER = 0.8
+
+
+def synthetic_favorites(total, seed=0):
+    """
+    (user_ids, pet_ids) grouped by user, most recent first, about `total` rows.
+    """
+    rng = np.random.default_rng(seed)
+    pets = max(100, int(total * PETS_PER_FAVORITE))
+    # draw three times the users, then cut back to `total` rows once repeated
+    # (user, pet) draws are dropped
+    users = max(10, int(total * USERS_PER_FAVORITE)) * 3
+
+    cluster_of = rng.integers(CLUSTERS, size=pets)
+    members = [np.flatnonzero(cluster_of == c) for c in range(CLUSTERS)]
+    popularity = rng.zipf(1.6, size=pets).astype(np.float64)
+    popularity /= popularity.sum()
+
+    per_user = rng.geometric(users / 3 / total, size=users)
+    user_ids = np.repeat(np.arange(1, users + 1), per_user)
+    n = len(user_ids)
+
+    # each user's favorite clusters; one in three users has two
+    first = rng.integers(CLUSTERS, size=users + 1)
+    second = np.where(rng.random(users + 1) < 1 / 3, rng.integers(CLUSTERS, size=users + 1), first)
+    use_second = rng.random(n) < 0.5
+    clusters = np.where(use_second, second[user_ids], first[user_ids])
+
+    pet_ids = rng.choice(pets, size=n, p=popularity)
+    in_cluster = rng.random(n) < IN_CLUSTER
+    for c in np.unique(clusters[in_cluster]):
+        rows = np.flatnonzero(in_cluster & (clusters == c))
+        if len(members[c]):
+            weights = popularity[members[c]] / popularity[members[c]].sum()
+            pet_ids[rows] = rng.choice(members[c], size=len(rows), p=weights)
+    pet_ids += 1
+
+    # one row per (user, pet), in a random "recency" order inside each user
+    keys = user_ids * (pets + 1) + pet_ids
+    _, first_seen = np.unique(keys, return_index=True)
+    rows = first_seen[np.argsort(rng.random(len(first_seen)))]
+    rows = rows[np.argsort(user_ids[rows], kind="stable")]
+    rows = rows[:total]
+    return user_ids[rows], pet_ids[rows]
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    print(
+        f"{'favorites':>10} {'gen s':>6} {'build s':>8} {'MB':>6} {'pairs':>11}"
+        f" {'lookup ms':>9} {'record ms':>9} {'hit@10':>7} {'popular':>7} {'coverage':>8}"
+    )
+    for total in sizes:
+        start = time.perf_counter()
+        user_ids, pet_ids = synthetic_favorites(total)
+        gen_s = time.perf_counter() - start
+
+        index = CoFavoriteIndex()
+        index.build(user_ids, pet_ids)
+        stats = index.stats
+
+        sample = np.unique(user_ids)[:2000]
+        start = time.perf_counter()
+        for user in sample:
+            index.for_user(int(user), 10)
+        lookup_ms = (time.perf_counter() - start) / len(sample) * 1000
+
+        rng = np.random.default_rng(1)
+        start = time.perf_counter()
+        for _ in range(1000):
+            index.record(int(rng.choice(sample)), int(rng.integers(1, stats["pets"])), True)
+        record_ms = time.perf_counter() - start  # 1000 records, so ms each
+
+        quality = evaluate(user_ids, pet_ids, k=10, sample=2000)
+        print(
+            f"{stats['favorites']:>10} {gen_s:>6.1f} {stats['build_s']:>8.2f}"
+            f" {stats['bytes'] / 2**20:>6.1f} {stats['pairs']:>11}"
+            f" {lookup_ms:>9.2f} {record_ms:>9.3f} {quality['hit_rate']:>7.3f}"
+            f" {quality['popular_hit_rate']:>7.3f} {quality['coverage']:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
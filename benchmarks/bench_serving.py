@@ -0,0 +1,168 @@
+# benchmarks/bench_serving.py
+"""
+Cold start and throughput of the two ways the app has been served:
+
+- dev: the old `python run.py` (create_all on boot, then the Flask
+  development server with the debugger and reloader).
+- gunicorn: `gunicorn -c gunicorn.conf.py wsgi:app` (preloaded app,
+  forked workers, tables created beforehand by `flask create-tables`).
+
+Cold start is the time from launching the server to its first 200 on
+/livez; for gunicorn the one-shot create-tables run is timed separately. Throughput is measured with CLIENTS keep-alive clients hitting
+each path for SECONDS seconds. Uses a SQLite file database with a few
+hundred listings.
+
+Run from the repository root:
+    python benchmarks/bench_serving.py [seconds]
+"""
+import http.client
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, SRC)
+
+from app import create_app  # noqa: E402
+from app.db import db  # noqa: E402
+from app.models import Pet, User  # noqa: E402
+
+CLIENTS = 8
+PATHS = ("/livez", "/", "/pets?page=2", "/pets/search?q=dog")
+
+# what run.py did before wsgi.py / gunicorn.conf.py
+DEV_SERVER = """
+import sys
+from app import create_app
+from app.db import db
+app = create_app()
+with app.app_context():
+    db.create_all()
+app.run(host="127.0.0.1", port=int(sys.argv[1]), debug=True)
+"""
+
+
+def populate(url: str, pets: int = 300):
+    app = create_app({"SQLALCHEMY_DATABASE_URI": url})
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(id=1, username="owner", password_hash="x"))
+        db.session.flush()
+        db.session.execute(Pet.__table__.insert(), [
+            {"name": f"Pet {i}", "species": ("Dog", "Cat")[i % 2], "breed": "Mixed",
+             "age": "1 year", "gender": "Male", "location": "Baku", "description": "x",
+             "image": "https://example.com/p.jpg", "owner_id": 1}
+            for i in range(pets)
+        ])
+        db.session.commit()
+        db.engine.dispose()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port: int, proc, limit: float = 60.0):
+    deadline = time.perf_counter() + limit
+    while time.perf_counter() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/livez")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError("server did not start")
+
+
+def load(port: int, path: str, seconds: float):
+    """
+    (requests per second, p50 ms, p99 ms, errors) over `seconds`.
+    """
+    latencies, errors = [], []
+    stop = time.perf_counter() + seconds
+
+    def client():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        mine = []
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            try:
+                conn.request("GET", path)
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    errors.append(response.status)
+            except OSError as e:
+                errors.append(e)
+                conn.close()
+                continue
+            mine.append(time.perf_counter() - start)
+        latencies.extend(mine)
+
+    threads = [threading.Thread(target=client) for _ in range(CLIENTS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    latencies.sort()
+    n = len(latencies)
+    return (n / seconds, latencies[n // 2] * 1000 if n else 0,
+            latencies[min(n - 1, int(n * 0.99))] * 1000 if n else 0, len(errors))
+
+
+def create_tables(env: dict) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "flask", "--app", "wsgi", "create-tables"],
+                   cwd=SRC, env=env, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def serve(mode: str, env: dict, port: int):
+    if mode == "dev":
+        args = [sys.executable, "-c", DEV_SERVER, str(port)]
+    else:
+        args = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"]
+    return subprocess.Popen(args, cwd=SRC, env=dict(env, PORT=str(port)),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            start_new_session=True)
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{tmp}/bench.db"
+        populate(url)
+        env = dict(os.environ, DATABASE_URL=url, SECRET_KEY="bench", METRICS_DIR=f"{tmp}/metrics",
+                   PROFILE_DIR=f"{tmp}/profiles")
+        print(f"{os.cpu_count()} CPUs, {CLIENTS} clients, {seconds:g}s per path")
+        print(f"create-tables (one-shot, before gunicorn): {create_tables(env):.2f}s")
+        print(f"{'server':<9} {'cold start s':>12} {'path':<20} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6}")
+        for mode in ("dev", "gunicorn"):
+            port = free_port()
+            start = time.perf_counter()
+            proc = serve(mode, env, port)
+            try:
+                wait_ready(port, proc)
+                cold = time.perf_counter() - start
+                for path in PATHS:
+                    rps, p50, p99, errors = load(port, path, seconds)
+                    print(f"{mode:<9} {cold:>12.2f} {path:<20} {rps:>8.0f} {p50:>8.1f} {p99:>8.1f} {errors:>6}")
+            finally:
+                # the reloader and gunicorn both leave child processes
+                os.killpg(proc.pid, signal.SIGTERM)
+                proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,14 +9,13 @@ def create_app(test_config=None):
 
     template_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), 'templates'))
     static_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), 'static'))
-    
-    print(f"📁 Template directory: {template_dir}")
-    print(f"📁 Static directory: {static_dir}")
-    
-    if not os.path.exists(template_dir):
-        print(f"❌ Template directory not found: {template_dir}")
-        os.makedirs(template_dir, exist_ok=True)
-        print("✅ Created templates directory")
+
+    # STARTUP_LOG=on prints directories and routes while booting
+    startup_log = str((test_config or {}).get("STARTUP_LOG", os.getenv("STARTUP_LOG", "off"))).lower()
+    startup_log = startup_log in ("1", "on", "true", "yes")
+    if startup_log:
+        print(f"📁 Template directory: {template_dir}")
+        print(f"📁 Static directory: {static_dir}")
 
     flask_app = Flask(__name__, 
                      template_folder=template_dir,
@@ -29,13 +28,67 @@ def create_app(test_config=None):
     # DB - pass test_config if provided
     from .db import init_db
     init_db(flask_app, test_config)
-    import cloudinary
-    cloudinary.config(
-        cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-        api_key=os.getenv("CLOUDINARY_API_KEY"),
-        api_secret=os.getenv("CLOUDINARY_API_SECRET"),
-        secure=True
-    )
+
+    # request / database / upload metrics, first so they time everything
+    from . import metrics
+    metrics.init_app(flask_app)
+
+    # per-statement timings grouped by fingerprint, plans of slow ones (/admin/queries)
+    from . import querylog
+    querylog.init_app(flask_app)
+
+    # on-demand sampling profiler (signed header or /admin/profiles)
+    from . import profiler
+    profiler.init_app(flask_app)
+
+    # response cache for hot catalog reads
+    from .cache import init_cache
+    init_cache(flask_app)
+
+    # search indexes are created alongside the pets table
+    from . import search
+    search.init_app(flask_app)
+
+    # geocode listings from their location text at write time
+    from . import geo
+    geo.init_app(flask_app)
+
+    # in-memory trait matrix behind /quiz/results
+    from . import matching
+    matching.init_app(flask_app)
+
+    # co-favorite "also liked" recommendations
+    from . import recommend
+    recommend.init_app(flask_app)
+
+    # daily counters behind the admin charts
+    from . import daily_stats
+    daily_stats.init_app(flask_app)
+
+    # dashboard counters and per-day active users
+    from . import counters
+    counters.init_app(flask_app)
+
+    # bulk CSV/JSONL catalog imports and their image fetch queue
+    from . import importer
+    importer.init_app(flask_app)
+
+    # image storage backend and the background upload queue
+    from . import image_queue, storage
+    storage.init_app(flask_app)
+    image_queue.init_app(flask_app)
+
+    # sized renditions of pet photos and the pet_image template helper
+    from . import images
+    images.init_app(flask_app)
+
+    # fingerprinted, precompressed static files (`flask build-assets`)
+    from . import assets
+    assets.init_app(flask_app)
+
+    # cloudinary is imported and configured on first upload (app/uploads.py,
+    # through the cloudinary storage backend in app/storage.py)
+
     # blueprints
     from .routes.auth import bp as auth_bp
     from .routes.pets import bp as pets_bp
@@ -48,8 +101,9 @@ def create_app(test_config=None):
     flask_app.register_blueprint(quiz_bp)
     flask_app.register_blueprint(system_bp)
 
-    print("🔗 Registered routes:")
-    for r in flask_app.url_map.iter_rules():
-        print(" ", r)
+    if startup_log:
+        print("🔗 Registered routes:")
+        for r in flask_app.url_map.iter_rules():
+            print(" ", r)
 
     return flask_app
\ No newline at end of file
@@ -0,0 +1,260 @@
+# app/assets.py
+import base64
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import urllib.request
+
+import click
+from flask import current_app, redirect, request, send_from_directory
+from markupsafe import Markup
+
+# fingerprinted files never change, so browsers may keep them for a year
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# text assets get .gz / .br siblings; images are compressed already
+COMPRESSIBLE = (".css", ".js", ".svg", ".json", ".txt", ".map")
+MANIFEST = "manifest.json"
+# /static/<BUILD_PREFIX><name>.<hash>.<ext> are served from the build dir
+BUILD_PREFIX = "dist/"
+
+# third-party scripts, committed under static/vendor/: name -> (url of the
+# release file, its sha256). `flask build-assets` downloads any that went
+# missing, and writes a download only when it matches the sha256.
+VENDOR = {
+    "vendor/jquery-3.7.1.min.js": (
+        "https://code.jquery.com/jquery-3.7.1.min.js",
+        "fc9a93dd241f6b045cbff0481cf4e1901becd0e12fb45166a8f17f95823f0b1a",
+    ),
+    "vendor/dataTables-1.13.1.min.js": (
+        "https://cdn.datatables.net/1.13.1/js/jquery.dataTables.min.js",
+        "6f830166d5fb7244d69ff70d5503c15611f407f9d664e8b1c62926bc5652ac96",
+    ),
+    "vendor/chart-4.5.1.umd.min.js": (
+        "https://cdn.jsdelivr.net/npm/chart.js@4.5.1/dist/chart.umd.min.js",
+        "84d0e233daba702b8f77d669d8c137cad36d441a10f200b6f2d3ab553bdfcf6b",
+    ),
+}
+
+
+def fingerprinted_name(name: str, data: bytes) -> str:
+    """
+    style.css -> style.<first 12 hex of sha256>.css
+    """
+    root, ext = os.path.splitext(name)
+    return f"{root}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+
+def _sha256(path: str):
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def vendor_integrity(name: str) -> Markup:
+    """
+    integrity/crossorigin attributes for a VENDOR file, so the browser
+    rejects anything else, wherever it was served from.
+    """
+    digest = base64.b64encode(bytes.fromhex(VENDOR[name][1])).decode()
+    return Markup(f' integrity="sha256-{digest}" crossorigin="anonymous"')
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def fetch_vendor(static_dir: str) -> list:
+    """
+    Download the VENDOR scripts that are missing from static/vendor/ (or no
+    longer match their sha256). Returns the names that could not be fetched.
+    """
+    missing = []
+    for name, (url, sha256) in VENDOR.items():
+        path = os.path.join(static_dir, name)
+        current = _sha256(path)
+        if current == sha256:
+            continue
+        if current is not None:
+            # changed since it was committed: never serve it
+            os.remove(path)
+        try:
+            with urllib.request.urlopen(url, timeout=30) as response:
+                data = response.read()
+        except Exception as e:
+            print(f"Vendor fetch error ({name}): {e}")
+            missing.append(name)
+            continue
+        if hashlib.sha256(data).hexdigest() != sha256:
+            print(f"Vendor fetch error ({name}): sha256 does not match the pinned one")
+            missing.append(name)
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+    return missing
+
+
+def build(static_dir: str, build_dir: str) -> dict:
+    """
+    Copy every static file to build_dir under its fingerprinted name, with
+    .gz and .br (when the brotli package is installed) next to the text
+    ones, and write the manifest: {"style.css": "style.<hash>.css", ...}.
+
+    Files from a previous build that are no longer referenced are removed.
+    """
+    brotli = _brotli()
+    manifest = {}
+    written = {MANIFEST}
+    os.makedirs(build_dir, exist_ok=True)
+    build_real = os.path.realpath(build_dir)
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.realpath(os.path.join(root, d)) != build_real)
+        for filename in sorted(files):
+            if filename.startswith(".") or filename.endswith(".tmp"):
+                continue
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, static_dir).replace(os.sep, "/")
+            with open(path, "rb") as f:
+                data = f.read()
+            hashed = fingerprinted_name(name, data)
+            target = os.path.join(build_dir, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(path, target)
+            written.add(hashed)
+            if name.endswith(COMPRESSIBLE):
+                variants = {".gz": gzip.compress(data, 9, mtime=0)}
+                if brotli is not None:
+                    variants[".br"] = brotli.compress(data, quality=11)
+                for suffix, compressed in variants.items():
+                    # tiny files can come out larger
+                    if len(compressed) < len(data):
+                        with open(target + suffix, "wb") as f:
+                            f.write(compressed)
+                        written.add(hashed + suffix)
+            manifest[name] = hashed
+
+    for root, _, files in os.walk(build_dir):
+        for filename in files:
+            path = os.path.join(root, filename)
+            if os.path.relpath(path, build_dir).replace(os.sep, "/") not in written:
+                os.remove(path)
+    with open(os.path.join(build_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return manifest
+
+
+class StaticAssets:
+    """
+    url_for('static', ...) and /static/ with fingerprinted files.
+
+    With a manifest from `flask build-assets`, url_for('static',
+    filename='style.css') gives /static/dist/style.<hash>.css, served with
+    Cache-Control: immutable and precompressed (br, then gzip) when the
+    browser accepts it. Without one (development, tests) static files are
+    served as before. Debug mode ignores the manifest, so edits show up
+    without a rebuild.
+
+    Vendor files missing from static/vendor/ redirect to their CDN only in
+    debug mode or with cdn_fallback; otherwise they are a 404.
+    """
+
+    def __init__(self, static_dir: str, build_dir: str, cdn_fallback: bool = False):
+        self.static_dir = static_dir
+        self.build_dir = build_dir
+        self.cdn_fallback = cdn_fallback
+        self.manifest = {}
+        self.files = set()
+        self.load()
+
+    def load(self):
+        try:
+            with open(os.path.join(self.build_dir, MANIFEST)) as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+        self.files = set(self.manifest.values())
+
+    def url_defaults(self, endpoint, values):
+        if endpoint != "static" or not self.manifest or current_app.debug:
+            return
+        hashed = self.manifest.get(values.get("filename"))
+        if hashed:
+            values["filename"] = BUILD_PREFIX + hashed
+
+    def _send_built(self, name: str):
+        mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        compressible = name.endswith(COMPRESSIBLE)
+        encoding = None
+        if compressible:
+            for candidate, suffix in (("br", ".br"), ("gzip", ".gz")):
+                if request.accept_encodings[candidate] and os.path.exists(
+                    os.path.join(self.build_dir, name + suffix)
+                ):
+                    encoding = candidate
+                    name += suffix
+                    break
+        response = send_from_directory(self.build_dir, name, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        if encoding:
+            response.content_encoding = encoding
+        if compressible:
+            response.vary.add("Accept-Encoding")
+        return response
+
+    def view(self, filename):
+        if filename.startswith(BUILD_PREFIX) and filename[len(BUILD_PREFIX):] in self.files:
+            return self._send_built(filename[len(BUILD_PREFIX):])
+        if (
+            filename in VENDOR
+            and (current_app.debug or self.cdn_fallback)
+            and not os.path.exists(os.path.join(self.static_dir, filename))
+        ):
+            return redirect(VENDOR[filename][0])
+        return current_app.send_static_file(filename)
+
+
+def get_assets() -> StaticAssets:
+    return current_app.extensions["static_assets"]
+
+
+def init_app(app):
+    """
+    Fingerprinted static files and `flask build-assets`.
+
+    - STATIC_BUILD_DIR: where the build writes (default: static/dist).
+    - VENDOR_CDN_FALLBACK: redirect missing vendor files to their CDN
+      outside debug mode too (default: off).
+    """
+    build_dir = app.config.get("STATIC_BUILD_DIR", os.getenv("STATIC_BUILD_DIR")) or os.path.join(
+        app.static_folder, BUILD_PREFIX.rstrip("/")
+    )
+    cdn_fallback = str(app.config.get("VENDOR_CDN_FALLBACK", os.getenv("VENDOR_CDN_FALLBACK", "off"))).lower()
+    assets = StaticAssets(app.static_folder, build_dir, cdn_fallback in ("1", "on", "true", "yes"))
+    app.extensions["static_assets"] = assets
+    app.url_defaults(assets.url_defaults)
+    app.view_functions["static"] = assets.view
+    app.jinja_env.globals["vendor_integrity"] = vendor_integrity
+
+    @app.cli.command("build-assets")
+    @click.option("--offline", is_flag=True, help="Do not download missing vendor scripts.")
+    def build_assets_command(offline):
+        """Fingerprint and precompress static files (and restore vendor scripts)."""
+        missing = [] if offline else fetch_vendor(assets.static_dir)
+        manifest = build(assets.static_dir, assets.build_dir)
+        assets.load()
+        click.echo(f"Built {len(manifest)} static files into {assets.build_dir}.")
+        if _brotli() is None:
+            click.echo("brotli is not installed; wrote gzip variants only.")
+        if missing:
+            click.echo(f"Could not fetch {', '.join(missing)}; /static/ will answer 404 for them.")
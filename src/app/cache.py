@@ -0,0 +1,378 @@
+# app/cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, current_app, has_app_context, request
+from sqlalchemy import event
+
+from .db import db
+
+# tag shared by every response that lists or searches the catalog
+CATALOG = "catalog"
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_ENTRIES = 1024
+
+# only these headers are replayed from a cached response
+CACHED_HEADERS = ("Content-Type", "X-Next-Cursor", "X-Limit", "Link")
+
+
+def pet_tag(pet_id) -> str:
+    return f"pet:{pet_id}"
+
+
+class LRUBackend:
+    """
+    In-process LRU store. Fast, but every gunicorn worker has its own copy and
+    only sees invalidations made by itself; use SharedLocalBackend when running
+    several workers.
+    """
+
+    name = "lru"
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry["expires"] < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def tag_versions(self, tags):
+        with self._lock:
+            return {t: self._versions.get(t, 0) for t in tags}
+
+    def bump(self, tags):
+        with self._lock:
+            for t in tags:
+                self._versions[t] = self._versions.get(t, 0) + 1
+
+    def size(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SharedLocalBackend:
+    """
+    SQLite-file store shared by every worker process on the same host.
+
+    Entries and tag versions live in one small database file, so an
+    invalidation in one worker is seen by all of them on their next read.
+    """
+
+    name = "shared"
+
+    def __init__(self, path: str = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path or os.path.join(tempfile.gettempdir(), "take-a-paw-cache.sqlite3")
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, body BLOB, status INTEGER, headers TEXT,"
+                " tags TEXT, expires REAL, accessed REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_accessed ON entries (accessed)")
+            conn.execute("CREATE TABLE IF NOT EXISTS tags (tag TEXT PRIMARY KEY, version INTEGER)")
+
+    def _conn(self):
+        # one connection per thread; sqlite3 connections are not thread-safe
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT body, status, headers, tags, expires FROM entries WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        body, status, headers, tags, expires = row
+        now = time.time()
+        if expires < now:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        return {
+            "body": body,
+            "status": status,
+            "headers": json.loads(headers),
+            "tags": json.loads(tags),
+            "expires": expires,
+        }
+
+    def set(self, key, entry):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                entry["body"],
+                entry["status"],
+                json.dumps(entry["headers"]),
+                json.dumps(entry["tags"]),
+                entry["expires"],
+                time.time(),
+            ),
+        )
+        self._writes += 1
+        if self._writes % 64 == 0:
+            self._trim(conn)
+
+    def _trim(self, conn):
+        # evict least recently used rows beyond the size cap
+        conn.execute(
+            "DELETE FROM entries WHERE key IN ("
+            " SELECT key FROM entries ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def tag_versions(self, tags):
+        tags = list(tags)
+        if not tags:
+            return {}
+        marks = ",".join("?" * len(tags))
+        rows = self._conn().execute(
+            f"SELECT tag, version FROM tags WHERE tag IN ({marks})", tags
+        ).fetchall()
+        found = dict(rows)
+        return {t: found.get(t, 0) for t in tags}
+
+    def bump(self, tags):
+        conn = self._conn()
+        conn.executemany(
+            "INSERT INTO tags (tag, version) VALUES (?, 1)"
+            " ON CONFLICT(tag) DO UPDATE SET version = version + 1",
+            [(t,) for t in tags],
+        )
+
+    def size(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def clear(self):
+        self._conn().execute("DELETE FROM entries")
+
+
+class ResponseCache:
+    """
+    Tag-aware response cache on top of a storage backend.
+
+    Each entry remembers the version of every tag it depends on at the time
+    the view started running. Invalidating a tag bumps its version, which
+    makes every older entry carrying that tag a miss. Nothing is scanned or
+    deleted on invalidation, so it costs the same however many entries exist.
+    """
+
+    def __init__(self, backend, ttl: int = DEFAULT_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "stores": 0, "invalidations": 0}
+        self.by_endpoint = {}
+
+    def _count(self, endpoint, outcome):
+        with self._lock:
+            self.stats[outcome] += 1
+            counts = self.by_endpoint.setdefault(endpoint, {"hits": 0, "misses": 0})
+            counts["hits" if outcome == "hits" else "misses"] += 1
+
+    def lookup(self, key, endpoint):
+        entry = self.backend.get(key)
+        if entry is None:
+            self._count(endpoint, "misses")
+            return None
+        current = self.backend.tag_versions(entry["tags"])
+        if current != entry["tags"]:
+            self._count(endpoint, "stale")
+            return None
+        self._count(endpoint, "hits")
+        return entry
+
+    def store(self, key, response, versions):
+        self.backend.set(key, {
+            "body": response.get_data(),
+            "status": response.status_code,
+            "headers": [(h, response.headers[h]) for h in CACHED_HEADERS if h in response.headers],
+            "tags": versions,
+            "expires": time.time() + self.ttl,
+        })
+        with self._lock:
+            self.stats["stores"] += 1
+
+    def invalidate(self, *tags):
+        if not tags:
+            return
+        self.backend.bump(set(tags))
+        with self._lock:
+            self.stats["invalidations"] += len(set(tags))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            by_endpoint = {k: dict(v) for k, v in self.by_endpoint.items()}
+        lookups = stats["hits"] + stats["misses"] + stats["stale"]
+        return {
+            "backend": self.backend.name,
+            "ttl": self.ttl,
+            "entries": self.backend.size(),
+            "max_entries": self.backend.max_entries,
+            "hit_ratio": round(stats["hits"] / lookups, 3) if lookups else None,
+            **stats,
+            "endpoints": by_endpoint,
+        }
+
+
+def _default_backend() -> str:
+    try:
+        workers = int(os.getenv("WEB_CONCURRENCY", 1))
+    except ValueError:
+        workers = 1
+    return "shared" if workers > 1 else "lru"
+
+
+def init_cache(app):
+    """
+    Create the response cache for an app from its config / environment.
+
+    - RESPONSE_CACHE: "lru", "shared" or "none". Defaults to "shared" when
+      WEB_CONCURRENCY says several worker processes serve the app (each
+      would otherwise keep serving entries another one invalidated, such
+      as contact details made private), else "lru".
+    - RESPONSE_CACHE_PATH: database file for the shared backend.
+    - RESPONSE_CACHE_TTL / RESPONSE_CACHE_MAX_ENTRIES: expiry and size cap.
+    """
+    kind = app.config.get("RESPONSE_CACHE", os.getenv("RESPONSE_CACHE", _default_backend())).lower()
+    if kind in ("", "none", "off"):
+        app.extensions["response_cache"] = None
+        return None
+
+    max_entries = int(app.config.get(
+        "RESPONSE_CACHE_MAX_ENTRIES", os.getenv("RESPONSE_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+    ))
+    ttl = int(app.config.get("RESPONSE_CACHE_TTL", os.getenv("RESPONSE_CACHE_TTL", DEFAULT_TTL)))
+
+    if kind == "shared":
+        path = app.config.get("RESPONSE_CACHE_PATH", os.getenv("RESPONSE_CACHE_PATH"))
+        backend = SharedLocalBackend(path, max_entries=max_entries)
+    else:
+        backend = LRUBackend(max_entries=max_entries)
+
+    cache = ResponseCache(backend, ttl=ttl)
+    app.extensions["response_cache"] = cache
+
+    if not event.contains(db.session, "after_commit", _after_commit):
+        event.listen(db.session, "after_commit", _after_commit)
+        event.listen(db.session, "after_rollback", _after_rollback)
+
+    return cache
+
+
+def get_cache():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get("response_cache")
+
+
+def invalidate_on_commit(*tags):
+    """
+    Queue tags to be invalidated when the current DB transaction commits.
+
+    Nothing happens if the transaction rolls back, so readers never lose a
+    cached entry for a write that did not happen.
+    """
+    db.session.info.setdefault("cache_tags", set()).update(tags)
+
+
+def _after_commit(session):
+    tags = session.info.pop("cache_tags", None)
+    cache = get_cache()
+    if tags and cache is not None:
+        cache.invalidate(*tags)
+
+
+def _after_rollback(session):
+    session.info.pop("cache_tags", None)
+
+
+def _request_key() -> str:
+    key = f"{request.method}:{request.full_path}"
+    if request.method == "POST":
+        body = request.get_json(silent=True)
+        canonical = json.dumps(body, sort_keys=True, separators=(",", ":"))
+        key += ":" + hashlib.sha1(canonical.encode()).hexdigest()
+    return key
+
+
+def cached(tags, when=None):
+    """
+    Cache a view's successful responses, keyed by method, path, query string
+    (and canonical JSON body for POSTs).
+
+    - tags: callable receiving the view kwargs and returning the tags the
+      response depends on, e.g. lambda pet_id: [pet_tag(pet_id)].
+    - when: optional callable; the cache is bypassed when it returns False
+      (e.g. for logged-in users whose page is personalised).
+
+    Streamed and non-200 responses are never stored.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = get_cache()
+            if cache is None or (when is not None and not when()):
+                return view(*args, **kwargs)
+
+            key = _request_key()
+            entry = cache.lookup(key, request.endpoint)
+            if entry is not None:
+                response = Response(entry["body"], status=entry["status"])
+                for name, value in entry["headers"]:
+                    response.headers[name] = value
+                response.headers["X-Cache"] = "HIT"
+                return response
+
+            # read tag versions before the view runs, so a write that lands
+            # while we render leaves this entry already stale
+            versions = cache.backend.tag_versions(tags(**kwargs))
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                cache.store(key, response, versions)
+            response.headers["X-Cache"] = "MISS"
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,201 @@
+# app/counters.py
+import json
+import os
+import threading
+import time
+
+from flask import current_app, session
+from sqlalchemy import text
+
+from . import daily_stats
+from .db import db
+from .models import DailyStat, Favorite, Pet, User, UserActivity
+from .swipes import insert_stmt
+
+# seconds a computed value is reused before it is counted again
+DEFAULT_TTL = 60
+
+
+def _dialect() -> str:
+    return db.session.get_bind().dialect.name
+
+
+def _table_estimate(table: str):
+    # PostgreSQL keeps a row estimate per table, refreshed by (auto)vacuum and
+    # ANALYZE; -1 means the table has never been analyzed
+    rows = db.session.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:t)"), {"t": table}
+    ).scalar()
+    return int(rows) if rows is not None and rows >= 0 else None
+
+
+def _query_estimate(query):
+    # the planner's row estimate for a filtered query, without running it
+    sql = query.statement.compile(
+        dialect=db.session.get_bind().dialect, compile_kwargs={"literal_binds": True}
+    )
+    plan = db.session.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _pets(adopted: bool):
+    return db.session.query(Pet.id).filter(Pet.adopted.is_(adopted))
+
+
+def _rollup_today(metric: str) -> int:
+    value = db.session.query(DailyStat.value).filter(
+        DailyStat.day == daily_stats.today(), DailyStat.metric == metric
+    ).scalar()
+    return value or 0
+
+
+def _active_today() -> int:
+    return (
+        db.session.query(UserActivity.user_id)
+        .filter(UserActivity.day == daily_stats.today())
+        .count()
+    )
+
+
+# name -> (exact count, estimate or None). Estimates are only used on
+# PostgreSQL and only when the caller does not ask for an exact value.
+COUNTERS = {
+    "pets_available": (lambda: _pets(False).count(), lambda: _query_estimate(_pets(False))),
+    "pets_adopted": (lambda: _pets(True).count(), lambda: _query_estimate(_pets(True))),
+    "pets_total": (lambda: Pet.query.count(), lambda: _table_estimate("pets")),
+    "users_total": (lambda: User.query.count(), lambda: _table_estimate("users")),
+    "favorites_total": (lambda: Favorite.query.count(), lambda: _table_estimate("favorites")),
+    # maintained counters: one primary-key lookup / index range each
+    "users_created_today": (lambda: _rollup_today(daily_stats.SIGNUPS), None),
+    "users_active_today": (_active_today, None),
+}
+
+
+class CounterService:
+    """
+    Dashboard counters with a short per-process cache.
+
+    Every value remembers when it was computed and how ("exact",
+    "estimate" from the PostgreSQL planner, or "maintained" for rollup
+    reads), so pages can show how old a number is.
+
+    Only the very first read of a counter waits for the database. Once a
+    value is older than the TTL it is still returned as is, and a
+    background thread recomputes it for the next reader.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._values = {}
+        self._refreshing = set()
+
+    def get(self, name: str, exact: bool = False) -> dict:
+        """
+        {"value", "source", "age"} for one counter; age is in seconds.
+        """
+        key = (name, exact)
+        with self._lock:
+            cached = self._values.get(key)
+        if cached is None:
+            cached = self._store(key, self._compute(name, exact))
+        elif time.time() - cached["computed_at"] > self.ttl:
+            self._refresh_later(key)
+        return {
+            "value": cached["value"],
+            "source": cached["source"],
+            "age": round(time.time() - cached["computed_at"], 1),
+        }
+
+    def _store(self, key, value: dict) -> dict:
+        with self._lock:
+            self._values[key] = value
+        return value
+
+    def _refresh_later(self, key):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        app = current_app._get_current_object()
+        threading.Thread(target=self._refresh, args=(app, key), daemon=True).start()
+
+    def _refresh(self, app, key):
+        try:
+            with app.app_context():
+                try:
+                    self._store(key, self._compute(*key))
+                except Exception as e:
+                    print(f"Counter refresh failed for {key[0]}: {e}")
+                finally:
+                    db.session.remove()
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _compute(self, name: str, exact: bool) -> dict:
+        count, estimate = COUNTERS[name]
+        value = None
+        if estimate is not None and not exact and _dialect() == "postgresql":
+            try:
+                value = estimate()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Counter estimate failed for {name}: {e}")
+        if value is not None:
+            source = "estimate"
+        else:
+            value = count()
+            source = "exact" if estimate is not None else "maintained"
+        return {"value": value, "source": source, "computed_at": time.time()}
+
+    def snapshot(self, exact: bool = False, names=None) -> dict:
+        return {name: self.get(name, exact) for name in names or COUNTERS}
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+def get_counters() -> CounterService:
+    counters = current_app.extensions.get("counters")
+    if counters is None:
+        ttl = float(current_app.config.get("COUNTER_TTL", os.getenv("COUNTER_TTL", DEFAULT_TTL)))
+        counters = CounterService(ttl)
+        current_app.extensions["counters"] = counters
+    return counters
+
+
+def track_activity():
+    """
+    Record that the logged-in user was active today.
+
+    Runs before every request but writes at most once per user, day and
+    browser session: the day already recorded is remembered in the session.
+    """
+    user_id = session.get("user_id")
+    if not user_id or session.get("role") == "admin":
+        return
+    day = daily_stats.today()
+    if session.get("active_day") == day.isoformat():
+        return
+
+    row = {"day": day, "user_id": user_id}
+    try:
+        stmt = insert_stmt(UserActivity)
+        if stmt is not None:
+            db.session.execute(stmt, [row])
+        else:
+            db.session.merge(UserActivity(**row))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Activity tracking error: {e}")
+        return
+    session["active_day"] = day.isoformat()
+
+
+def init_app(app):
+    app.before_request(track_activity)
@@ -0,0 +1,230 @@
+# app/daily_stats.py
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+
+import click
+from sqlalchemy import event, func, inspect
+
+from .db import db
+from .models import DailyStat, Favorite, Pet, User
+
+SIGNUPS = "signups"
+LISTINGS = "listings"
+ADOPTIONS = "adoptions"
+FAVORITES = "favorites"
+ACTIVITY = (SIGNUPS, LISTINGS, ADOPTIONS, FAVORITES)
+
+# per-value breakdowns of new listings, e.g. "species:Dog"
+SPECIES = "species:"
+AGE = "age:"
+
+DEFAULT_DAYS = 30
+MAX_DAYS = 3660
+
+
+def _metric(prefix: str, value) -> str:
+    value = (value or "").strip() or "Unknown"
+    return (prefix + value)[:80]
+
+
+def today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def _day(value) -> date:
+    # stored timestamps are UTC; missing ones mean "now"
+    if value is None:
+        return today()
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _upsert(connection, counts: Counter):
+    """
+    Add counts {(day, metric): n} to the table in one statement, creating
+    missing rows (ON CONFLICT / ON DUPLICATE KEY ... value = value + n).
+    """
+    rows = [{"day": d, "metric": m, "value": n} for (d, m), n in counts.items() if n]
+    if not rows:
+        return
+    table = DailyStat.__table__
+    dialect = connection.dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["day", "metric"],
+            set_={"value": table.c.value + stmt.excluded.value},
+        )
+        connection.execute(stmt, rows)
+        return
+
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+        stmt = dialect_insert(table)
+        connection.execute(
+            stmt.on_duplicate_key_update(value=table.c.value + stmt.inserted.value), rows
+        )
+        return
+
+    # generic fallback: update, then insert what was not there
+    for row in rows:
+        updated = connection.execute(
+            table.update()
+            .where(table.c.day == row["day"], table.c.metric == row["metric"])
+            .values(value=table.c.value + row["value"])
+        )
+        if not updated.rowcount:
+            connection.execute(table.insert().values(**row))
+
+
+def count(metric: str, n: int = 1, day: date = None):
+    """
+    Add n to a metric for a day (default today) in the current transaction.
+
+    ORM inserts are counted automatically; call this for writes that bypass
+    the ORM (bulk inserts).
+    """
+    _upsert(db.session.connection(), Counter({(day or today(), metric): n}))
+
+
+def _count_listing(counts: Counter, created_at, species, age, adopted, adopted_at):
+    day = _day(created_at)
+    counts[(day, LISTINGS)] += 1
+    counts[(day, _metric(SPECIES, species))] += 1
+    counts[(day, _metric(AGE, age))] += 1
+    if adopted:
+        counts[(_day(adopted_at), ADOPTIONS)] += 1
+
+
+def count_listings(rows):
+    """
+    Count new listings inserted without the ORM (bulk imports) in the
+    current transaction. rows are Pet column dicts.
+    """
+    counts = Counter()
+    for row in rows:
+        _count_listing(counts, row.get("created_at"), row.get("species"), row.get("age"),
+                       row.get("adopted"), row.get("adopted_at"))
+    _upsert(db.session.connection(), counts)
+
+
+def _adopted_now(pet) -> bool:
+    history = inspect(pet).attrs.adopted.history
+    return bool(history.added and history.added[0]) and not (history.deleted and history.deleted[0])
+
+
+def _after_flush(session, flush_context):
+    counts = Counter()
+    for obj in session.new:
+        if isinstance(obj, User):
+            counts[(_day(obj.created_at), SIGNUPS)] += 1
+        elif isinstance(obj, Pet):
+            _count_listing(counts, obj.created_at, obj.species, obj.age,
+                           obj.adopted, obj.adopted_at)
+        elif isinstance(obj, Favorite):
+            counts[(_day(obj.created_at), FAVORITES)] += 1
+    for obj in session.dirty:
+        if isinstance(obj, Pet) and _adopted_now(obj):
+            counts[(_day(obj.adopted_at), ADOPTIONS)] += 1
+    if counts:
+        # same connection and transaction as the write itself
+        _upsert(session.connection(), counts)
+
+
+@event.listens_for(Pet.adopted, "set")
+def _stamp_adoption(pet, value, oldvalue, initiator):
+    if value and not oldvalue:
+        pet.adopted_at = datetime.now(timezone.utc)
+    elif not value:
+        pet.adopted_at = None
+
+
+def window(days: int):
+    """
+    Read the last `days` days (today included) in one range query on the
+    (day, metric) primary key.
+
+    Returns (labels, series, totals):
+    - labels: ISO dates, oldest first.
+    - series: {metric: [value per label]} for the ACTIVITY metrics.
+    - totals: {metric: sum over the window} for every metric.
+    """
+    end = today()
+    start = end - timedelta(days=days - 1)
+    rows = (
+        db.session.query(DailyStat.day, DailyStat.metric, DailyStat.value)
+        .filter(DailyStat.day >= start, DailyStat.day <= end)
+        .all()
+    )
+
+    labels = [start + timedelta(days=i) for i in range(days)]
+    position = {d: i for i, d in enumerate(labels)}
+    series = {m: [0] * days for m in ACTIVITY}
+    totals = Counter()
+    for day, metric, value in rows:
+        totals[metric] += value
+        if metric in series:
+            series[metric][position[day]] = value
+    return [d.isoformat() for d in labels], series, totals
+
+
+def breakdown(totals, prefix: str) -> dict:
+    """
+    {value: count} for one prefixed metric family, largest first.
+    """
+    items = [(m[len(prefix):], n) for m, n in totals.items() if m.startswith(prefix) and n]
+    return dict(sorted(items, key=lambda item: (-item[1], item[0])))
+
+
+def _as_date(value):
+    # func.date() comes back as a string on SQLite
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def _daily(column, *group):
+    day = func.date(column)
+    return (
+        db.session.query(day, *group, func.count())
+        .filter(column.isnot(None))
+        .group_by(day, *group)
+    )
+
+
+def backfill():
+    """
+    Rebuild the whole table from the live tables. Returns rows written.
+
+    Adoptions are dated by Pet.adopted_at, so pets adopted before that
+    column existed are not counted.
+    """
+    counts = Counter()
+    for metric, column in ((SIGNUPS, User.created_at), (LISTINGS, Pet.created_at),
+                           (FAVORITES, Favorite.created_at)):
+        for day, n in _daily(column):
+            counts[(_as_date(day), metric)] += n
+    for day, n in _daily(Pet.adopted_at).filter(Pet.adopted.is_(True)):
+        counts[(_as_date(day), ADOPTIONS)] += n
+    for prefix, column in ((SPECIES, Pet.species), (AGE, Pet.age)):
+        for day, value, n in _daily(Pet.created_at, column):
+            counts[(_as_date(day), _metric(prefix, value))] += n
+
+    db.session.query(DailyStat).delete()
+    _upsert(db.session.connection(), counts)
+    db.session.commit()
+    return len(counts)
+
+
+def init_app(app):
+    if not event.contains(db.session, "after_flush", _after_flush):
+        event.listen(db.session, "after_flush", _after_flush)
+
+    @app.cli.command("stats-backfill")
+    def stats_backfill_command():
+        """Recompute the daily statistics rollup from existing data."""
+        click.echo(f"Wrote {backfill()} daily statistics rows.")
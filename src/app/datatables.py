@@ -0,0 +1,131 @@
+# app/datatables.py
+from typing import Callable, NamedTuple
+
+from flask import request
+from sqlalchemy import func
+
+from .db import db
+
+DEFAULT_LENGTH = 10
+MAX_LENGTH = 100
+# a search never counts more matches than this; the grid then says
+# "1,000+" pages instead of counting the whole table on every keystroke
+MAX_FILTERED_COUNT = 10000
+
+
+class Column(NamedTuple):
+    """
+    One grid column.
+
+    - data: key of the value in each row dict (DataTables columns[].data).
+    - sort: column to ORDER BY when the grid sorts on it, or None if the
+      column is not sortable. Only give indexed columns here: every sort
+      is served as an index range scan with the id as tie-breaker.
+    """
+    data: str
+    sort: object = None
+
+
+class Params(NamedTuple):
+    draw: int
+    start: int
+    length: int
+    order: object
+    descending: bool
+    search: str
+
+
+def parse(columns, default: int = 0, descending: bool = True) -> Params:
+    """
+    Read the DataTables server-side parameters from the current request.
+
+    - start / length are clamped to [0, ...) and [1, MAX_LENGTH]
+      (length=-1, "show all", gets MAX_LENGTH).
+    - order[0][column] must name a sortable column; anything else falls
+      back to columns[default].
+    - Only the first order entry is used.
+    """
+    args = request.args
+    draw = args.get("draw", 0, type=int)
+    start = max(0, args.get("start", 0, type=int))
+    length = args.get("length", DEFAULT_LENGTH, type=int)
+    if length < 1:
+        length = MAX_LENGTH
+    length = min(length, MAX_LENGTH)
+
+    index = args.get("order[0][column]", default, type=int)
+    if not (0 <= index < len(columns)) or columns[index].sort is None:
+        index = default
+    else:
+        descending = args.get("order[0][dir]", "").lower() == "desc"
+
+    search = (args.get("search[value]") or "").strip()
+    return Params(draw, start, length, columns[index].sort, descending, search)
+
+
+def prefix(column, term: str):
+    """
+    "column starts with term" as a range on the column, so a plain b-tree
+    index serves it (LIKE 'term%' is not indexable on every backend).
+    Case-sensitive.
+    """
+    return (column >= term) & (column < term + "\U0010ffff")
+
+
+def _bounded_count(query, id_col) -> int:
+    ids = query.with_entities(id_col).order_by(None).limit(MAX_FILTERED_COUNT).subquery()
+    return db.session.query(func.count()).select_from(ids).scalar()
+
+
+def serve(
+    query,
+    id_col,
+    columns,
+    fetch: Callable,
+    total: int,
+    search: Callable = None,
+    default: int = 0,
+) -> dict:
+    """
+    Answer one DataTables server-side request.
+
+    - query: the unfiltered base query.
+    - fetch(ids): row dicts for one page of ids, in any order; this is the
+      only place full rows are read, so it should project just the
+      displayed columns.
+    - total: size of the unfiltered table (a cached counter is fine).
+    - search(query, term): restrict query to rows matching the search box.
+
+    The page itself is found on ids alone (ORDER BY an indexed column,
+    OFFSET/LIMIT over a covering index), then the rows for those ids are
+    fetched by primary key, so the work per request is one narrow index
+    walk plus `length` row lookups.
+    """
+    params = parse(columns, default)
+
+    filtered = query
+    records_filtered = total
+    if params.search and search is not None:
+        filtered = search(query, params.search)
+        records_filtered = _bounded_count(filtered, id_col)
+
+    if params.order is id_col:
+        order = [id_col.desc() if params.descending else id_col.asc()]
+    elif params.descending:
+        order = [params.order.desc(), id_col.desc()]
+    else:
+        order = [params.order.asc(), id_col.asc()]
+
+    ids = [
+        row_id for (row_id,) in filtered.with_entities(id_col)
+        .order_by(None).order_by(*order)
+        .offset(params.start).limit(params.length)
+    ]
+    rows = {row["id"]: row for row in fetch(ids)} if ids else {}
+
+    return {
+        "draw": params.draw,
+        "recordsTotal": total,
+        "recordsFiltered": records_filtered,
+        "data": [rows[row_id] for row_id in ids if row_id in rows],
+    }
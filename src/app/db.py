@@ -1,8 +1,70 @@
 # src/app/db.py
 import os
+import sqlite3
+import time
+
+from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
 db = SQLAlchemy()
+migrate = Migrate()
+
+# Alembic revisions for tables that already exist (`flask db ...`)
+MIGRATIONS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "migrations"))
+
+
+@event.listens_for(Engine, "connect")
+def _sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores foreign keys (and ON DELETE CASCADE) unless asked
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+# callback(conn, cursor, statement, parameters, executemany, seconds), called
+# after every successful statement on engines passed to time_statements()
+_statement_callbacks = []
+
+
+def on_statement(callback):
+    if callback not in _statement_callbacks:
+        _statement_callbacks.append(callback)
+
+
+def time_statements(engine):
+    """
+    Time every statement of an engine once, for all on_statement callbacks
+    (app/metrics.py, app/querylog.py).
+    """
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # a connection runs one statement at a time
+    conn.info["statement_start"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info.pop("statement_start", None)
+    if start is None:
+        return
+    seconds = time.perf_counter() - start
+    for callback in _statement_callbacks:
+        callback(conn, cursor, statement, parameters, executemany, seconds)
+
+
+def _handle_error(exception_context):
+    # failed statements never reach after_cursor_execute
+    conn = exception_context.connection
+    if conn is not None:
+        conn.info.pop("statement_start", None)
+
 
 def init_db(app, test_config=None):
     # Use test database if provided
@@ -26,5 +88,46 @@ def init_db(app, test_config=None):
 
     if "sqlalchemy" not in app.extensions:
         db.init_app(app)
+    if "migrate" not in app.extensions:
+        migrate.init_app(app, db, directory=MIGRATIONS_DIR)
+
+    @app.cli.command("create-tables")
+    def create_tables_command():
+        """Migrate existing tables, then create missing ones (run before starting the server)."""
+        create_tables()
+        print("✅ Tables migrated and created (if they didn't exist)")
 
     return db
+
+
+def create_tables():
+    """
+    Bring the schema up to date.
+
+    A blank database gets the whole schema from create_all() and is
+    stamped as up to date. An existing one first gets the Alembic
+    revisions (migrations/), which add the columns and indexes that
+    create_all() cannot add to existing tables, then any missing tables.
+    """
+    from flask_migrate import stamp, upgrade
+    from sqlalchemy import inspect
+    from . import models  # noqa: F401  (registers the tables)
+
+    if not inspect(db.engine).get_table_names():
+        db.create_all()
+        stamp(directory=MIGRATIONS_DIR)
+        return
+    upgrade(directory=MIGRATIONS_DIR)
+    db.create_all()
+
+
+def dispose_engines(app, close=True):
+    """
+    Drop every pooled connection of the app's engines.
+
+    Forked workers call this with close=False: the connections belong to
+    the parent, so the child forgets them without closing the sockets.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=close)
@@ -0,0 +1,142 @@
+# app/deck.py
+import random
+
+from sqlalchemy import and_, exists, or_
+
+from . import geo
+from .models import SHUFFLE_KEY_SPACE, Favorite, Pet, Swipe
+from .pagination import decode_cursor, encode_cursor
+
+DEFAULT_BATCH = 10
+MAX_BATCH = 50
+
+
+def new_seed() -> int:
+    """
+    Pick a fresh shuffle seed for a user.
+
+    The seed is a point in the shuffle-key space: the deck starts there and
+    walks the index forward, wrapping around once.
+    """
+    return random.randrange(SHUFFLE_KEY_SPACE)
+
+
+def _start_state(seed: int) -> dict:
+    # phase 0 walks [seed, end), phase 1 wraps around and walks [0, seed)
+    return {"p": 0, "k": seed, "i": 0}
+
+
+def _base_query(user_id):
+    q = Pet.query.filter(Pet.adopted.is_(False))
+
+    if user_id:
+        # correlated NOT EXISTS probes hit the (user_id, pet_id) primary keys,
+        # so each candidate row costs one index lookup however long the
+        # user's history grows
+        seen = exists().where(Swipe.user_id == user_id, Swipe.pet_id == Pet.id)
+        faved = exists().where(Favorite.user_id == user_id, Favorite.pet_id == Pet.id)
+
+        q = q.filter(or_(Pet.owner_id.is_(None), Pet.owner_id != user_id))
+        q = q.filter(~seen).filter(~faved)
+
+    return q
+
+
+def _nearby_batch(user_id, near, state, limit):
+    lat, lon, radius = near
+    after = geo.parse_after(state.get("g"))
+    results, next_after = geo.nearby(_base_query(user_id), lat, lon, radius, after=after, limit=limit)
+    next_cursor = encode_cursor({"g": next_after}) if next_after else None
+    return [pet for pet, _ in results], next_cursor
+
+
+def _recommended_cards(user_id, recommended, limit):
+    # likely matches in recommendation order, minus anything the deck skips
+    ids = list(recommended)[:limit]
+    if not ids:
+        return []
+    found = {p.id: p for p in _base_query(user_id).filter(Pet.id.in_(ids))}
+    return [found[pid] for pid in ids if pid in found]
+
+
+def _shown_ids(state) -> list:
+    shown = state.get("r")
+    if not isinstance(shown, list):
+        return []
+    return [pid for pid in shown[:MAX_BATCH] if isinstance(pid, int) and not isinstance(pid, bool)]
+
+
+def next_batch(user_id, seed: int, cursor: str = None, limit: int = DEFAULT_BATCH, near=None, recommended=None):
+    """
+    Return the next batch of swipe cards for a user.
+
+    The deck is a walk over the indexed Pet.shuffle_key column starting at the
+    user's seed, so every batch is a bounded range scan instead of a full
+    ORDER BY random(). Cards inside a batch are shuffled again with the seed so
+    two users starting close to each other still see different orders.
+
+    With near=(lat, lon, radius_km) the deck holds only pets in that circle,
+    nearest first (see geo.nearby).
+
+    recommended is a ranked list of pet ids (see recommend.py). On the first
+    batch those still in the deck are dealt first, in order, and the cursor
+    remembers them so the shuffled walk does not deal them again.
+
+    Returns (pets, next_cursor); next_cursor is None once the deck is exhausted.
+    """
+    limit = max(1, min(int(limit or DEFAULT_BATCH), MAX_BATCH))
+    if near is not None:
+        return _nearby_batch(user_id, near, decode_cursor(cursor) or {}, limit)
+
+    state = decode_cursor(cursor) or _start_state(seed)
+
+    try:
+        phase = int(state.get("p", 0))
+        last_key = int(state.get("k", seed))
+        last_id = int(state.get("i", 0))
+    except (ValueError, TypeError):
+        phase, last_key, last_id = 0, seed, 0
+
+    shown = _shown_ids(state)
+    front = []
+    if cursor is None and recommended:
+        front = _recommended_cards(user_id, recommended, limit)
+        shown = [p.id for p in front]
+
+    pets = []
+    while phase < 2 and len(front) + len(pets) < limit:
+        q = _base_query(user_id).filter(
+            or_(
+                Pet.shuffle_key > last_key,
+                and_(Pet.shuffle_key == last_key, Pet.id >= last_id),
+            )
+        )
+        if phase == 1:
+            q = q.filter(Pet.shuffle_key < seed)
+        if shown:
+            q = q.filter(Pet.id.notin_(shown))
+
+        want = limit - len(front) - len(pets)
+        rows = (
+            q.order_by(Pet.shuffle_key, Pet.id)
+            .limit(want + 1)
+            .all()
+        )
+        pets.extend(rows[:want])
+
+        if len(rows) > want:
+            # there is at least one more card in this phase; resume from it
+            last_key, last_id = rows[want].shuffle_key, rows[want].id
+        else:
+            phase += 1
+            last_key, last_id = 0, 0
+
+    next_cursor = None
+    if phase < 2:
+        state = {"p": phase, "k": last_key, "i": last_id}
+        if shown:
+            state["r"] = shown
+        next_cursor = encode_cursor(state)
+
+    random.Random(f"{seed}:{cursor or ''}").shuffle(pets)
+    return front + pets, next_cursor
@@ -0,0 +1,56 @@
+# app/deletion.py
+from . import matching
+from .cache import CATALOG, invalidate_on_commit, pet_tag
+from .db import db
+from .models import ImageFetch, Pet, User
+
+# most rows one admin bulk delete may remove
+MAX_BULK_DELETE = 1000
+
+
+def _forget_pets(pet_ids):
+    # per-process state that the database cascade does not reach
+    if pet_ids:
+        invalidate_on_commit(CATALOG, *[pet_tag(pid) for pid in pet_ids])
+        matching.remove_on_commit(*pet_ids)
+
+
+def delete_pets(pet_ids) -> int:
+    """
+    Delete pets by id in a constant number of statements. Returns how many
+    existed. The caller commits.
+
+    Favorites and swipes are removed by the database (ON DELETE CASCADE);
+    queued image fetches have no foreign key and are deleted here.
+    """
+    pet_ids = list(set(pet_ids))
+    if not pet_ids:
+        return 0
+    db.session.query(ImageFetch).filter(ImageFetch.pet_id.in_(pet_ids)).delete(
+        synchronize_session=False
+    )
+    deleted = db.session.query(Pet).filter(Pet.id.in_(pet_ids)).delete(synchronize_session=False)
+    _forget_pets(pet_ids)
+    return deleted
+
+
+def delete_users(user_ids) -> int:
+    """
+    Delete users by id, with everything they own, in a constant number of
+    statements. Returns how many existed. The caller commits.
+
+    Their pets, favorites and swipes (and the favorites and swipes on their
+    pets) are removed by the database cascade; only the ids of their pets
+    are read, to clear caches and the match index.
+    """
+    user_ids = list(set(user_ids))
+    if not user_ids:
+        return 0
+    owned = db.session.query(Pet.id).filter(Pet.owner_id.in_(user_ids))
+    pet_ids = [pid for (pid,) in owned]
+    db.session.query(ImageFetch).filter(ImageFetch.pet_id.in_(owned.scalar_subquery())).delete(
+        synchronize_session=False
+    )
+    deleted = db.session.query(User).filter(User.id.in_(user_ids)).delete(synchronize_session=False)
+    _forget_pets(pet_ids)
+    return deleted
@@ -0,0 +1,302 @@
+# app/geo.py
+import csv
+import math
+import os
+import unicodedata
+
+import click
+from sqlalchemy import and_, event, or_
+
+from .db import db
+from .models import Pet
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(__file__), "data", "gazetteer.csv")
+
+EARTH_RADIUS_KM = 6371.0088
+DEFAULT_RADIUS_KM = 30.0
+MAX_RADIUS_KM = 500.0
+
+# precision stored on pets (~5 m cells); queries use shorter prefixes
+GEOHASH_PRECISION = 9
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# upper bound on geohash prefixes scanned for one proximity query
+MAX_CELLS = 16
+
+_gazetteer = None
+
+# letters that NFKD does not split into ASCII + accent
+_EXTRA_FOLD = str.maketrans({"ı": "i", "ə": "e", "ß": "ss"})
+
+
+def _normalize(name: str) -> str:
+    name = (name or "").strip().lower().translate(_EXTRA_FOLD)
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(ch for ch in name if not unicodedata.combining(ch))
+    return " ".join(name.replace(".", " ").split())
+
+
+def _load_gazetteer():
+    """
+    Read the bundled gazetteer once into {normalized name: (lat, lon)}.
+
+    Each place is stored under its name, its aliases and "name, country",
+    so "Baku", "Bakı" and "Baku, Azerbaijan" all resolve.
+    """
+    global _gazetteer
+    if _gazetteer is None:
+        places = {}
+        with open(GAZETTEER_PATH, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                point = (float(row["latitude"]), float(row["longitude"]))
+                country = _normalize(row["country"])
+                names = [row["name"]] + [a for a in (row["aliases"] or "").split("|") if a]
+                for name in names:
+                    key = _normalize(name)
+                    places.setdefault(key, point)
+                    places[f"{key}, {country}"] = point
+        _gazetteer = places
+    return _gazetteer
+
+
+def geocode(location: str):
+    """
+    Resolve free-text "City, Country" to (lat, lon) using the offline gazetteer.
+
+    - Tries the full text first, then each comma-separated part from the
+      left, so "Old Town, Baku, Azerbaijan" still finds Baku.
+    - Returns None when nothing matches.
+    """
+    places = _load_gazetteer()
+    text = _normalize(location)
+    if not text:
+        return None
+    if text in places:
+        return places[text]
+
+    parts = [p.strip() for p in text.split(",") if p.strip()]
+    for i, part in enumerate(parts):
+        rest = parts[i + 1:]
+        if rest and f"{part}, {rest[-1]}" in places:
+            return places[f"{part}, {rest[-1]}"]
+        if part in places:
+            return places[part]
+    return None
+
+
+def geohash_encode(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                value = value * 2 + 1
+                lon_lo = mid
+            else:
+                value *= 2
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value = value * 2 + 1
+                lat_lo = mid
+            else:
+                value *= 2
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def _cell_size(precision: int):
+    # (height, width) in degrees of a geohash cell
+    total = 5 * precision
+    lon_bits = (total + 1) // 2
+    lat_bits = total // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+def covering_cells(lat: float, lon: float, radius_km: float):
+    """
+    Geohash prefixes whose cells together cover the circle around a point.
+
+    Picks the longest precision that covers the circle's bounding box with
+    at most MAX_CELLS cells, so the candidate scan stays close to the circle
+    itself instead of a few very large cells.
+    """
+    dlat = radius_km / 111.32
+    coslat = max(math.cos(math.radians(lat)), 1e-6)
+    dlon = min(radius_km / (111.32 * coslat), 180.0)
+    south, north = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    west, east = lon - dlon, lon + dlon
+
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = _cell_size(precision)
+        rows = math.floor(north / height) - math.floor(south / height) + 1
+        cols = math.floor(east / width) - math.floor(west / width) + 1
+        if rows * cols <= MAX_CELLS or precision == 1:
+            break
+
+    cells = set()
+    for r in range(rows):
+        clat = min(north, south + r * height)
+        for c in range(cols):
+            clon = min(east, west + c * width)
+            # wrap across the antimeridian
+            clon = (clon + 180.0) % 360.0 - 180.0
+            cells.add(geohash_encode(clat, clon, precision))
+    return sorted(cells)
+
+
+def _prefix_upper(cell: str):
+    """
+    Smallest geohash of the same length that sorts after every hash starting
+    with cell, or None if there is none (cell is all "z").
+    """
+    chars = list(cell)
+    while chars:
+        i = _BASE32.index(chars[-1])
+        if i + 1 < len(_BASE32):
+            chars[-1] = _BASE32[i + 1]
+            return "".join(chars)
+        chars.pop()
+    return None
+
+
+def within_cells(cells):
+    """
+    SQL predicate "geohash starts with one of cells", written as ranges so
+    a plain B-tree index on Pet.geohash serves it on every database.
+    """
+    ranges = []
+    for cell in cells:
+        upper = _prefix_upper(cell)
+        if upper is None:
+            ranges.append(Pet.geohash >= cell)
+        else:
+            ranges.append(and_(Pet.geohash >= cell, Pet.geohash < upper))
+    return or_(*ranges)
+
+
+def nearby(query, lat: float, lon: float, radius_km: float, after=None, limit: int = 20):
+    """
+    Return pets from query within radius_km of (lat, lon), nearest first.
+
+    - Candidates come from a geohash index range scan over the few cells
+      covering the circle, projected to (id, lat, lon) only.
+    - Exact distances are computed for the candidates, then just the
+      requested page of pets is loaded.
+    - after is the (distance_km, id) of the last pet already returned; the
+      page continues strictly after it, so rows that disappear in between
+      (swiped, adopted) do not shift the next page.
+
+    Returns (list of (pet, distance_km), next_after or None).
+    """
+    candidates = (
+        query.filter(within_cells(covering_cells(lat, lon, radius_km)))
+        .order_by(None)
+        .with_entities(Pet.id, Pet.latitude, Pet.longitude)
+        .all()
+    )
+    scored = []
+    for pet_id, plat, plon in candidates:
+        key = (round(haversine_km(lat, lon, plat, plon), 3), pet_id)
+        if key[0] <= radius_km and (after is None or key > tuple(after)):
+            scored.append(key)
+    scored.sort()
+
+    window = scored[:limit]
+    pets = {p.id: p for p in Pet.query.filter(Pet.id.in_([pid for _, pid in window]))} if window else {}
+    results = [(pets[pid], d) for d, pid in window if pid in pets]
+    next_after = list(window[-1]) if len(scored) > limit else None
+    return results, next_after
+
+
+def parse_after(value):
+    """
+    The (distance, id) of a nearby() cursor, or None (first page) unless it
+    is exactly [number, int]; cursors come back from the client.
+    """
+    if not isinstance(value, list) or len(value) != 2:
+        return None
+    distance, pet_id = value
+    if isinstance(distance, bool) or not isinstance(distance, (int, float)) or not math.isfinite(distance):
+        return None
+    if isinstance(pet_id, bool) or not isinstance(pet_id, int):
+        return None
+    return [distance, pet_id]
+
+
+def parse_point(args):
+    """
+    Read lat, lon and radius (km) from request args.
+
+    Returns (lat, lon, radius), None when lat/lon are absent, or raises
+    ValueError for out-of-range input.
+    """
+    if args.get("lat") in (None, "") and args.get("lon") in (None, ""):
+        return None
+    try:
+        lat = float(args.get("lat"))
+        lon = float(args.get("lon"))
+        radius = float(args.get("radius") or DEFAULT_RADIUS_KM)
+    except (TypeError, ValueError):
+        raise ValueError("lat, lon and radius must be numbers")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("lat/lon out of range")
+    if not (0 < radius <= MAX_RADIUS_KM):
+        raise ValueError(f"radius must be between 0 and {MAX_RADIUS_KM:g} km")
+    return lat, lon, radius
+
+
+@event.listens_for(Pet.location, "set")
+def _geocode_location(pet, value, oldvalue, initiator):
+    """
+    Geocode listings at write time, whichever code path sets the location.
+    """
+    if value == oldvalue:
+        return
+    point = geocode(value)
+    if point is None:
+        pet.latitude = pet.longitude = pet.geohash = None
+    else:
+        pet.latitude, pet.longitude = point
+        pet.geohash = geohash_encode(*point)
+
+
+def backfill():
+    """
+    Geocode every pet that has no coordinates yet. Returns how many were found.
+    """
+    found = 0
+    for pet in Pet.query.filter(Pet.geohash.is_(None)).yield_per(500):
+        point = geocode(pet.location)
+        if point is not None:
+            pet.latitude, pet.longitude = point
+            pet.geohash = geohash_encode(*point)
+            found += 1
+    db.session.commit()
+    return found
+
+
+def init_app(app):
+    @app.cli.command("geocode-pets")
+    def geocode_pets_command():
+        """Fill in coordinates for pets listed before geocoding existed."""
+        click.echo(f"Geocoded {backfill()} pets.")
@@ -0,0 +1,224 @@
+# app/image_queue.py
+import os
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from flask import current_app
+from sqlalchemy import func
+
+from . import metrics, storage
+from .cache import CATALOG, invalidate_on_commit, pet_tag
+from .db import db
+from .models import ImageFetch, Pet
+
+# shown until a listing's photo has been stored
+PLACEHOLDER_IMAGE = "/static/processing.svg"
+# Pet.image_status values
+READY, PROCESSING, FAILED = "ready", "processing", "failed"
+
+MAX_ATTEMPTS = 5
+DEFAULT_WORKERS = 2
+# seconds before the first retry; doubles with every failed attempt
+DEFAULT_RETRY_DELAY = 2.0
+
+
+def spool(file, directory: str) -> str:
+    """
+    Write an uploaded file (werkzeug FileStorage) to the spool directory
+    and return its path. The request only pays for a local disk write.
+    """
+    os.makedirs(directory, exist_ok=True)
+    ext = storage.image_extension(file.filename or "")
+    path = os.path.join(directory, f"{uuid.uuid4().hex}{ext}")
+    file.save(path)
+    return path
+
+
+def _is_spooled(source: str) -> bool:
+    return "://" not in source
+
+
+def process_job(pet_id: int, save=None):
+    """
+    Store one queued image and point its pet at the stored copy.
+
+    Returns "done", "retry" (failed, attempts left) or "failed" (gave
+    up; a listing still on the placeholder is marked failed). Jobs whose
+    pet was deleted are dropped ("done").
+    """
+    store = storage.get_storage()
+    save = save or store.save
+    job = db.session.get(ImageFetch, pet_id)
+    if job is None:
+        return "done"
+    source = job.url
+    kind = "listing" if _is_spooled(source) else "import"
+    try:
+        with metrics.timed("image_upload_seconds", backend=store.name, source=kind):
+            image = save(source)
+    except Exception as e:
+        job.attempts += 1
+        job.error = str(e)[:500]
+        outcome = "retry" if job.attempts < MAX_ATTEMPTS else "failed"
+        if outcome == "failed":
+            Pet.query.filter_by(id=pet_id, image_status=PROCESSING).update(
+                {"image_status": FAILED}, synchronize_session=False
+            )
+            invalidate_on_commit(CATALOG, pet_tag(pet_id))
+        db.session.commit()
+        return outcome
+
+    Pet.query.filter_by(id=pet_id).update({"image": image, "image_status": READY}, synchronize_session=False)
+    # the image shows on the catalog pages (/pets, search, quiz results) too
+    invalidate_on_commit(CATALOG, pet_tag(pet_id))
+    db.session.delete(job)
+    db.session.commit()
+    if _is_spooled(source):
+        try:
+            os.remove(source)
+        except FileNotFoundError:
+            pass
+    return "done"
+
+
+def process_pending(limit: int = 100, save=None) -> dict:
+    """
+    Work through up to `limit` queued images in this process: feed images
+    from the importer, and listing photos left over by a worker that
+    stopped before storing them.
+
+    Returns {"copied", "failed", "pending"}.
+    """
+    pet_ids = [
+        pet_id for (pet_id,) in db.session.query(ImageFetch.pet_id)
+        .filter(ImageFetch.attempts < MAX_ATTEMPTS)
+        .order_by(ImageFetch.created_at, ImageFetch.pet_id)
+        .limit(limit)
+    ]
+    copied = failed = 0
+    for pet_id in pet_ids:
+        if process_job(pet_id, save) == "done":
+            copied += 1
+        else:
+            failed += 1
+
+    pending = db.session.query(func.count(ImageFetch.pet_id)).filter(
+        ImageFetch.attempts < MAX_ATTEMPTS
+    ).scalar()
+    return {"copied": copied, "failed": failed, "pending": pending}
+
+
+class UploadQueue:
+    """
+    Background workers that store listing photos after the request.
+
+    Jobs live in the image_fetches table, so nothing is lost if a worker
+    stops; `flask fetch-images` picks leftovers up. Each process starts
+    its own threads on first use (after a gunicorn fork). Failed jobs are
+    retried after retry_delay, 2 x retry_delay, ... up to MAX_ATTEMPTS.
+    """
+
+    def __init__(self, app, workers: int = DEFAULT_WORKERS, retry_delay: float = DEFAULT_RETRY_DELAY,
+                 spool_dir: str = None):
+        self.app = app
+        self.workers = workers
+        self.retry_delay = retry_delay
+        self.spool_dir = spool_dir or os.path.join(tempfile.gettempdir(), "take-a-paw-spool")
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+        self._pid = None
+        self._executor = None
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image-upload")
+            return self._executor
+
+    def submit(self, pet_id: int, attempt: int = 0):
+        with self._lock:
+            self._pending += 1
+        if attempt == 0:
+            self._pool().submit(self._run, pet_id, attempt)
+            return
+        timer = threading.Timer(self.retry_delay * 2 ** (attempt - 1), self._resubmit, (pet_id, attempt))
+        timer.daemon = True
+        timer.start()
+
+    def _resubmit(self, pet_id: int, attempt: int):
+        self._pool().submit(self._run, pet_id, attempt)
+
+    def _run(self, pet_id: int, attempt: int):
+        try:
+            with self.app.app_context():
+                try:
+                    outcome = process_job(pet_id)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Image upload error (pet {pet_id}): {e}")
+                    outcome = "retry" if attempt + 1 < MAX_ATTEMPTS else "failed"
+                finally:
+                    db.session.remove()
+            if outcome == "retry":
+                self.submit(pet_id, attempt + 1)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._idle.notify_all()
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Block until every submitted job (and its retries) has finished.
+        """
+        with self._lock:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+
+def get_queue() -> UploadQueue:
+    return current_app.extensions["upload_queue"]
+
+
+def enqueue(file, pet: Pet):
+    """
+    Spool an uploaded photo and queue it for `pet` (added to the session,
+    not yet committed): the listing shows the placeholder until the photo
+    is stored. Call submit(pet.id) after the commit.
+    """
+    path = spool(file, get_queue().spool_dir)
+    pet.image = PLACEHOLDER_IMAGE
+    pet.image_status = PROCESSING
+    db.session.flush()
+    db.session.add(ImageFetch(pet_id=pet.id, url=path))
+    return path
+
+
+def submit(pet_id: int):
+    get_queue().submit(pet_id)
+
+
+def init_app(app):
+    """
+    Register the upload workers and `flask fetch-images`.
+
+    - UPLOAD_WORKERS: threads per process (default 2).
+    - UPLOAD_RETRY_DELAY: seconds before the first retry (default 2).
+    - SPOOL_DIR: where uploads wait to be stored (shared by all workers).
+    """
+    app.extensions["upload_queue"] = UploadQueue(
+        app,
+        workers=int(app.config.get("UPLOAD_WORKERS", os.getenv("UPLOAD_WORKERS", DEFAULT_WORKERS))),
+        retry_delay=float(app.config.get("UPLOAD_RETRY_DELAY", os.getenv("UPLOAD_RETRY_DELAY", DEFAULT_RETRY_DELAY))),
+        spool_dir=app.config.get("SPOOL_DIR", os.getenv("SPOOL_DIR")),
+    )
+
+    @app.cli.command("fetch-images")
+    @click.option("--limit", default=100, show_default=True)
+    def fetch_images_command(limit):
+        """Store queued feed images and leftover listing photos."""
+        result = process_pending(limit)
+        click.echo(f"Copied {result['copied']}, failed {result['failed']}, {result['pending']} pending.")
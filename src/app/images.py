@@ -0,0 +1,201 @@
+# app/images.py
+import importlib.util
+import io
+import os
+import re
+import tempfile
+import uuid
+from typing import NamedTuple
+
+from flask import abort, current_app, send_from_directory
+from markupsafe import Markup, escape
+
+from . import storage
+
+
+class Variant(NamedTuple):
+    widths: tuple
+    # height / width of the rendition; None keeps the original's shape
+    ratio: float
+    # the <img sizes> attribute: how wide the image is drawn
+    sizes: str
+
+
+# sized renditions of listing photos, named after where they are shown
+VARIANTS = {
+    # grid cards (favorites, my listings, "also liked"): 200px tall boxes
+    "thumb": Variant((320, 640), 2 / 3, "(max-width: 600px) 100vw, 320px"),
+    # swipe deck: a 400px wide card, 65% of it photo
+    "card": Variant((400, 600, 800), 13 / 16, "(max-width: 600px) 100vw, 400px"),
+    # pet detail page
+    "detail": Variant((640, 960, 1280), None, "(max-width: 900px) 100vw, 900px"),
+}
+FORMATS = {"webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+           "jpg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True})}
+VARIANT_URL = f"{storage.MEDIA_URL}v/"
+RESIZABLE = (".jpg", ".jpeg", ".png", ".webp", ".gif", ".avif")
+
+_CLOUDINARY = re.compile(r"^(https?://res\.cloudinary\.com/[^/]+/image/upload/)(.+)$")
+
+
+def _pillow() -> bool:
+    # looked up, not imported: Pillow loads on the first resize
+    return importlib.util.find_spec("PIL") is not None
+
+
+def _cloudinary_url(match, variant: Variant, width: int) -> str:
+    if variant.ratio is None:
+        transform = f"c_limit,w_{width},f_auto,q_auto"
+    else:
+        transform = f"c_fill,w_{width},h_{round(width * variant.ratio)},f_auto,q_auto"
+    return f"{match.group(1)}{transform}/{match.group(2)}"
+
+
+def _local_name(image: str):
+    # "/media/<name>" of the local or memory backend, if resizable
+    if not image.startswith(storage.MEDIA_URL) or image.startswith(VARIANT_URL):
+        return None
+    name = image[len(storage.MEDIA_URL):]
+    if "/" in name or os.path.splitext(name)[1].lower() not in RESIZABLE:
+        return None
+    return name
+
+
+def variants(image: str, variant: str = "card") -> dict:
+    """
+    How to load `image` as `variant`:
+    {"src", "srcset", "webp_srcset", "sizes", "width", "height"}.
+
+    - Cloudinary images get transformation URLs (f_auto serves WebP or
+      AVIF to browsers that take them).
+    - Images on the local/memory backend get /media/v/ URLs, resized on
+      first request and cached (WebP, with JPEG for the rest).
+    - Anything else (feed URLs not copied yet, the placeholder) is used
+      as is.
+    """
+    spec = VARIANTS[variant]
+    middle = spec.widths[(len(spec.widths) - 1) // 2]
+    width = spec.widths[0]
+    height = round(width * spec.ratio) if spec.ratio else None
+    result = {"src": image, "srcset": None, "webp_srcset": None, "sizes": spec.sizes,
+              "width": width, "height": height}
+    if not image:
+        return result
+
+    match = _CLOUDINARY.match(image)
+    if match:
+        result["src"] = _cloudinary_url(match, spec, middle)
+        result["srcset"] = ", ".join(f"{_cloudinary_url(match, spec, w)} {w}w" for w in spec.widths)
+        return result
+
+    name = _local_name(image)
+    if name and _pillow():
+        def url(w, fmt):
+            return f"{VARIANT_URL}{variant}/{w}/{name}.{fmt}"
+        result["src"] = url(middle, "jpg")
+        result["srcset"] = ", ".join(f"{url(w, 'jpg')} {w}w" for w in spec.widths)
+        result["webp_srcset"] = ", ".join(f"{url(w, 'webp')} {w}w" for w in spec.widths)
+    return result
+
+
+def pet_image(image: str, alt: str, variant: str = "card", eager: bool = False, defer: bool = False,
+              css_class: str = None) -> Markup:
+    """
+    <img> (or <picture> with a WebP source) for a pet photo, for templates.
+
+    - eager: the image is above the fold (first deck card, detail photo);
+      otherwise it is loading="lazy".
+    - defer: sources go in data-src / data-srcset, to be set by script
+      when needed (swipe cards further down the deck).
+    """
+    v = variants(image, variant)
+    prefix = "data-" if defer else ""
+    attrs = [f'{prefix}src="{escape(v["src"])}"']
+    if v["srcset"]:
+        attrs.append(f'{prefix}srcset="{escape(v["srcset"])}" sizes="{escape(v["sizes"])}"')
+    attrs.append(f'alt="{escape(alt)}"')
+    if v["height"]:
+        attrs.append(f'width="{v["width"]}" height="{v["height"]}"')
+    if css_class:
+        attrs.append(f'class="{escape(css_class)}"')
+    attrs.append('fetchpriority="high"' if eager else 'loading="lazy" decoding="async"')
+    img = f"<img {' '.join(attrs)} />"
+    if v["webp_srcset"]:
+        source = (f'<source type="image/webp" {prefix}srcset="{escape(v["webp_srcset"])}" '
+                  f'sizes="{escape(v["sizes"])}" />')
+        return Markup(f"<picture>{source}{img}</picture>")
+    return Markup(img)
+
+
+def render(data: bytes, variant: str, width: int, fmt: str) -> bytes:
+    """
+    One rendition of an image: cropped to the variant's shape (or scaled
+    to fit its width), never enlarged.
+    """
+    from PIL import Image, ImageOps
+
+    spec = VARIANTS[variant]
+    pil_format, _, options = FORMATS[fmt]
+    with Image.open(io.BytesIO(data)) as original:
+        img = ImageOps.exif_transpose(original)
+        img.load()
+    if spec.ratio is None:
+        img.thumbnail((width, width * 4), Image.LANCZOS)
+    else:
+        size = (min(width, img.width), round(min(width, img.width) * spec.ratio))
+        img = ImageOps.fit(img, size, Image.LANCZOS)
+    if pil_format == "JPEG":
+        img = img.convert("RGB")
+    elif img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA")
+    out = io.BytesIO()
+    img.save(out, pil_format, **options)
+    return out.getvalue()
+
+
+def _cache_dir() -> str:
+    return current_app.extensions["image_variants_dir"]
+
+
+def _variant(variant, width, name):
+    """
+    /media/v/<variant>/<width>/<stored name>.<webp|jpg>: rendered on first
+    request, then served from the cache directory.
+    """
+    spec = VARIANTS.get(variant)
+    original, _, fmt = name.rpartition(".")
+    if spec is None or width not in spec.widths or fmt not in FORMATS or "/" in original:
+        abort(404)
+    directory = os.path.join(_cache_dir(), variant, str(width))
+    if not os.path.exists(os.path.join(directory, name)):
+        data = storage.get_storage().read(original)
+        if data is None:
+            abort(404)
+        try:
+            rendered = render(data, variant, width, fmt)
+        except Exception as e:
+            print(f"Image variant error ({name}): {e}")
+            abort(404)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, name)
+        # concurrent first requests each write their own file; last one wins
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(rendered)
+        os.replace(tmp, path)
+    # stored names are content hashes, so a rendition never changes
+    return send_from_directory(directory, name, mimetype=FORMATS[fmt][1], max_age=365 * 24 * 3600)
+
+
+def init_app(app):
+    """
+    Register the pet_image template helper and the /media/v/ renditions.
+
+    - IMAGE_VARIANTS_DIR: cache of rendered variants (default: under the
+      system temp dir).
+    """
+    app.extensions["image_variants_dir"] = app.config.get(
+        "IMAGE_VARIANTS_DIR", os.getenv("IMAGE_VARIANTS_DIR")
+    ) or os.path.join(tempfile.gettempdir(), "take-a-paw-variants")
+    app.add_url_rule(f"{VARIANT_URL}<variant>/<int:width>/<name>", "image_variant", _variant)
+    app.jinja_env.globals["pet_image"] = pet_image
@@ -0,0 +1,323 @@
+# app/importer.py
+import csv
+import io
+import json
+import os
+import random
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import click
+
+from . import daily_stats, geo, matching
+from .cache import CATALOG, invalidate_on_commit
+from .db import db
+from .models import SHUFFLE_KEY_SPACE, ImageFetch, Pet
+
+FORMATS = ("csv", "jsonl")
+BATCH_SIZE = 5000
+DEFAULT_SOURCE = "import"
+# per-row errors kept in a report; the rest are only counted
+MAX_ERRORS = 1000
+
+REQUIRED = ("external_id", "name", "species", "breed", "age", "gender",
+            "location", "description", "image")
+OPTIONAL = ("home_type", "activity_level", "experience", "time_commitment",
+            "family_situation")
+# feed field -> Pet column, for fields whose names differ
+RENAMED = {"contact_email": "contact_email_override", "contact_phone": "contact_phone_override"}
+FLAGS = {"adopted": False, "public_contact": True}
+
+_TRUE = {"1", "true", "yes", "y"}
+_FALSE = {"0", "false", "no", "n", ""}
+
+# images already on our storage are not fetched again
+OWN_IMAGE_HOSTS = ("res.cloudinary.com",)
+
+
+def detect_format(filename: str):
+    """
+    "csv" or "jsonl" from a file name (.csv, .jsonl, .ndjson), else None.
+    """
+    ext = os.path.splitext(filename or "")[1].lower()
+    return {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}.get(ext)
+
+
+def read_rows(stream, fmt: str):
+    """
+    Yield (line number, raw dict) from a binary stream, one row at a time.
+
+    Lines that are not a JSON object come back as (line, None).
+    """
+    if not hasattr(stream, "readable"):
+        # werkzeug spools uploads to a SpooledTemporaryFile, which only has
+        # the io methods TextIOWrapper needs from Python 3.11; the file it
+        # wraps (BytesIO or a temporary file) always has them
+        stream = getattr(stream, "_file", stream)
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line, raw in enumerate(text, start=1):
+        if not raw.strip():
+            continue
+        try:
+            row = json.loads(raw)
+        except ValueError:
+            row = None
+        yield line, row if isinstance(row, dict) else None
+
+
+# checked against the Pet column sizes, e.g. name -> 120
+_LENGTHS = {
+    c.name: c.type.length for c in Pet.__table__.columns if getattr(c.type, "length", None)
+}
+
+
+def _text(raw: dict, field: str):
+    value = raw.get(field)
+    if value is None:
+        return ""
+    return str(value).strip()
+
+
+def _flag(raw: dict, field: str, default: bool) -> bool:
+    value = raw.get(field)
+    if isinstance(value, bool):
+        return value
+    value = "" if value is None else str(value).strip().lower()
+    if value == "":
+        return default
+    if value in _TRUE:
+        return True
+    if value in _FALSE:
+        return False
+    raise ValueError(f"{field} must be true or false")
+
+
+def validate(raw: dict) -> dict:
+    """
+    Turn one feed row into Pet column values, or raise ValueError.
+
+    Applies the same rules as the listing form: required fields must be
+    non-empty, species is capitalized, optional fields are None when blank.
+    Lengths are checked against the Pet columns.
+    """
+    row = {f: _text(raw, f) for f in REQUIRED}
+    missing = [f for f in REQUIRED if not row[f]]
+    if missing:
+        raise ValueError(f"missing fields: {', '.join(missing)}")
+
+    row["species"] = row["species"].capitalize()
+    for field in OPTIONAL + tuple(RENAMED):
+        row[RENAMED.get(field, field)] = _text(raw, field) or None
+    for field, default in FLAGS.items():
+        row[field] = _flag(raw, field, default)
+
+    for column, value in row.items():
+        limit = _LENGTHS.get(column)
+        if limit and isinstance(value, str) and len(value) > limit:
+            raise ValueError(f"{column} is longer than {limit} characters")
+    if not row["image"].lower().startswith(("http://", "https://")):
+        raise ValueError("image must be an http(s) URL")
+    return row
+
+
+class ImportReport:
+    """
+    Running totals of one import: rows read, inserted, skipped as
+    duplicates, failed (with line numbers and messages), and throughput.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.images_queued = 0
+        self.errors = []
+        self.started = time.monotonic()
+
+    def error(self, line: int, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    @property
+    def seconds(self) -> float:
+        return time.monotonic() - self.started
+
+    def as_dict(self) -> dict:
+        seconds = self.seconds
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "images_queued": self.images_queued,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(self.rows / seconds) if seconds else None,
+            "errors": self.errors,
+        }
+
+
+class _Geocoder:
+    # feeds repeat the same few locations; resolve each one once
+    def __init__(self):
+        self._points = {}
+
+    def __call__(self, location: str) -> dict:
+        if location not in self._points:
+            point = geo.geocode(location)
+            if point is None:
+                self._points[location] = {"latitude": None, "longitude": None, "geohash": None}
+            else:
+                self._points[location] = {
+                    "latitude": point[0],
+                    "longitude": point[1],
+                    "geohash": geo.geohash_encode(*point),
+                }
+        return self._points[location]
+
+
+def _needs_fetch(url: str) -> bool:
+    return urlsplit(url).hostname not in OWN_IMAGE_HOSTS
+
+
+def _write_batch(batch, source: str, owner_id, geocode, report: ImportReport):
+    """
+    Insert one batch of validated rows and commit.
+
+    - Feed ids already imported from this source (or repeated within the
+      batch) are skipped: one indexed lookup per batch.
+    - Pets go in with one executemany INSERT; the ORM flush hooks do not
+      see them, so the daily stats are counted here and the match index
+      is expired by the caller.
+    """
+    external_ids = list({row["external_id"] for _, row in batch})
+    existing = {
+        eid for (eid,) in db.session.query(Pet.external_id)
+        .filter(Pet.source == source, Pet.external_id.in_(external_ids))
+    }
+
+    now = datetime.now(timezone.utc)
+    rows = []
+    for _, row in batch:
+        if row["external_id"] in existing:
+            report.duplicates += 1
+            continue
+        existing.add(row["external_id"])
+        row.update(geocode(row["location"]))
+        row.update(
+            source=source,
+            owner_id=owner_id,
+            created_at=now,
+            adopted_at=now if row["adopted"] else None,
+            shuffle_key=random.randrange(SHUFFLE_KEY_SPACE),
+        )
+        rows.append(row)
+    if not rows:
+        return
+
+    db.session.execute(Pet.__table__.insert(), rows)
+    daily_stats.count_listings(rows)
+
+    ids = dict(
+        db.session.query(Pet.external_id, Pet.id)
+        .filter(Pet.source == source, Pet.external_id.in_([r["external_id"] for r in rows]))
+    )
+    fetches = [
+        {"pet_id": ids[r["external_id"]], "url": r["image"], "attempts": 0, "created_at": now}
+        for r in rows if _needs_fetch(r["image"])
+    ]
+    if fetches:
+        db.session.execute(ImageFetch.__table__.insert(), fetches)
+
+    invalidate_on_commit(CATALOG)
+    db.session.commit()
+    report.inserted += len(rows)
+    report.images_queued += len(fetches)
+
+
+def import_pets(stream, fmt: str, source: str = DEFAULT_SOURCE, owner_id: int = None,
+                batch_size: int = BATCH_SIZE, progress=None) -> ImportReport:
+    """
+    Stream a CSV or JSONL feed of pets into the database.
+
+    - Rows are validated one by one (see validate); bad rows are reported
+      with their line number and the rest of the feed still loads.
+    - Valid rows are written in batches of batch_size, each in its own
+      transaction, so memory stays flat and a failure loses one batch.
+    - Images stay at the feed's URL and are queued for copying to our
+      storage (see app/image_queue.py, flask fetch-images).
+    - progress(report) is called after every batch.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+
+    report = ImportReport()
+    geocode = _Geocoder()
+    batch = []
+
+    def flush():
+        try:
+            _write_batch(batch, source, owner_id, geocode, report)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Import batch error: {e}")
+            for line, _ in batch:
+                report.error(line, "batch failed to write")
+        batch.clear()
+        if progress is not None:
+            progress(report)
+
+    for line, raw in read_rows(stream, fmt):
+        report.rows += 1
+        if raw is None:
+            report.error(line, "not a JSON object")
+            continue
+        try:
+            batch.append((line, validate(raw)))
+        except ValueError as e:
+            report.error(line, str(e))
+            continue
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    if report.inserted:
+        matching.expire()
+    return report
+
+
+def init_app(app):
+    @app.cli.command("import-pets")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--format", "fmt", type=click.Choice(FORMATS), help="Defaults to the file extension.")
+    @click.option("--source", default=DEFAULT_SOURCE, show_default=True, help="Feed name; external ids are unique per source.")
+    @click.option("--owner-id", type=int, help="User the listings belong to.")
+    @click.option("--batch-size", default=BATCH_SIZE, show_default=True)
+    def import_pets_command(path, fmt, source, owner_id, batch_size):
+        """Import pets from a CSV or JSONL feed."""
+        fmt = fmt or detect_format(path)
+        if fmt is None:
+            raise click.UsageError("cannot tell the format from the file name; pass --format")
+
+        def progress(report):
+            click.echo(f"  {report.rows} rows, {report.inserted} inserted, "
+                       f"{report.rows / max(report.seconds, 1e-9):,.0f} rows/s")
+
+        with open(path, "rb") as f:
+            summary = import_pets(f, fmt, source, owner_id, max(1, batch_size), progress).as_dict()
+        for err in summary["errors"][:20]:
+            click.echo(f"  line {err['line']}: {err['error']}")
+        click.echo(
+            f"Read {summary['rows']} rows in {summary['seconds']}s "
+            f"({summary['rows_per_second']} rows/s): {summary['inserted']} inserted, "
+            f"{summary['duplicates']} duplicates, {summary['failed']} failed, "
+            f"{summary['images_queued']} images queued."
+        )
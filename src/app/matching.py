@@ -0,0 +1,439 @@
+# app/matching.py
+import bisect
+import threading
+import time
+
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+from .db import db
+from .models import Pet
+
+# quiz questions, in matrix column order, with the options each one allows
+# (same values as the <select>s in quiz.html and add_pet.html)
+TRAITS = {
+    "home_type": ["apartment", "house_with_yard", "farm"],
+    "activity_level": ["low", "medium", "high"],
+    "experience": ["beginner", "intermediate", "advanced"],
+    "time_commitment": ["low", "medium", "high"],
+    "family_situation": ["no_children", "older_children", "small_children", "other_pets_ok"],
+}
+TRAIT_NAMES = list(TRAITS)
+
+# how much each question counts towards the final score
+WEIGHTS = {
+    "home_type": 1.0,
+    "activity_level": 1.0,
+    "experience": 1.5,
+    "time_commitment": 1.0,
+    "family_situation": 1.5,
+}
+
+# compatibility when the listing leaves a trait empty ("no preference")
+UNKNOWN = 0.6
+
+# matches kept per answer combination (what /quiz/results returns)
+RESULT_SIZE = 10
+
+# reload from the database at least this often, to pick up listings written
+# by other worker processes
+DEFAULT_MAX_AGE = 60.0
+
+
+def _ordinal(answer: int, pet: int, size: int) -> float:
+    # closer on a low/medium/high scale is better
+    return 1.0 - abs(answer - pet) / (size - 1)
+
+
+def _at_least(answer: int, pet: int, size: int) -> float:
+    # the adopter covers what the pet needs; falling short costs per step
+    return 1.0 if answer >= pet else 1.0 - (pet - answer) / (size - 1)
+
+
+_FAMILY = {
+    # answer -> compatibility with each pet value, in TRAITS order:
+    # no_children, older_children, small_children, other_pets_ok
+    "no_children": [1.0, 1.0, 1.0, 0.8],
+    "older_children": [0.3, 1.0, 1.0, 0.7],
+    "small_children": [0.0, 0.4, 1.0, 0.5],
+    "other_pets_ok": [0.5, 0.5, 0.5, 1.0],
+}
+
+
+def _compat_row(trait: str, answer: str):
+    """
+    Compatibility of one quiz answer with every possible pet value of a trait.
+
+    Index 0 is "listing left it empty", index i+1 is TRAITS[trait][i].
+    """
+    options = TRAITS[trait]
+    a = options.index(answer)
+    size = len(options)
+    if trait == "home_type":
+        # a pet that copes with less space is fine with more of it
+        row = [_at_least(a, p, size) for p in range(size)]
+    elif trait in ("experience", "time_commitment"):
+        row = [_at_least(a, p, size) for p in range(size)]
+    elif trait == "activity_level":
+        row = [_ordinal(a, p, size) for p in range(size)]
+    else:
+        row = _FAMILY[answer]
+    return np.array([UNKNOWN] + row, dtype=np.float32)
+
+
+def normalize_answers(data: dict) -> dict:
+    """
+    Keep only known quiz answers; unknown values count as "no preference".
+    """
+    return {
+        t: data[t]
+        for t in TRAIT_NAMES
+        if isinstance(data.get(t), str) and data[t] in TRAITS[t]
+    }
+
+
+def encode_pet(pet) -> np.ndarray:
+    """
+    Trait codes for one pet: 0 for empty/unknown, otherwise option index + 1.
+    """
+    codes = np.zeros(len(TRAIT_NAMES), dtype=np.int8)
+    for col, t in enumerate(TRAIT_NAMES):
+        value = getattr(pet, t)
+        if value in TRAITS[t]:
+            codes[col] = TRAITS[t].index(value) + 1
+    return codes
+
+
+# answer combinations and pet trait profiles share one mixed-radix space:
+# digit 0 is "no preference" / "left empty", digit i+1 is TRAITS[trait][i]
+_DIMS = tuple(len(TRAITS[t]) + 1 for t in TRAIT_NAMES)
+_RADIX = np.array([int(np.prod(_DIMS[i + 1:])) for i in range(len(_DIMS))], dtype=np.int64)
+COMBINATIONS = int(np.prod(_DIMS))
+
+
+def answer_key(answers: dict) -> tuple:
+    """
+    Normalized answer tuple: per question, 0 for no preference or the
+    option index + 1.
+    """
+    return tuple(
+        TRAITS[t].index(answers[t]) + 1 if answers.get(t) in TRAITS[t] else 0
+        for t in TRAIT_NAMES
+    )
+
+
+def _score_matrix() -> np.ndarray:
+    """
+    Score of every pet profile for every answer combination, as a
+    (COMBINATIONS, COMBINATIONS) float32 matrix (1280 x 1280, about 6.5 MB).
+
+    Weighted mean of the answered questions' _compat_row values, rounded so
+    that profiles scoring the same on paper compare equal.
+    """
+    digits = np.indices(_DIMS).reshape(len(_DIMS), -1)
+    total = np.zeros(COMBINATIONS, dtype=np.float32)
+    scores = np.zeros((COMBINATIONS, COMBINATIONS), dtype=np.float32)
+    for col, t in enumerate(TRAIT_NAMES):
+        table = np.zeros((_DIMS[col], _DIMS[col]), dtype=np.float32)
+        for i, answer in enumerate(TRAITS[t]):
+            table[i + 1] = _compat_row(t, answer)
+        w = WEIGHTS[t]
+        scores += w * table[digits[col][:, None], digits[col][None, :]]
+        total += w * (digits[col] > 0)
+    answered = total > 0
+    scores[answered] /= total[answered][:, None]
+    scores[~answered] = 1.0
+    return np.round(scores, 6)
+
+
+class ResultTable:
+    """
+    Precomputed quiz results: the RESULT_SIZE best pet ids for every answer
+    combination, so a quiz submission is a dictionary lookup.
+
+    Scores only depend on a pet's trait profile (the tuple of its five trait
+    codes), and there are as few profiles as answer combinations. Pets are
+    therefore grouped by profile, and a combination is (re)computed by
+    walking profiles from best to worst score until enough ids are found,
+    which costs the same whatever the catalog size.
+
+    When a pet is added, changed or removed, only combinations for which
+    it scores at least as well as the current last entry are refreshed.
+    """
+
+    # shared by every table: the score matrix and, per combination, the
+    # profiles sorted best first
+    _scores = None
+    _order = None
+
+    def __init__(self, size: int = RESULT_SIZE):
+        self.size = size
+        if ResultTable._scores is None:
+            scores = _score_matrix()
+            ResultTable._order = np.argsort(-scores, axis=1, kind="stable").astype(np.int16)
+            ResultTable._scores = scores
+        self._lock = threading.Lock()
+        self._members = [[] for _ in range(COMBINATIONS)]
+        # newest pet id per profile, 0 when the profile has no pets
+        self._newest = np.zeros(COMBINATIONS, dtype=np.int64)
+        self._profile_of = {}
+        self._results = [[] for _ in range(COMBINATIONS)]
+        # score of the last entry per combination; -1 while not full
+        self._threshold = np.full(COMBINATIONS, -1.0, dtype=np.float32)
+        self.refreshed = 0
+
+    def load(self, ids: np.ndarray, codes: np.ndarray):
+        """
+        Rebuild every combination from parallel arrays of ids and trait codes.
+        """
+        profiles = codes.astype(np.int64) @ _RADIX
+        order = np.lexsort((ids, profiles))
+        ids, profiles = ids[order], profiles[order]
+        bounds = np.flatnonzero(np.diff(profiles)) + 1
+        with self._lock:
+            self._members = [[] for _ in range(COMBINATIONS)]
+            self._profile_of = dict(zip(ids.tolist(), profiles.tolist()))
+            for group_ids, group_profiles in zip(np.split(ids, bounds), np.split(profiles, bounds)):
+                if len(group_ids):
+                    # ascending ids, so the newest listings sit at the end
+                    self._members[int(group_profiles[0])] = group_ids.tolist()
+            self._newest = np.array([m[-1] if m else 0 for m in self._members], dtype=np.int64)
+            for combo in range(COMBINATIONS):
+                self._refresh(combo)
+
+    def move(self, pet_id: int, codes):
+        """
+        Record that a pet now has the given trait codes (None: no longer
+        available) and refresh the combinations it may enter or leave.
+        """
+        new = None if codes is None else int(np.asarray(codes, dtype=np.int64) @ _RADIX)
+        with self._lock:
+            old = self._profile_of.pop(pet_id, None)
+            if old == new:
+                if new is not None:
+                    self._profile_of[pet_id] = new
+                return
+            affected = np.zeros(COMBINATIONS, dtype=bool)
+            if old is not None:
+                members = self._members[old]
+                i = bisect.bisect_left(members, pet_id)
+                if i < len(members) and members[i] == pet_id:
+                    members.pop(i)
+                self._newest[old] = members[-1] if members else 0
+                affected |= self._scores[:, old] >= self._threshold
+            if new is not None:
+                bisect.insort(self._members[new], pet_id)
+                self._newest[new] = self._members[new][-1]
+                self._profile_of[pet_id] = new
+                affected |= self._scores[:, new] >= self._threshold
+            for combo in np.flatnonzero(affected):
+                self._refresh(int(combo))
+
+    def _refresh(self, combo: int):
+        row = self._scores[combo]
+        profiles = self._order[combo]
+        profiles = profiles[self._newest[profiles] > 0]
+        ranked = -row[profiles]
+        result = []
+        start = 0
+        while start < len(profiles) and len(result) < self.size:
+            # profiles with the same score form one tier; within a tier the
+            # newer listing (higher id) comes first
+            score = row[profiles[start]]
+            end = int(np.searchsorted(ranked, -score, side="right"))
+            tier = profiles[start:end]
+            need = self.size - len(result)
+            if len(tier) > need:
+                # the `need` newest ids of a tier all come from the `need`
+                # profiles holding the newest listings
+                tier = tier[np.argpartition(-self._newest[tier], need - 1)[:need]]
+            ids = sorted((pid for p in tier for pid in self._members[p][-need:]), reverse=True)
+            result.extend((pid, float(score)) for pid in ids[:need])
+            start = end
+        self._results[combo] = result
+        self._threshold[combo] = result[-1][1] if len(result) == self.size else -1.0
+        self.refreshed += 1
+
+    def lookup(self, key: tuple):
+        """
+        [(pet_id, score 0..1)] for a normalized answer tuple, best first.
+        """
+        return list(self._results[int(np.dot(key, _RADIX))])
+
+
+class MatchIndex:
+    """
+    Precomputed quiz results (ResultTable) for every available pet.
+
+    Writes in this process are applied incrementally after each commit.
+    Once the index is older than max_age, get_index rebuilds it from the
+    database in a background thread to pick up writes from other
+    processes; the old index keeps answering until the new one replaces it.
+    """
+
+    def __init__(self, max_age: float = DEFAULT_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self.table = ResultTable()
+        self.loaded_at = None
+        self.journal = None
+        self.replaced_by = None
+
+    def __len__(self):
+        return len(self.table._profile_of)
+
+    def load(self, rows):
+        """
+        Replace every pet from (id, *traits) tuples.
+        """
+        rows = list(rows)
+        n = len(rows)
+        codes = np.zeros((n, len(TRAIT_NAMES)), dtype=np.int8)
+        ids = np.zeros(n, dtype=np.int64)
+        if n:
+            columns = list(zip(*rows))
+            ids[:] = np.fromiter(columns[0], dtype=np.int64, count=n)
+            for col, t in enumerate(TRAIT_NAMES):
+                lookup = {v: i + 1 for i, v in enumerate(TRAITS[t])}
+                codes[:, col] = np.fromiter(
+                    (lookup.get(v, 0) for v in columns[col + 1]), dtype=np.int8, count=n
+                )
+        with self._lock:
+            self.table.load(ids, codes)
+            self.loaded_at = time.monotonic()
+
+    def load_from_db(self):
+        q = db.session.query(Pet.id, *[getattr(Pet, t) for t in TRAIT_NAMES]).filter(
+            Pet.adopted.is_(False)
+        )
+        self.load(q.yield_per(5000))
+
+    def stale(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.max_age
+
+    def move(self, pet_id: int, codes):
+        """
+        Record a pet's trait codes (None: no longer available), on the index
+        that replaced this one if a reload has finished meanwhile.
+        """
+        with self._lock:
+            target = self.replaced_by
+            if target is None:
+                if self.journal is not None:
+                    self.journal.append((pet_id, codes))
+                self.table.move(pet_id, codes)
+        if target is not None:
+            target.move(pet_id, codes)
+
+    def upsert(self, pet_id: int, codes: np.ndarray):
+        self.move(pet_id, codes)
+
+    def remove(self, pet_id: int):
+        self.move(pet_id, None)
+
+    def results(self, answers: dict):
+        """
+        Precomputed best matches for the answers, [(pet_id, score 0..1)].
+        """
+        return self.table.lookup(answer_key(answers))
+
+
+def _reload(app, old):
+    with app.app_context():
+        try:
+            fresh = MatchIndex(old.max_age)
+            fresh.load_from_db()
+            with old._lock:
+                # pets committed while loading may be missing from the
+                # snapshot; replaying them is safe because a move only
+                # records the pet's latest state
+                for pet_id, codes in old.journal or ():
+                    fresh.move(pet_id, codes)
+                old.replaced_by = fresh
+                app.extensions["match_index"] = fresh
+        except Exception as e:
+            print(f"Match index reload failed: {e}")
+        finally:
+            old.journal = None
+
+
+def get_index() -> MatchIndex:
+    """
+    Return this app's match index.
+
+    Loaded synchronously on first use; afterwards a stale index keeps
+    serving while a background thread reloads it.
+    """
+    index = current_app.extensions.get("match_index")
+    if index is None:
+        index = MatchIndex(current_app.config.get("MATCH_INDEX_MAX_AGE", DEFAULT_MAX_AGE))
+        index.load_from_db()
+        current_app.extensions["match_index"] = index
+        return index
+
+    if index.stale():
+        with index._lock:
+            starting = index.journal is None and index.replaced_by is None
+            if starting:
+                index.journal = []
+        if starting:
+            threading.Thread(
+                target=_reload,
+                args=(current_app._get_current_object(), index),
+                daemon=True,
+            ).start()
+    return index
+
+
+def expire():
+    """
+    Reload this app's match index, in the background, on next use, e.g.
+    after a bulk write that bypassed the ORM events below.
+    """
+    index = current_app.extensions.get("match_index")
+    if index is not None:
+        index.loaded_at = None
+
+
+def remove_on_commit(*pet_ids):
+    """
+    Drop pets from the match index once the current transaction commits,
+    for deletes the ORM flush never sees (bulk and database-cascaded ones).
+    """
+    pending = db.session.info.setdefault("match_changes", {})
+    for pet_id in pet_ids:
+        pending[pet_id] = None
+
+
+def _after_flush(session, flush_context):
+    # remember what changed; it is applied only once the commit succeeds
+    pending = session.info.setdefault("match_changes", {})
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Pet):
+            pending[obj.id] = None if obj.adopted else encode_pet(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Pet):
+            pending[obj.id] = None
+
+
+def _after_commit(session):
+    changes = session.info.pop("match_changes", None)
+    if not changes or not has_app_context():
+        return
+    index = current_app.extensions.get("match_index")
+    if index is None:
+        return
+    for pet_id, codes in changes.items():
+        index.move(pet_id, codes)
+
+
+def _after_rollback(session):
+    session.info.pop("match_changes", None)
+
+
+def init_app(app):
+    if not event.contains(db.session, "after_commit", _after_commit):
+        event.listen(db.session, "after_flush", _after_flush)
+        event.listen(db.session, "after_commit", _after_commit)
+        event.listen(db.session, "after_rollback", _after_rollback)
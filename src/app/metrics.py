@@ -0,0 +1,315 @@
+# app/metrics.py
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import current_app, g, has_app_context, has_request_context, request
+
+from .db import db, on_statement, time_statements
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+UPLOAD_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    "http_request_duration_seconds": (
+        "histogram", "Request latency by endpoint, method and status.", LATENCY_BUCKETS),
+    "http_requests_in_flight": ("gauge", "Requests being served right now.", None),
+    "db_queries_per_request": (
+        "histogram", "SQL statements executed per request, by endpoint.", QUERY_COUNT_BUCKETS),
+    "db_time_per_request_seconds": (
+        "histogram", "Time spent in SQL statements per request, by endpoint.", LATENCY_BUCKETS),
+    "db_pool_checkout_seconds": (
+        "histogram", "Time to get a connection from the pool (including connects).", LATENCY_BUCKETS),
+    "image_upload_seconds": (
+        "histogram", "Image storage latency by backend, source and outcome.", UPLOAD_BUCKETS),
+}
+
+# seconds between writes of this worker's snapshot in multi-process mode
+FLUSH_INTERVAL = 5.0
+
+
+class Registry:
+    """
+    Counters, gauges and histograms for one process.
+
+    Recording is a dict update under a lock. In multi-process mode
+    (METRICS_DIR set, e.g. gunicorn workers) every process writes its
+    values to METRICS_DIR/metrics_<pid>.json every few seconds and the
+    /metrics view adds all files together. Histograms and counters of
+    workers that have exited are kept; their gauges are dropped.
+    """
+
+    def __init__(self, directory: str = None):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._pid = None
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._gauges = {}
+        self._histograms = {}
+        self._flusher = None
+
+    def _check_fork(self):
+        # a forked worker starts from zero and writes its own file
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+        if self.directory and self._flusher is None:
+            with self._lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                    self._flusher.start()
+
+    def inc(self, name: str, amount: float = 1.0, **labels):
+        self._check_fork()
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0.0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        self._check_fork()
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                # one slot per bucket, +Inf, then sum
+                hist = self._histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            hist[bisect_left(buckets, value)] += 1
+            hist[-1] += value
+
+    @contextmanager
+    def timed(self, name: str, **labels):
+        """
+        Observe how long the block takes; labels gain outcome=ok/error.
+        """
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            yield
+            outcome = "ok"
+        finally:
+            self.observe(name, time.perf_counter() - start, outcome=outcome, **labels)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "gauges": [[n, list(l), v] for (n, l), v in self._gauges.items()],
+                "histograms": [[n, list(l), list(h)] for (n, l), h in self._histograms.items()],
+            }
+
+    def _path(self, pid: int) -> str:
+        return os.path.join(self.directory, f"metrics_{pid}.json")
+
+    def flush(self):
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(os.getpid())
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Metrics flush error: {e}")
+
+    def _snapshots(self):
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, "metrics_*.json")):
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def collect(self):
+        """
+        ({(name, labels): value} gauges, {(name, labels): histogram}) summed
+        over every process.
+        """
+        gauges, histograms = {}, {}
+        for snap in self._snapshots():
+            alive = snap["pid"] == os.getpid() or _alive(snap["pid"])
+            if alive:
+                for name, labels, value in snap["gauges"]:
+                    key = (name, tuple(tuple(pair) for pair in labels))
+                    gauges[key] = gauges.get(key, 0.0) + value
+            for name, labels, hist in snap["histograms"]:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                total = histograms.get(key)
+                histograms[key] = hist if total is None else [a + b for a, b in zip(total, hist)]
+        return gauges, histograms
+
+    def render(self) -> str:
+        """
+        Everything in the Prometheus text exposition format (version 0.0.4).
+        """
+        gauges, histograms = self.collect()
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                for (metric, labels), hist in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(buckets + ("+Inf",), hist[:-1]):
+                        cumulative += count
+                        le = bound if bound == "+Inf" else repr(float(bound))
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(labels)} {hist[-1]!r}")
+                    lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+            else:
+                values = [(labels, v) for (metric, labels), v in gauges.items() if metric == name]
+                for labels, value in sorted(values) or [((), 0.0)]:
+                    lines.append(f"{name}{_labels(labels)} {value!r}")
+        return "\n".join(lines) + "\n"
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def get_registry():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get("metrics")
+
+
+def timed(name: str, **labels):
+    """
+    Time a block into a histogram of the current app, if metrics are on.
+    """
+    registry = get_registry()
+    if registry is None:
+        return _untimed()
+    return registry.timed(name, **labels)
+
+
+@contextmanager
+def _untimed():
+    yield
+
+
+def _endpoint() -> str:
+    return request.endpoint or "unmatched"
+
+
+def _before_request():
+    registry = current_app.extensions["metrics"]
+    g.metrics_start = time.perf_counter()
+    g.db_queries = 0
+    g.db_seconds = 0.0
+    registry.inc("http_requests_in_flight")
+
+
+def _after_request(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+def _teardown_request(exc):
+    start = g.pop("metrics_start", None)
+    if start is None:
+        return
+    registry = current_app.extensions["metrics"]
+    endpoint = _endpoint()
+    registry.inc("http_requests_in_flight", -1)
+    registry.observe(
+        "http_request_duration_seconds",
+        time.perf_counter() - start,
+        endpoint=endpoint,
+        method=request.method,
+        status=str(g.pop("metrics_status", 500)),
+    )
+    registry.observe("db_queries_per_request", g.pop("db_queries", 0), endpoint=endpoint)
+    registry.observe("db_time_per_request_seconds", g.pop("db_seconds", 0.0), endpoint=endpoint)
+
+
+def _count_statement(conn, cursor, statement, parameters, executemany, seconds):
+    # statements from background threads belong to no request
+    if has_request_context() and "db_queries" in g:
+        g.db_queries += 1
+        g.db_seconds += seconds
+
+
+def _time_checkouts(engine, registry):
+    # Engine.raw_connection is where every connection is taken from the
+    # pool; wrapping the engine (not the pool) survives engine.dispose()
+    if getattr(engine, "_metrics_wrapped", False):
+        return
+    raw_connection = engine.raw_connection
+
+    def timed_raw_connection(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return raw_connection(*args, **kwargs)
+        finally:
+            registry.observe("db_pool_checkout_seconds", time.perf_counter() - start)
+
+    engine.raw_connection = timed_raw_connection
+    engine._metrics_wrapped = True
+
+
+def init_app(app):
+    """
+    Record request, database and upload metrics for an app.
+
+    - METRICS: set to "off" to disable.
+    - METRICS_DIR: shared directory for multi-process mode (one file per
+      worker); unset means this process only.
+    """
+    enabled = str(app.config.get("METRICS", os.getenv("METRICS", "on"))).lower()
+    if enabled in ("0", "off", "false", "no"):
+        app.extensions["metrics"] = None
+        return None
+
+    registry = Registry(app.config.get("METRICS_DIR", os.getenv("METRICS_DIR")))
+    app.extensions["metrics"] = registry
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+    with app.app_context():
+        on_statement(_count_statement)
+        for engine in db.engines.values():
+            time_statements(engine)
+            _time_checkouts(engine, registry)
+    return registry
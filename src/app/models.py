@@ -1,8 +1,18 @@
 # app/models.py
+import random
 from datetime import datetime,timezone
 from .db import db
 
 from werkzeug.security import generate_password_hash, check_password_hash
+
+# size of the random key space used to shuffle the swipe deck
+SHUFFLE_KEY_SPACE = 2 ** 31
+
+
+def _random_shuffle_key():
+    return random.randrange(SHUFFLE_KEY_SPACE)
+
+
 class User(db.Model):
     __tablename__ = "users"
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -14,9 +24,18 @@ class User(db.Model):
     public_contact = db.Column(db.Boolean, default=True, nullable=False)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
-    # Cascade deletes pets and favorites when user is deleted
-    pets = db.relationship("Pet", backref="owner", lazy=True, cascade="all, delete-orphan")
-    favorites = db.relationship("Favorite", backref="user", lazy=True, cascade="all, delete-orphan")
+    # Pets, favorites and swipes go with the user. The database does the
+    # deleting (ON DELETE CASCADE), so the ORM never loads them for it.
+    pets = db.relationship("Pet", backref="owner", lazy=True, cascade="all, delete-orphan", passive_deletes=True)
+    favorites = db.relationship("Favorite", backref="user", lazy=True, cascade="all, delete-orphan", passive_deletes=True)
+    swipes = db.relationship("Swipe", backref="user", lazy=True, cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        # keyset pagination order for the admin user list
+        db.Index("ix_users_created", "created_at", "id"),
+        # sortable / prefix-searchable columns of the admin users grid
+        db.Index("ix_users_email", "email", "id"),
+    )
 
     def set_password(self, password: str):
         self.password_hash = generate_password_hash(password)
@@ -34,11 +53,22 @@ class Pet(db.Model):
     age = db.Column(db.String(60), nullable=False)
     gender = db.Column(db.String(30), nullable=False)
     location = db.Column(db.String(200), nullable=False)
+    # filled in from location by the offline gazetteer (see app/geo.py)
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    geohash = db.Column(db.String(12), nullable=True)
     description = db.Column(db.Text, nullable=False)
     image = db.Column(db.String(500), nullable=False)
+    # "processing" while an uploaded photo waits in the upload queue, then
+    # "ready" (or "failed"); see app/image_queue.py
+    image_status = db.Column(db.String(20), default="ready", server_default="ready", nullable=False)
     adopted = db.Column(db.Boolean, default=False, nullable=False)
+    # set when a listing is marked adopted (see app/daily_stats.py)
+    adopted_at = db.Column(db.DateTime, nullable=True)
     source = db.Column(db.String(30), default="catalog", nullable=False)
-    owner_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    # id of the listing in the feed it was imported from (see app/importer.py)
+    external_id = db.Column(db.String(120), nullable=True)
+    owner_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
 
     contact_email_override = db.Column(db.String(120), nullable=True)
     contact_phone_override = db.Column(db.String(50), nullable=True)
@@ -51,12 +81,100 @@ class Pet(db.Model):
     public_contact = db.Column(db.Boolean, default=True, nullable=False)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
-    # Cascade delete favorites when pet is deleted
-    favorited_by = db.relationship("Favorite", backref="pet", lazy=True, cascade="all, delete-orphan")
+    # random position in the swipe deck, assigned once at insert time
+    shuffle_key = db.Column(db.Integer, default=_random_shuffle_key, nullable=False)
+
+    # Favorites and swipes go with the pet (ON DELETE CASCADE, see User)
+    favorited_by = db.relationship("Favorite", backref="pet", lazy=True, cascade="all, delete-orphan", passive_deletes=True)
+    swiped_by = db.relationship("Swipe", backref="pet", lazy=True, cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        # serves the swipe deck range scans (see app/deck.py)
+        db.Index("ix_pets_deck", "adopted", "shuffle_key", "id"),
+        # keyset pagination orders (see app/pagination.py)
+        db.Index("ix_pets_created", "created_at", "id"),
+        db.Index("ix_pets_available_created", "adopted", "created_at", "id"),
+        db.Index("ix_pets_owner_created", "owner_id", "created_at", "id"),
+        # proximity search scans geohash prefix ranges
+        db.Index("ix_pets_geohash", "adopted", "geohash"),
+        # sortable columns of the admin pets grid (see app/datatables.py)
+        db.Index("ix_pets_name", "name", "id"),
+        db.Index("ix_pets_species", "species", "id"),
+        # one row per feed listing; NULL external ids never collide
+        db.Index("ux_pets_source_external", "source", "external_id", unique=True),
+    )
 
 
 class Favorite(db.Model):
     __tablename__ = "favorites"
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
-    pet_id = db.Column(db.Integer, db.ForeignKey("pets.id"), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    pet_id = db.Column(db.Integer, db.ForeignKey("pets.id", ondelete="CASCADE"), primary_key=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        db.Index("ix_favorites_user_created", "user_id", "created_at", "pet_id"),
+        # lets ON DELETE CASCADE from pets find the rows without a scan
+        db.Index("ix_favorites_pet", "pet_id"),
+    )
+
+
+class Swipe(db.Model):
+    """
+    One swipe-deck decision: liked=True for a right swipe, False for a left one.
+
+    The (user_id, pet_id) primary key doubles as the index the deck uses to
+    skip pets the user has already seen.
+    """
+    __tablename__ = "swipes"
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    pet_id = db.Column(db.Integer, db.ForeignKey("pets.id", ondelete="CASCADE"), primary_key=True)
+    liked = db.Column(db.Boolean, nullable=False)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        # lets ON DELETE CASCADE from pets find the rows without a scan
+        db.Index("ix_swipes_pet", "pet_id"),
+    )
+
+
+class DailyStat(db.Model):
+    """
+    One counter for one UTC day, e.g. ("2025-03-01", "signups", 12).
+
+    Maintained on write by app/daily_stats.py so the admin charts read a
+    small date range instead of aggregating the live tables.
+    """
+    __tablename__ = "daily_stats"
+    day = db.Column(db.Date, primary_key=True)
+    metric = db.Column(db.String(80), primary_key=True)
+    value = db.Column(db.Integer, default=0, nullable=False)
+
+
+class UserActivity(db.Model):
+    """
+    One row per user per UTC day they used the site while logged in.
+
+    Written at most once per user and day (see app/counters.py); the
+    (day, user_id) key makes "active users today" an index range count.
+    No foreign key: it is a log, and deleted users simply stop appearing.
+    """
+    __tablename__ = "user_activity"
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True)
+
+
+class ImageFetch(db.Model):
+    """
+    A pet whose image still has to be copied to our image storage: a feed
+    URL from the importer, or a listing photo spooled to local disk (see
+    app/image_queue.py).
+
+    No foreign key: jobs for pets deleted in the meantime are simply
+    dropped when processed.
+    """
+    __tablename__ = "image_fetches"
+    pet_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    url = db.Column(db.String(500), nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    error = db.Column(db.String(500), nullable=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,154 @@
+# app/pagination.py
+import base64
+import json
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+from flask import request, url_for
+from sqlalchemy import and_, or_
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class Page(NamedTuple):
+    items: list
+    next_cursor: str
+    limit: int
+
+
+def encode_cursor(state: dict) -> str:
+    """
+    Turn a cursor dict into an opaque, URL-safe token.
+    """
+    raw = json.dumps(state, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str):
+    """
+    Parse a token produced by encode_cursor.
+
+    - Returns None for missing or malformed tokens, so callers can fall back
+      to the first page instead of failing.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(state, dict):
+        return None
+    return state
+
+
+def request_limit(default: int = DEFAULT_LIMIT, maximum: int = MAX_LIMIT) -> int:
+    """
+    Read ?limit= from the current request and clamp it to [1, maximum].
+    """
+    limit = request.args.get("limit", default, type=int)
+    return max(1, min(limit or default, maximum))
+
+
+def _parse_position(state):
+    try:
+        created = datetime.fromisoformat(state["c"])
+        return _naive_utc(created), int(state["i"])
+    except (KeyError, ValueError, TypeError):
+        return None
+
+
+def _naive_utc(value: datetime) -> datetime:
+    # columns are naive DateTime holding UTC; compare like with like
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def paginate(query, created_col, id_col, cursor: str = None, limit: int = DEFAULT_LIMIT) -> Page:
+    """
+    Keyset-paginate a query on (created_at, id), newest first.
+
+    - created_col / id_col are the columns that define the order, e.g.
+      Pet.created_at and Pet.id (or Favorite.created_at and Favorite.pet_id).
+    - cursor is the opaque token from a previous Page; bad tokens restart
+      from the first page.
+    - Each page is a bounded index range scan, so page N costs the same as
+      page 1.
+
+    Rows are returned as the query yields them. The sort key is read from the
+    row itself when it is an ORM object, otherwise from the row's mapping.
+    created_at is always filled in by the model defaults, so NULLs are not
+    handled here.
+    """
+    position = _parse_position(decode_cursor(cursor) or {})
+    if position is not None:
+        created, last_id = position
+        query = query.filter(
+            or_(
+                created_col < created,
+                and_(created_col == created, id_col < last_id),
+            )
+        )
+
+    rows = (
+        query.order_by(created_col.desc(), id_col.desc())
+        .limit(limit + 1)
+        .all()
+    )
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        created, last_id = _sort_key(rows[-1], created_col, id_col)
+        next_cursor = encode_cursor({
+            "c": _naive_utc(created).isoformat(),
+            "i": last_id,
+        })
+
+    return Page(rows, next_cursor, limit)
+
+
+def _sort_key(row, created_col, id_col):
+    if hasattr(row, "_mapping"):
+        return _row_value(row, created_col), _row_value(row, id_col)
+    return getattr(row, created_col.key), getattr(row, id_col.key)
+
+
+def _row_value(row, col):
+    mapping = row._mapping
+    if col in mapping:
+        return mapping[col]
+    # the column belongs to an ORM entity selected in the row
+    for value in row:
+        if isinstance(value, col.class_):
+            return getattr(value, col.key)
+    raise KeyError(col.key)
+
+
+def next_page_url(page: Page):
+    """
+    Build the URL of the next page for the current view, keeping all other
+    query parameters. Returns None on the last page.
+    """
+    if not page.next_cursor:
+        return None
+    args = request.args.to_dict()
+    args["cursor"] = page.next_cursor
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+
+def add_page_headers(response, page: Page):
+    """
+    Attach pagination metadata to a JSON list response.
+
+    The body stays a plain JSON array for backwards compatibility; the cursor
+    travels in X-Next-Cursor and a RFC 8288 Link header.
+    """
+    response.headers["X-Limit"] = str(page.limit)
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+        response.headers["Link"] = f'<{next_page_url(page)}>; rel="next"'
+    return response
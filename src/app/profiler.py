@@ -0,0 +1,259 @@
+# app/profiler.py
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+
+from flask import current_app, g, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+# seconds between stack samples of a profiled request
+DEFAULT_INTERVAL = 0.005
+# most requests one arming may sample
+MAX_ARMED = 50
+# profiles kept on disk; older ones are deleted
+MAX_PROFILES = 200
+# how long a signed X-Profile header stays valid
+TOKEN_MAX_AGE = 3600
+HEADER = "X-Profile"
+
+
+def _label(code) -> str:
+    # "function (package/module.py:first line)"
+    path = code.co_filename.replace("\\", "/").split("/")
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+
+class Sampler:
+    """
+    Statistical profiler for one thread.
+
+    A helper thread reads the target thread's current stack every
+    `interval` seconds (sys._current_frames) and counts collapsed stacks,
+    root first: "full_dispatch_request (flask/app.py:…);list_pets (…)".
+    The profiled code itself is not instrumented, so overhead is the
+    helper thread's few microseconds per sample.
+    """
+
+    def __init__(self, thread_id: int, interval: float = DEFAULT_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _stack(self, frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = self._labels[code] = _label(code)
+            names.append(label)
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[self._stack(frame)] += 1
+            del frame
+
+
+class Profiler:
+    """
+    Decides which requests to sample and keeps the results.
+
+    A request is sampled when it carries a valid signed X-Profile header
+    (see make_token) or when its endpoint has been armed for the next N
+    requests from /admin/profiles. Arming is per worker process; the
+    header works whichever worker serves the request.
+
+    While nothing is armed, the per-request cost is one empty-dict check
+    and one header lookup.
+    """
+
+    def __init__(self, directory: str, secret: str, interval: float = DEFAULT_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self.armed = {}
+        self._lock = threading.Lock()
+        self._signer = URLSafeTimedSerializer(secret, salt="profile")
+
+    # choosing requests
+
+    def arm(self, endpoint: str, count: int):
+        with self._lock:
+            if count > 0:
+                self.armed[endpoint] = min(count, MAX_ARMED)
+            else:
+                self.armed.pop(endpoint, None)
+
+    def _take(self, endpoint: str) -> bool:
+        with self._lock:
+            left = self.armed.get(endpoint)
+            if not left:
+                return False
+            if left == 1:
+                del self.armed[endpoint]
+            else:
+                self.armed[endpoint] = left - 1
+            return True
+
+    def make_token(self, endpoint: str = None) -> str:
+        """
+        Signed X-Profile value; endpoint=None profiles any endpoint.
+        """
+        return self._signer.dumps({"e": endpoint})
+
+    def _token_allows(self, token: str, endpoint: str) -> bool:
+        try:
+            data = self._signer.loads(token, max_age=TOKEN_MAX_AGE)
+        except BadSignature:
+            return False
+        return isinstance(data, dict) and data.get("e") in (None, endpoint)
+
+    def wants(self, endpoint: str, token: str) -> bool:
+        if token and self._token_allows(token, endpoint):
+            return True
+        return bool(self.armed) and self._take(endpoint)
+
+    # storing results
+
+    def save(self, meta: dict, stacks: Counter) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        now = time.time()
+        profile_id = (f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}"
+                      f"-{int(now * 1e6) % 1000000:06d}-{uuid.uuid4().hex[:6]}")
+        data = dict(meta, id=profile_id, samples=sum(stacks.values()),
+                    interval_ms=self.interval * 1000, stacks=dict(stacks))
+        path = os.path.join(self.directory, f"{profile_id}.json")
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(data, f)
+        os.replace(f"{path}.tmp", path)
+        self._trim()
+        return profile_id
+
+    def _files(self):
+        try:
+            names = [n for n in os.listdir(self.directory) if n.endswith(".json")]
+        except FileNotFoundError:
+            return []
+        # ids start with a timestamp, so names sort oldest first
+        return sorted(names)
+
+    def _trim(self):
+        for name in self._files()[:-MAX_PROFILES]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def list(self) -> list:
+        """
+        Metadata of the stored profiles, newest first.
+        """
+        profiles = []
+        for name in reversed(self._files()):
+            profile = self.load(name[:-len(".json")])
+            if profile is not None:
+                profile.pop("stacks")
+                profiles.append(profile)
+        return profiles
+
+    def load(self, profile_id: str):
+        if not profile_id or "/" in profile_id or "\\" in profile_id or profile_id.startswith("."):
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{profile_id}.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+def folded(stacks: dict) -> str:
+    """
+    Collapsed-stack text ("a;b;c 12" per line), as read by flamegraph.pl,
+    speedscope and inferno.
+    """
+    return "".join(f"{stack} {n}\n" for stack, n in sorted(stacks.items()))
+
+
+def summarize(stacks: dict, top: int = 25):
+    """
+    (self, total) lists of (frame, samples), largest first: samples where
+    the frame was running, and samples where it was anywhere on the stack.
+    """
+    own, total = Counter(), Counter()
+    for stack, n in stacks.items():
+        frames = stack.split(";")
+        own[frames[-1]] += n
+        for frame in set(frames):
+            total[frame] += n
+    return own.most_common(top), total.most_common(top)
+
+
+def get_profiler() -> Profiler:
+    return current_app.extensions["profiler"]
+
+
+def _before_request():
+    profiler = current_app.extensions["profiler"]
+    token = request.headers.get(HEADER)
+    if not profiler.armed and not token:
+        return
+    if profiler.wants(request.endpoint or "unmatched", token):
+        g.profile_started = time.time()
+        g.profile_sampler = Sampler(threading.get_ident(), profiler.interval).start()
+
+
+def _teardown_request(exc):
+    sampler = g.pop("profile_sampler", None)
+    if sampler is None:
+        return
+    started = g.pop("profile_started")
+    stacks = sampler.stop()
+    meta = {
+        "endpoint": request.endpoint or "unmatched",
+        "method": request.method,
+        "path": request.full_path.rstrip("?"),
+        "started": started,
+        "duration_ms": round((time.time() - started) * 1000, 1),
+        "pid": os.getpid(),
+    }
+    try:
+        current_app.extensions["profiler"].save(meta, stacks)
+    except OSError as e:
+        print(f"Profile save error: {e}")
+
+
+def init_app(app):
+    """
+    Register the on-demand profiler.
+
+    - PROFILE_DIR: where profiles are stored (shared by all workers);
+      defaults to a directory under the system temp dir.
+    - PROFILE_INTERVAL: seconds between samples (default 0.005).
+    """
+    directory = app.config.get("PROFILE_DIR", os.getenv("PROFILE_DIR")) or os.path.join(
+        tempfile.gettempdir(), "take-a-paw-profiles"
+    )
+    interval = float(app.config.get("PROFILE_INTERVAL", os.getenv("PROFILE_INTERVAL", DEFAULT_INTERVAL)))
+    app.extensions["profiler"] = Profiler(directory, app.secret_key, interval)
+    app.before_request(_before_request)
+    app.teardown_request(_teardown_request)
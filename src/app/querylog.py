@@ -0,0 +1,444 @@
+# app/querylog.py
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, has_request_context, request
+from sqlalchemy.pool import SingletonThreadPool, StaticPool
+
+from .db import db, on_statement, time_statements
+
+DEFAULT_SLOW_MS = 100.0
+# durations kept per fingerprint for percentiles (the most recent ones)
+WINDOW = 1000
+# slow executions kept for the "recent" list
+RECENT_SLOW = 100
+# a fingerprint's plan is captured again at most this often (seconds)
+PLAN_INTERVAL = 600
+# distinct statements whose fingerprint is remembered
+FINGERPRINT_CACHE = 4096
+MAX_FINGERPRINTS = 2000
+# seconds between writes of this worker's statistics in multi-process mode
+FLUSH_INTERVAL = 5.0
+
+# a child of the app's logger (Flask names it after the package)
+logger = logging.getLogger(__name__)
+
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b", re.I)
+_PARAM = re.compile(r"%\([^)]+\)s|%s|:\w+|\$\d+|\?")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_ROWS = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+_SPACE = re.compile(r"\s+")
+_SELECT_LIST = re.compile(r"^SELECT (?:DISTINCT )?(.+?) FROM ", re.I)
+
+
+def fingerprint(statement: str) -> str:
+    """
+    Normalize a SQL statement so executions that differ only in values
+    group together: literals and placeholders become ?, lists of them
+    (IN (...), multi-row VALUES) become (...), whitespace is collapsed.
+    """
+    sql = _COMMENT.sub(" ", statement)
+    sql = _STRING.sub("?", sql)
+    sql = _PARAM.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _LIST.sub("(...)", sql)
+    sql = _ROWS.sub("(...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+def label(sql: str) -> str:
+    """
+    Short form of a fingerprint for listings: the outer SELECT's column
+    list becomes "…", so the tables and conditions stay visible.
+    """
+    return _SELECT_LIST.sub("SELECT … FROM ", sql, count=1)
+
+
+def _percentile(ordered, q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _Stats:
+    __slots__ = ("id", "sql", "count", "total", "max", "recent", "plan", "plan_at", "slow")
+
+    def __init__(self, sql: str, window: int = WINDOW):
+        self.id = hashlib.sha1(sql.encode()).hexdigest()[:12]
+        self.sql = sql
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow = 0
+        self.recent = deque(maxlen=window)
+        self.plan = None
+        self.plan_at = 0.0
+
+    def row(self) -> list:
+        return [self.sql, self.count, self.total, self.max, self.slow,
+                [round(ms, 3) for ms in self.recent], self.plan, self.plan_at]
+
+    def add(self, row):
+        """
+        Add another process's numbers (a row()) to these.
+        """
+        _, count, total, peak, slow, recent, plan, plan_at = row
+        self.count += count
+        self.total += total
+        self.max = max(self.max, peak)
+        self.slow += slow
+        self.recent.extend(recent)
+        if plan is not None and plan_at >= self.plan_at:
+            self.plan, self.plan_at = plan, plan_at
+
+    def summary(self) -> dict:
+        ordered = sorted(self.recent)
+        return {
+            "id": self.id,
+            "sql": self.sql,
+            "label": label(self.sql),
+            "count": self.count,
+            "slow": self.slow,
+            "total_ms": round(self.total, 2),
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(_percentile(ordered, 0.50), 3),
+            "p95_ms": round(_percentile(ordered, 0.95), 3),
+            "p99_ms": round(_percentile(ordered, 0.99), 3),
+            "max_ms": round(self.max, 3),
+            "plan": self.plan,
+            "plan_at": self.plan_at or None,
+        }
+
+
+class QueryLog:
+    """
+    Statement statistics grouped by fingerprint.
+
+    Every statement's duration is added to its fingerprint (count, total,
+    max, and the last WINDOW durations for percentiles). Statements slower
+    than slow_ms are also kept in a short "recent slow" list, and for
+    SELECTs the database's plan is captured (EXPLAIN, at most once per
+    fingerprint every PLAN_INTERVAL seconds) by a background thread on a
+    connection of its own.
+
+    Recording is per process. With a shared directory (e.g. gunicorn
+    workers) every process writes its numbers to
+    directory/queries_<pid>.json every few seconds and collect() adds all
+    files together, like the metrics Registry. reset() leaves a
+    queries_reset marker that makes every process start over.
+    """
+
+    def __init__(self, slow_ms: float = DEFAULT_SLOW_MS, explain: bool = True, directory: str = None):
+        self.slow_ms = slow_ms
+        self.explain = explain
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._fingerprints = {}
+        self._pid = None
+        self._clear(time.time())
+
+    def _clear(self, started: float):
+        self._pid = os.getpid()
+        self.started = started
+        self._stats = {}
+        self.recent_slow = deque(maxlen=RECENT_SLOW)
+        self._flusher = None
+        self._explainer = None
+        self._dirty = False
+
+    def _check_fork(self):
+        # a forked worker starts from zero and writes its own file
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._clear(time.time())
+        if self.directory and self._flusher is None:
+            with self._lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                    self._flusher.start()
+
+    def _fingerprint(self, statement: str) -> str:
+        # the same statement text comes back on every execution; only the
+        # parameters change, so normalizing once per text is enough
+        sql = self._fingerprints.get(statement)
+        if sql is None:
+            sql = fingerprint(statement)
+            if len(self._fingerprints) >= FINGERPRINT_CACHE:
+                self._fingerprints.clear()
+            self._fingerprints[statement] = sql
+        return sql
+
+    def record(self, statement: str, ms: float):
+        """
+        Add one execution. Returns the fingerprint's stats if the statement
+        was slow and its plan is due for capture, else None.
+        """
+        self._check_fork()
+        sql = self._fingerprint(statement)
+        with self._lock:
+            stats = self._stats.get(sql)
+            if stats is None:
+                if len(self._stats) >= MAX_FINGERPRINTS:
+                    return None
+                stats = self._stats[sql] = _Stats(sql)
+            stats.count += 1
+            stats.total += ms
+            stats.recent.append(ms)
+            if ms > stats.max:
+                stats.max = ms
+            self._dirty = True
+            if ms < self.slow_ms:
+                return None
+            stats.slow += 1
+            self.recent_slow.append({
+                "at": time.time(),
+                "id": stats.id,
+                "ms": round(ms, 2),
+                "endpoint": request.endpoint if has_request_context() else None,
+                "sql": label(sql),
+            })
+            if self.explain and time.time() - stats.plan_at > PLAN_INTERVAL:
+                # claim the capture so concurrent slow runs do not repeat it
+                stats.plan_at = time.time()
+                return stats
+        return None
+
+    def capture_plan(self, engine, stats, statement, parameters):
+        """
+        EXPLAIN a slow statement in the background and keep the plan on
+        its fingerprint; the request that ran it does not wait.
+        """
+        with self._lock:
+            if self._explainer is None:
+                # one thread: plans are rare and should not load the database
+                self._explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="querylog-explain")
+            explainer = self._explainer
+        return explainer.submit(self._explain, engine, stats, statement, parameters)
+
+    def _explain(self, engine, stats, statement, parameters):
+        try:
+            plan = _capture_plan(engine, statement, parameters)
+        except Exception:
+            logger.exception("Query plan capture failed")
+            return
+        if plan is None:
+            return
+        with self._lock:
+            stats.plan = plan
+            self._dirty = True
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "started": self.started,
+                "stats": [s.row() for s in self._stats.values()],
+                "recent_slow": list(self.recent_slow),
+            }
+
+    def _path(self, pid: int) -> str:
+        return os.path.join(self.directory, f"queries_{pid}.json")
+
+    def _reset_at(self) -> float:
+        try:
+            with open(os.path.join(self.directory, "queries_reset")) as f:
+                return float(f.read())
+        except (OSError, ValueError):
+            return 0.0
+
+    def flush(self):
+        if not self.directory:
+            return
+        # another worker reset the statistics since this one last wrote
+        reset_at = self._reset_at()
+        if reset_at > self.started:
+            with self._lock:
+                self._stats.clear()
+                self.recent_slow.clear()
+                self.started = reset_at
+                self._dirty = True
+        if not self._dirty and os.path.exists(self._path(os.getpid())):
+            return
+        self._dirty = False
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(os.getpid())
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Query log flush error: {e}")
+
+    def _snapshots(self):
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush()
+        reset_at = self._reset_at()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, "queries_*.json")):
+            try:
+                with open(path) as f:
+                    snap = json.load(f)
+            except (OSError, ValueError):
+                continue
+            # written before the last reset and not yet cleared by its worker
+            if snap["started"] >= reset_at:
+                snapshots.append(snap)
+        return snapshots
+
+    def collect(self) -> dict:
+        """
+        Statistics of every process: "queries" (summaries, largest total
+        time first), "recent_slow" (oldest first), "started" and "workers".
+        """
+        snapshots = self._snapshots()
+        merged = {}
+        recent = []
+        for snap in snapshots:
+            for row in snap["stats"]:
+                stats = merged.get(row[0])
+                if stats is None:
+                    # percentiles over the last WINDOW runs of each worker
+                    stats = merged[row[0]] = _Stats(row[0], window=None)
+                stats.add(row)
+            recent.extend(snap["recent_slow"])
+        recent.sort(key=lambda r: r["at"])
+        return {
+            "queries": sorted((s.summary() for s in merged.values()), key=lambda r: -r["total_ms"]),
+            "recent_slow": recent[-RECENT_SLOW:],
+            "started": min((snap["started"] for snap in snapshots), default=self.started),
+            "workers": len(snapshots),
+        }
+
+    def summaries(self) -> list:
+        """
+        Every fingerprint's summary, largest total time first.
+        """
+        return self.collect()["queries"]
+
+    def get(self, fingerprint_id: str):
+        for summary in self.summaries():
+            if summary["id"] == fingerprint_id:
+                return summary
+        return None
+
+    def reset(self):
+        """
+        Start over, in every process sharing the directory.
+        """
+        now = time.time()
+        with self._lock:
+            self._stats.clear()
+            self.recent_slow.clear()
+            self.started = now
+            self._dirty = True
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        marker = os.path.join(self.directory, "queries_reset")
+        with open(f"{marker}.tmp", "w") as f:
+            f.write(repr(now))
+        os.replace(f"{marker}.tmp", marker)
+        for path in glob.glob(os.path.join(self.directory, "queries_*.json")):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+_EXPLAIN = {
+    "postgresql": "EXPLAIN ",
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "mysql": "EXPLAIN ",
+}
+
+
+def _capture_plan(engine, statement, parameters):
+    """
+    EXPLAIN a statement on a pooled connection of its own, so the caller's
+    connection and transaction are left alone. None when the database has
+    no EXPLAIN or the pool has a single shared connection (SQLite in memory).
+    """
+    prefix = _EXPLAIN.get(engine.dialect.name)
+    if prefix is None or isinstance(engine.pool, (StaticPool, SingletonThreadPool)):
+        return None
+    raw = engine.raw_connection()
+    try:
+        explain = raw.cursor()
+        try:
+            explain.execute(prefix + statement, parameters)
+            rows = explain.fetchall()
+        except Exception as e:
+            return f"(EXPLAIN failed: {e})"
+        finally:
+            explain.close()
+            raw.rollback()
+    finally:
+        raw.close()
+    return "\n".join(" | ".join(str(col) for col in row) for row in rows)
+
+
+def _record_statement(conn, cursor, statement, parameters, executemany, seconds):
+    log = getattr(conn.engine, "_query_log", None)
+    if log is None:
+        return
+    stats = log.record(statement, seconds * 1000)
+    if stats is None or executemany:
+        return
+    if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        return
+    # the DBAPI may reuse the parameter object once this statement is done
+    parameters = dict(parameters) if isinstance(parameters, dict) else tuple(parameters or ())
+    log.capture_plan(conn.engine, stats, statement, parameters)
+
+
+def get_query_log():
+    return current_app.extensions.get("query_log")
+
+
+def init_app(app):
+    """
+    Time every SQL statement of this app's engines.
+
+    - QUERY_LOG: "off" disables it.
+    - SLOW_QUERY_MS: threshold for the slow list and plan capture (100).
+    - QUERY_LOG_EXPLAIN: "off" skips plan capture.
+    - QUERY_LOG_DIR: shared directory for multi-process mode (one file per
+      worker); defaults to METRICS_DIR, unset means this process only.
+    """
+    enabled = str(app.config.get("QUERY_LOG", os.getenv("QUERY_LOG", "on"))).lower()
+    if enabled in ("0", "off", "false", "no"):
+        app.extensions["query_log"] = None
+        return None
+
+    slow_ms = float(app.config.get("SLOW_QUERY_MS", os.getenv("SLOW_QUERY_MS", DEFAULT_SLOW_MS)))
+    explain = str(app.config.get("QUERY_LOG_EXPLAIN", os.getenv("QUERY_LOG_EXPLAIN", "on"))).lower()
+    directory = app.config.get("QUERY_LOG_DIR", os.getenv("QUERY_LOG_DIR")) or \
+        app.config.get("METRICS_DIR", os.getenv("METRICS_DIR"))
+    log = QueryLog(slow_ms, explain not in ("0", "off", "false", "no"), directory)
+    app.extensions["query_log"] = log
+
+    with app.app_context():
+        for engine in db.engines.values():
+            # statements are recorded into the log of the app owning the engine
+            engine._query_log = log
+            time_statements(engine)
+        on_statement(_record_statement)
+    return log
@@ -0,0 +1,439 @@
+# app/recommend.py
+import math
+import threading
+import time
+from collections import OrderedDict
+
+import click
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy import func
+
+from .db import db
+from .models import Favorite
+
+# neighbours kept per pet by a full build
+NEIGHBOURS = 50
+# only a user's most recent favorites count; caps the k^2 pairs one heavy
+# user would otherwise add to the build
+MAX_USER_FAVORITES = 200
+# favorites a user's recommendations are built from
+RECENT_FAVORITES = 50
+# size of the cold-start list
+POPULAR = 200
+# co-favorite pairs generated per build step; bounds peak build memory
+PAIR_CHUNK = 4_000_000
+# users whose ranked list is kept between requests
+USER_CACHE_SIZE = 10_000
+
+# full rebuild from the favorites table at least this often, which also
+# picks up favorites written by other worker processes
+DEFAULT_MAX_AGE = 900.0
+
+
+def _group_starts(keys: np.ndarray) -> np.ndarray:
+    return np.r_[0, np.flatnonzero(np.diff(keys)) + 1] if len(keys) else np.zeros(0, dtype=np.int64)
+
+
+def _cap_per_user(user_ids, pet_ids, cap):
+    # rows arrive grouped by user, most recent first
+    starts = _group_starts(user_ids)
+    sizes = np.diff(np.r_[starts, len(user_ids)])
+    rank = np.arange(len(user_ids)) - np.repeat(starts, sizes)
+    keep = rank < cap
+    return user_ids[keep], pet_ids[keep]
+
+
+class CoFavoriteIndex:
+    """
+    Sparse item-item similarity built from the favorites table.
+
+    Two pets are similar when the same users favorited both; the score is
+    the cosine co_favorites / sqrt(favorites_a * favorites_b). A full build
+    keeps the NEIGHBOURS most similar pets of each pet in CSR arrays, plus
+    every user's recent favorites. Favorites toggled afterwards are applied
+    as small deltas on top (record), until the next full build folds them in.
+    """
+
+    def __init__(self, popular=()):
+        self._lock = threading.Lock()
+        self.built_at = None
+        self.journal = None
+        self.replaced_by = None
+        self.stats = {}
+        self._items = np.zeros(0, dtype=np.int64)
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._nbr_ptr = np.zeros(1, dtype=np.int64)
+        self._nbr_ids = np.zeros(0, dtype=np.int32)
+        self._nbr_co = np.zeros(0, dtype=np.int32)
+        self._users = np.zeros(0, dtype=np.int64)
+        self._fav_ptr = np.zeros(1, dtype=np.int64)
+        self._fav_ids = np.zeros(0, dtype=np.int32)
+        self._popular = list(popular)
+        self._count_delta = {}
+        self._co_delta = {}
+        self._user_delta = {}
+        self._user_cache = OrderedDict()
+
+    def build(self, user_ids, pet_ids):
+        """
+        Build from parallel arrays of favorites, grouped by user with each
+        user's most recent favorite first.
+
+        Pairs are generated a block of pets at a time (at most PAIR_CHUNK per
+        block), counted, and cut down to the top NEIGHBOURS per pet before the
+        next block, so memory stays bounded at any number of favorites.
+        """
+        start_time = time.perf_counter()
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        pet_ids = np.asarray(pet_ids, dtype=np.int64)
+        user_ids, pet_ids = _cap_per_user(user_ids, pet_ids, MAX_USER_FAVORITES)
+
+        users, uidx = np.unique(user_ids, return_inverse=True)
+        items, iidx = np.unique(pet_ids, return_inverse=True)
+        n = len(items)
+        counts = np.bincount(iidx, minlength=n)
+
+        # user -> favorite items (recent first); item -> users
+        by_user = np.argsort(uidx, kind="stable")
+        fav_ptr = np.r_[0, np.cumsum(np.bincount(uidx, minlength=len(users)))]
+        fav_ids = iidx[by_user].astype(np.int32)
+        user_sizes = np.diff(fav_ptr)
+        by_item = np.argsort(iidx, kind="stable")
+        item_ptr = np.r_[0, np.cumsum(counts)]
+        item_users = uidx[by_item]
+
+        nbr_counts = np.zeros(n, dtype=np.int64)
+        nbr_ids, nbr_co = [], []
+        pairs = 0
+        if n:
+            pair_totals = np.cumsum(np.add.reduceat(user_sizes[item_users], item_ptr[:-1]))
+            a = 0
+            while a < n:
+                done = pair_totals[a - 1] if a else 0
+                b = max(a + 1, int(np.searchsorted(pair_totals, done + PAIR_CHUNK, side="right")))
+                ids, co, kept = self._block_neighbours(
+                    a, b, counts, item_ptr, item_users, fav_ptr, fav_ids, user_sizes,
+                )
+                nbr_ids.append(ids)
+                nbr_co.append(co)
+                nbr_counts[a:b] = kept
+                pairs += int(pair_totals[b - 1] - done)
+                a = b
+
+        popular = items[np.lexsort((-items, -counts))[:POPULAR]].tolist()
+
+        with self._lock:
+            self._items, self._counts = items, counts
+            self._nbr_ptr = np.r_[0, np.cumsum(nbr_counts)]
+            self._nbr_ids = np.concatenate(nbr_ids) if nbr_ids else np.zeros(0, dtype=np.int32)
+            self._nbr_co = np.concatenate(nbr_co) if nbr_co else np.zeros(0, dtype=np.int32)
+            self._users, self._fav_ptr, self._fav_ids = users, fav_ptr, fav_ids
+            self._popular = popular
+            self._count_delta, self._co_delta, self._user_delta = {}, {}, {}
+            self._user_cache.clear()
+            self.built_at = time.monotonic()
+            self.stats = {
+                "favorites": int(len(pet_ids)),
+                "users": int(len(users)),
+                "pets": int(n),
+                "pairs": pairs,
+                "neighbours": int(len(self._nbr_ids)),
+                "bytes": int(sum(a.nbytes for a in (
+                    self._items, self._counts, self._nbr_ptr, self._nbr_ids,
+                    self._nbr_co, self._users, self._fav_ptr, self._fav_ids,
+                ))),
+                "build_s": round(time.perf_counter() - start_time, 3),
+            }
+
+    @staticmethod
+    def _block_neighbours(a, b, counts, item_ptr, item_users, fav_ptr, fav_ids, user_sizes):
+        # every (item in a..b, other favorite of a user who liked it) pair
+        n = len(counts)
+        row_users = item_users[item_ptr[a]:item_ptr[b]]
+        row_items = np.repeat(np.arange(a, b), counts[a:b])
+        sizes = user_sizes[row_users]
+        left = np.repeat(row_items, sizes)
+        within = np.arange(len(left)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        right = fav_ids[np.repeat(fav_ptr[row_users], sizes) + within]
+        keep = left != right
+
+        keys, co = np.unique((left[keep] - a) * n + right[keep], return_counts=True)
+        left, right = keys // n + a, keys % n
+        sim = co / np.sqrt(counts[left] * counts[right])
+
+        # best NEIGHBOURS per pet; ties go to the newer pet (higher id)
+        order = np.lexsort((-right, -sim, left))
+        left, right, co = left[order], right[order], co[order]
+        starts = _group_starts(left)
+        rank = np.arange(len(left)) - np.repeat(starts, np.diff(np.r_[starts, len(left)]))
+        top = rank < NEIGHBOURS
+        kept = np.bincount(left[top] - a, minlength=b - a)
+        return right[top].astype(np.int32), co[top].astype(np.int32), kept
+
+    def stale(self, max_age: float) -> bool:
+        return self.built_at is None or time.monotonic() - self.built_at > max_age
+
+    def _dense(self, pet_id: int):
+        i = int(np.searchsorted(self._items, pet_id))
+        if i < len(self._items) and self._items[i] == pet_id:
+            return i
+        return None
+
+    def count(self, pet_id: int) -> int:
+        i = self._dense(pet_id)
+        base = int(self._counts[i]) if i is not None else 0
+        return base + self._count_delta.get(pet_id, 0)
+
+    def favorites_of(self, user_id) -> list:
+        """
+        The user's favorite pet ids, most recent first.
+        """
+        delta = self._user_delta.get(user_id, {})
+        recent = [pid for pid, liked in reversed(delta.items()) if liked]
+        j = int(np.searchsorted(self._users, user_id))
+        base = []
+        if j < len(self._users) and self._users[j] == user_id:
+            dense = self._fav_ids[self._fav_ptr[j]:self._fav_ptr[j + 1]]
+            base = [pid for pid in self._items[dense].tolist() if pid not in delta]
+        return recent + base
+
+    def similar_scores(self, pet_id: int) -> dict:
+        """
+        {other pet id: cosine similarity} for a pet's neighbours.
+        """
+        co = {}
+        i = self._dense(pet_id)
+        if i is not None:
+            s, e = self._nbr_ptr[i], self._nbr_ptr[i + 1]
+            co = dict(zip(self._items[self._nbr_ids[s:e]].tolist(), self._nbr_co[s:e].tolist()))
+        for other, d in self._co_delta.get(pet_id, {}).items():
+            co[other] = co.get(other, 0) + d
+
+        mine = self.count(pet_id)
+        scores = {}
+        for other, c in co.items():
+            theirs = self.count(other)
+            if c > 0 and mine > 0 and theirs > 0:
+                scores[other] = c / math.sqrt(mine * theirs)
+        return scores
+
+    def similar(self, pet_id: int, k: int = 6) -> list:
+        """
+        Pets most often favorited together with this one, best first.
+        """
+        with self._lock:
+            scores = self.similar_scores(pet_id)
+        return sorted(scores, key=lambda q: (-scores[q], -q))[:k]
+
+    def for_user(self, user_id, k: int = 10) -> list:
+        """
+        Ranked candidate pet ids for a user, excluding their own favorites.
+
+        Sums the similarity of each candidate to the user's RECENT_FAVORITES
+        most recent favorites. Users with no (or too thin a) history get the
+        most favorited pets instead. Lists are cached per user until their
+        favorites change or the index is rebuilt.
+        """
+        with self._lock:
+            cached = self._user_cache.get((user_id, k))
+            if cached is not None:
+                return cached
+
+            favorites = self.favorites_of(user_id) if user_id else []
+            seen = set(favorites)
+            scores = {}
+            for pid in favorites[:RECENT_FAVORITES]:
+                for other, s in self.similar_scores(pid).items():
+                    if other not in seen:
+                        scores[other] = scores.get(other, 0.0) + s
+            ranked = sorted(scores, key=lambda q: (-scores[q], -q))[:k]
+            if len(ranked) < k:
+                taken = seen.union(ranked)
+                ranked += [pid for pid in self._popular if pid not in taken][:k - len(ranked)]
+
+            self._user_cache[(user_id, k)] = ranked
+            while len(self._user_cache) > USER_CACHE_SIZE:
+                self._user_cache.popitem(last=False)
+        return ranked
+
+    def record(self, user_id: int, pet_id: int, liked: bool):
+        """
+        Apply one committed favorite (liked=True) or unfavorite.
+
+        Idempotent: re-recording the current state changes nothing, so a
+        replayed or duplicated event is harmless.
+        """
+        with self._lock:
+            if self.replaced_by is not None:
+                target = self.replaced_by
+            else:
+                target = None
+                if self.journal is not None:
+                    self.journal.append((user_id, pet_id, liked))
+                favorites = self.favorites_of(user_id)
+                if (pet_id in favorites) != liked:
+                    self._apply(user_id, pet_id, liked, favorites)
+        if target is not None:
+            target.record(user_id, pet_id, liked)
+
+    def _apply(self, user_id, pet_id, liked, favorites):
+        step = 1 if liked else -1
+        self._count_delta[pet_id] = self._count_delta.get(pet_id, 0) + step
+        row = self._co_delta.setdefault(pet_id, {})
+        for other in favorites[:MAX_USER_FAVORITES]:
+            if other == pet_id:
+                continue
+            row[other] = row.get(other, 0) + step
+            back = self._co_delta.setdefault(other, {})
+            back[pet_id] = back.get(pet_id, 0) + step
+        delta = self._user_delta.setdefault(user_id, {})
+        delta.pop(pet_id, None)
+        delta[pet_id] = liked
+        # this user's list changed; others only drift slightly until rebuild
+        for key in [key for key in self._user_cache if key[0] == user_id]:
+            del self._user_cache[key]
+
+
+def load_favorites():
+    """
+    (user_ids, pet_ids) arrays of every favorite, grouped by user with the
+    most recent first (served by ix_favorites_user_created).
+    """
+    rows = (
+        db.session.query(Favorite.user_id, Favorite.pet_id)
+        .order_by(Favorite.user_id, Favorite.created_at.desc(), Favorite.pet_id.desc())
+        .yield_per(10000)
+    )
+    pairs = np.array(list(rows), dtype=np.int64).reshape(-1, 2)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def load_popular():
+    """
+    The POPULAR most favorited pet ids, what an index serves until its first
+    build finishes (an aggregate over ix_favorites_pet).
+    """
+    rows = (
+        db.session.query(Favorite.pet_id)
+        .group_by(Favorite.pet_id)
+        .order_by(func.count().desc(), Favorite.pet_id.desc())
+        .limit(POPULAR)
+    )
+    return [pid for pid, in rows]
+
+
+def _rebuild(app, old):
+    with app.app_context():
+        try:
+            fresh = CoFavoriteIndex()
+            fresh.build(*load_favorites())
+            with old._lock:
+                # favorites committed while building may be missing from the
+                # snapshot; replaying them is safe because record is idempotent
+                for event in old.journal or ():
+                    fresh.record(*event)
+                old.replaced_by = fresh
+                app.extensions["recommender"] = fresh
+        except Exception as e:
+            print(f"Recommendation rebuild failed: {e}")
+        finally:
+            old.journal = None
+
+
+def get_recommender() -> CoFavoriteIndex:
+    """
+    Return this app's recommendation index.
+
+    Built by a background thread, like every later rebuild: until the first
+    build finishes, every user gets the most favorited pets, and afterwards
+    a stale index keeps serving while its replacement is built.
+    """
+    index = current_app.extensions.get("recommender")
+    if index is None:
+        index = CoFavoriteIndex(popular=load_popular())
+        current_app.extensions["recommender"] = index
+
+    max_age = current_app.config.get("RECOMMENDER_MAX_AGE", DEFAULT_MAX_AGE)
+    if index.stale(max_age):
+        with index._lock:
+            starting = index.journal is None and index.replaced_by is None
+            if starting:
+                index.journal = []
+        if starting:
+            threading.Thread(
+                target=_rebuild,
+                args=(current_app._get_current_object(), index),
+                daemon=True,
+            ).start()
+    return index
+
+
+def record_favorite(user_id: int, pet_id: int, liked: bool):
+    """
+    Feed a committed favorite change to this process's index, if it exists.
+    """
+    if not has_app_context():
+        return
+    index = current_app.extensions.get("recommender")
+    if index is not None:
+        index.record(user_id, pet_id, liked)
+
+
+def evaluate(user_ids, pet_ids, k: int = 10, sample: int = 2000, seed: int = 0) -> dict:
+    """
+    Offline leave-last-out evaluation.
+
+    Each sampled user with at least two favorites has their most recent one
+    hidden, the index is built from everything else, and we check whether
+    the hidden pet shows up in their top k (hit rate), against the plain
+    popularity list as a baseline.
+    """
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    pet_ids = np.asarray(pet_ids, dtype=np.int64)
+    starts = _group_starts(user_ids)
+    sizes = np.diff(np.r_[starts, len(user_ids)])
+    held = starts[sizes >= 2]
+
+    train = np.ones(len(user_ids), dtype=bool)
+    train[held] = False
+    index = CoFavoriteIndex()
+    index.build(user_ids[train], pet_ids[train])
+
+    rng = np.random.default_rng(seed)
+    picked = rng.choice(held, size=min(sample, len(held)), replace=False) if len(held) else held
+    hits = popular_hits = 0
+    timings = []
+    recommended = set()
+    for row in picked:
+        user, target = int(user_ids[row]), int(pet_ids[row])
+        start = time.perf_counter()
+        recs = index.for_user(user, k)
+        timings.append(time.perf_counter() - start)
+        recommended.update(recs)
+        hits += target in recs
+        with index._lock:
+            seen = set(index.favorites_of(user))
+        popular_hits += target in [p for p in index._popular if p not in seen][:k]
+
+    users = len(picked)
+    timings.sort()
+    return {
+        "users": users,
+        "hit_rate": round(hits / users, 4) if users else None,
+        "popular_hit_rate": round(popular_hits / users, 4) if users else None,
+        "coverage": round(len(recommended) / max(1, index.stats["pets"]), 4),
+        "p50_ms": round(timings[len(timings) // 2] * 1000, 3) if timings else None,
+        **index.stats,
+    }
+
+
+def init_app(app):
+    @app.cli.command("recommend-evaluate")
+    @click.option("--k", default=10, show_default=True, help="List length to score.")
+    @click.option("--sample", default=2000, show_default=True, help="Users to evaluate.")
+    def recommend_evaluate_command(k, sample):
+        """Leave-last-out hit rate of "also liked" recommendations."""
+        result = evaluate(*load_favorites(), k=k, sample=sample)
+        for key, value in result.items():
+            click.echo(f"{key}: {value}")
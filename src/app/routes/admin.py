@@ -1,9 +1,14 @@
-from flask import Blueprint, render_template, session, redirect, url_for, flash, request, jsonify
+import time
+
+from flask import Blueprint, Response, abort, current_app, render_template, session, redirect, url_for, flash, request, jsonify
 from functools import wraps
 from ..models import Pet, User
-from sqlalchemy import func
-from datetime import date
+from sqlalchemy import func, or_
 from ..db import db  
+from .. import daily_stats, datatables, deletion, importer, profiler, querylog, search
+from ..cache import get_cache
+from ..counters import get_counters
+from .auth_utils import admin_required as admin_api_required
 
 # blueprint for all admin-related routes, mounted under /admin
 bp = Blueprint("admin", __name__, url_prefix="/admin")
@@ -95,21 +100,25 @@ def admin_dashboard():
     Show the main admin dashboard.
 
     - Pet stats: how many pets are available vs adopted.
-    - User stats: total users, users created today, active users today.
+    - User stats: total users, users created today, users active today.
+
+    Numbers come from the counter service (app/counters.py): cached for a
+    short while, planner estimates on PostgreSQL for the large totals, and
+    maintained daily counters for "today". Each shows how old it is.
     """
+    counters = get_counters()
+
     # pet statistics
     stats = {
-        "available": Pet.query.filter_by(adopted=False).count(),
-        "adopted": Pet.query.filter_by(adopted=True).count()
+        "available": counters.get("pets_available"),
+        "adopted": counters.get("pets_adopted"),
     }
 
-    today = date.today()
-
     # user statistics
     user_stats = {
-        "total_users": User.query.count(),
-        "created_today": User.query.filter(func.date(User.created_at) == today).count(),
-        "active_today": User.query.filter(func.date(User.created_at) == today).count()
+        "total_users": counters.get("users_total"),
+        "created_today": counters.get("users_created_today"),
+        "active_today": counters.get("users_active_today"),
     }
 
     return render_template(
@@ -120,45 +129,49 @@ def admin_dashboard():
     )
 
 
+@bp.get("/counters")
+@admin_api_required
+def admin_counters():
+    """
+    JSON dashboard counters with their source and age in seconds.
+
+    - ?exact=1 skips planner estimates (still cached for a short while).
+    """
+    exact = request.args.get("exact", "").lower() in ("1", "true", "yes")
+    return jsonify({"ok": True, "counters": get_counters().snapshot(exact=exact)})
+
+
+# windows offered on the charts page (any ?days= value works)
+CHART_WINDOWS = (7, 30, 90, 365)
+
+
 @bp.get("/charts")
 @admin_required
 def admin_charts():
     """
     Render the charts page for admin.
 
-    - species_counts: how many pets per species.
-    - age_counts: how many pets per age.
-    - users_counts: number of users created per day over the last 7 days.
-    """
-    # number of pets by species
-    species_counts = {
-        row[0]: row[1]
-        for row in Pet.query.with_entities(Pet.species, func.count(Pet.id))
-        .group_by(Pet.species)
-        .all()
-    }
+    - ?days= picks the window (default 30, max 3660).
+    - activity: signups, new listings, adoptions and favorites per day.
+    - species_counts / age_counts: new listings in the window by species / age.
 
-    # number of pets by age
-    age_counts = {
-        row[0]: row[1]
-        for row in Pet.query.with_entities(Pet.age, func.count(Pet.id))
-        .group_by(Pet.age)
-        .all()
-    }
+    Everything comes from the daily_stats rollup in one range query, so a
+    365-day window costs the same as a 7-day one whatever the table sizes.
+    """
+    days = request.args.get("days", daily_stats.DEFAULT_DAYS, type=int)
+    days = max(1, min(days, daily_stats.MAX_DAYS))
 
-    # users created per day for the last 7 days (including today)
-    from datetime import timedelta
-    users_counts = {}
-    for i in range(7):
-        day = date.today() - timedelta(days=i)
-        count = User.query.filter(func.date(User.created_at) == day).count()
-        users_counts[str(day)] = count
+    labels, series, totals = daily_stats.window(days)
 
     return render_template(
         "admin_charts.html",
-        species_counts=species_counts,
-        age_counts=age_counts,
-        users_counts=users_counts,
+        days=days,
+        windows=CHART_WINDOWS,
+        labels=labels,
+        activity=series,
+        totals={m: totals[m] for m in daily_stats.ACTIVITY},
+        species_counts=daily_stats.breakdown(totals, daily_stats.SPECIES),
+        age_counts=daily_stats.breakdown(totals, daily_stats.AGE),
         active="charts"
     )
 
@@ -167,20 +180,175 @@ def admin_charts():
 @admin_required
 def admin_users():
     """
-    Show the list of all users in the system, ordered by newest first.
+    Show the users grid. Rows are loaded page by page from admin_users_data.
+    """
+    return render_template("admin_users.html", active="users")
+
+
+# grid columns, in the order of the table headers
+USER_COLUMNS = (
+    datatables.Column("id", User.id),
+    datatables.Column("username", User.username),
+    datatables.Column("email", User.email),
+    datatables.Column("pets"),
+    datatables.Column("action"),
+)
+
+
+def _search_users(query, term):
+    # id, or username / email prefix; all three are indexed
+    match = or_(datatables.prefix(User.username, term), datatables.prefix(User.email, term))
+    if term.isdigit():
+        match = or_(match, User.id == int(term))
+    return query.filter(match)
+
+
+def _user_rows(ids):
+    pet_counts = dict(
+        db.session.query(Pet.owner_id, func.count())
+        .filter(Pet.owner_id.in_(ids))
+        .group_by(Pet.owner_id)
+    )
+    rows = db.session.query(User.id, User.username, User.email).filter(User.id.in_(ids))
+    return [
+        {"id": uid, "username": username, "email": email or "", "pets": pet_counts.get(uid, 0)}
+        for uid, username, email in rows
+    ]
+
+
+@bp.get("/users/data")
+@admin_api_required
+def admin_users_data():
+    """
+    DataTables server-side endpoint for the users grid.
+
+    - Accepts draw, start, length, order[0][column]/[dir] and search[value].
+    - Sortable: id, username, email. Search: id, or username / email prefix.
     """
-    users = User.query.order_by(User.id.desc()).all()
-    return render_template("admin_users.html", users=users, active="users")
+    return jsonify(datatables.serve(
+        User.query,
+        User.id,
+        USER_COLUMNS,
+        fetch=_user_rows,
+        total=get_counters().get("users_total")["value"],
+        search=_search_users,
+    ))
 
 
 @bp.get("/pets")
 @admin_required
 def admin_pets():
     """
-    Show the list of all pets, ordered by creation date (newest first).
+    Show the pets grid. Rows are loaded page by page from admin_pets_data.
+    """
+    return render_template("admin_pets.html", active="pets")
+
+
+PET_COLUMNS = (
+    datatables.Column("id", Pet.id),
+    datatables.Column("name", Pet.name),
+    datatables.Column("species", Pet.species),
+    datatables.Column("age"),
+    datatables.Column("owner"),
+    datatables.Column("action"),
+)
+
+
+def _search_pets(query, term):
+    # name / breed / location substring (trigram-indexed), or an id
+    match = search.contains(term)
+    if term.isdigit():
+        match = or_(match, Pet.id == int(term))
+    return query.filter(match)
+
+
+def _pet_rows(ids):
+    rows = (
+        db.session.query(Pet.id, Pet.name, Pet.species, Pet.age, User.username)
+        .outerjoin(User, User.id == Pet.owner_id)
+        .filter(Pet.id.in_(ids))
+    )
+    return [
+        {"id": pid, "name": name, "species": species, "age": age, "owner": owner or ""}
+        for pid, name, species, age, owner in rows
+    ]
+
+
+@bp.get("/pets/data")
+@admin_api_required
+def admin_pets_data():
+    """
+    DataTables server-side endpoint for the pets grid.
+
+    - Accepts draw, start, length, order[0][column]/[dir] and search[value].
+    - Sortable: id, name, species. Search: id, or name / breed / location
+      substring (trigram-indexed, see search.contains).
+    """
+    return jsonify(datatables.serve(
+        Pet.query,
+        Pet.id,
+        PET_COLUMNS,
+        fetch=_pet_rows,
+        total=get_counters().get("pets_total")["value"],
+        search=_search_pets,
+    ))
+
+
+def _requested_ids():
     """
-    pets = Pet.query.order_by(Pet.created_at.desc()).all()
-    return render_template("admin_pets.html", pets=pets, active="pets")
+    Ids for a bulk action: form field "ids" (repeated) or JSON {"ids": [...]}.
+    Returns (ids, error).
+    """
+    if request.is_json:
+        raw = (request.get_json(silent=True) or {}).get("ids")
+        raw = raw if isinstance(raw, list) else []
+    else:
+        raw = request.form.getlist("ids")
+    try:
+        ids = {int(i) for i in raw}
+    except (TypeError, ValueError):
+        return None, "ids must be integers"
+    if not ids:
+        return None, "Nothing selected."
+    if len(ids) > deletion.MAX_BULK_DELETE:
+        return None, f"At most {deletion.MAX_BULK_DELETE} rows per delete."
+    return sorted(ids), None
+
+
+@bp.post("/users/delete")
+@admin_required
+def admin_delete_users():
+    """
+    Delete many users (and everything they own) in one request.
+
+    - Ids come from the grid's checkboxes (see _requested_ids).
+    - A constant number of statements whatever they own: the database
+      cascades to their pets, favorites and swipes.
+    """
+    ids, error = _requested_ids()
+    if error:
+        flash(error, "error")
+        return redirect(url_for("admin.admin_users"))
+    deleted = deletion.delete_users(ids)
+    db.session.commit()
+    flash(f"{deleted} users deleted.", "success")
+    return redirect(url_for("admin.admin_users"))
+
+
+@bp.post("/pets/delete")
+@admin_required
+def admin_delete_pets():
+    """
+    Delete many pets in one request (favorites and swipes cascade).
+    """
+    ids, error = _requested_ids()
+    if error:
+        flash(error, "error")
+        return redirect(url_for("admin.admin_pets"))
+    deleted = deletion.delete_pets(ids)
+    db.session.commit()
+    flash(f"{deleted} pets deleted.", "success")
+    return redirect(url_for("admin.admin_pets"))
 
 
 @bp.post("/users/delete/<int:user_id>")
@@ -191,15 +359,17 @@ def admin_delete_user(user_id):
 
     - Only accessible to admins.
     - If user is not found, returns 404.
+    - Their listings, favorites and swipes are removed by the database.
     """
     # find user or return 404
-    user = User.query.get_or_404(user_id)
+    username = db.session.query(User.username).filter_by(id=user_id).scalar()
+    if username is None:
+        abort(404)
 
-    # delete user from db
-    db.session.delete(user)
+    deletion.delete_users([user_id])
     db.session.commit()
 
-    flash(f"User {user.username} deleted.", "success")
+    flash(f"User {username} deleted.", "success")
     return redirect(url_for("admin.admin_users"))
 
 
@@ -208,11 +378,188 @@ def admin_delete_user(user_id):
 def admin_delete_pet(pet_id):
 
     # find pet or return 404
-    pet = Pet.query.get_or_404(pet_id)
+    name = db.session.query(Pet.name).filter_by(id=pet_id).scalar()
+    if name is None:
+        abort(404)
 
-    # delete pet from db
-    db.session.delete(pet)
+    deletion.delete_pets([pet_id])
     db.session.commit()
 
-    flash(f"Pet {pet.name} deleted.", "success")
+    flash(f"Pet {name} deleted.", "success")
     return redirect(url_for("admin.admin_pets"))
+
+
+@bp.post("/import")
+@admin_api_required
+def admin_import():
+    """
+    Bulk-import pets from an uploaded CSV or JSONL feed (multipart "file").
+
+    - format: csv / jsonl, defaults to the file extension.
+    - source: feed name; external ids are deduplicated per source.
+    - owner_id: optional user the listings belong to.
+
+    Returns the import report (counts, per-row errors, rows per second).
+    Large feeds are better loaded with `flask import-pets`.
+    """
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        return jsonify({"ok": False, "error": "file is required"}), 400
+    fmt = request.form.get("format") or importer.detect_format(upload.filename)
+    if fmt not in importer.FORMATS:
+        return jsonify({"ok": False, "error": "format must be csv or jsonl"}), 400
+
+    report = importer.import_pets(
+        upload.stream,
+        fmt,
+        source=(request.form.get("source") or importer.DEFAULT_SOURCE).strip()[:30],
+        owner_id=request.form.get("owner_id", type=int),
+    )
+    return jsonify({"ok": True, **report.as_dict()})
+
+
+@bp.get("/cache")
+@admin_api_required
+def admin_cache_stats():
+    """
+    JSON hit/miss counters of the response cache (per worker process).
+    """
+    cache = get_cache()
+    if cache is None:
+        return jsonify({"ok": True, "enabled": False})
+    return jsonify({"ok": True, "enabled": True, **cache.snapshot()})
+
+
+def _profilable_endpoints():
+    return sorted({r.endpoint for r in current_app.url_map.iter_rules() if r.endpoint != "static"})
+
+
+@bp.get("/profiles")
+@admin_required
+def admin_profiles():
+    """
+    Arm the sampling profiler and browse the profiles it has stored.
+
+    - Arming samples the next N requests to one endpoint in this worker.
+    - The signed header shown on the page profiles any request it is sent
+      with, in any worker, for an hour.
+    """
+    prof = profiler.get_profiler()
+    return render_template(
+        "admin_profiles.html",
+        profiles=prof.list(),
+        armed=dict(prof.armed),
+        endpoints=_profilable_endpoints(),
+        header=profiler.HEADER,
+        token=prof.make_token(),
+        max_armed=profiler.MAX_ARMED,
+        active="profiles",
+    )
+
+
+@bp.post("/profiles/arm")
+@admin_required
+def admin_arm_profiler():
+    """
+    Sample the next `count` requests to `endpoint` (count=0 disarms).
+    """
+    endpoint = request.form.get("endpoint", "")
+    count = request.form.get("count", 1, type=int) or 0
+    if endpoint not in _profilable_endpoints():
+        flash("Unknown endpoint.", "error")
+    else:
+        profiler.get_profiler().arm(endpoint, max(0, count))
+        flash(f"Profiling the next {min(count, profiler.MAX_ARMED)} requests to {endpoint}."
+              if count > 0 else f"Stopped profiling {endpoint}.", "success")
+    return redirect(url_for("admin.admin_profiles"))
+
+
+@bp.get("/profiles/<profile_id>")
+@admin_required
+def admin_profile(profile_id):
+    """
+    One profile: where its samples were running (self) and which frames
+    they passed through (total).
+    """
+    profile = profiler.get_profiler().load(profile_id)
+    if profile is None:
+        abort(404)
+    own, total = profiler.summarize(profile["stacks"])
+    return render_template(
+        "admin_profile.html",
+        profile=profile,
+        own=own,
+        total=total,
+        active="profiles",
+    )
+
+
+@bp.get("/profiles/<profile_id>/folded")
+@admin_required
+def admin_profile_folded(profile_id):
+    """
+    Collapsed stacks for flamegraph.pl / speedscope / inferno.
+    """
+    profile = profiler.get_profiler().load(profile_id)
+    if profile is None:
+        abort(404)
+    return Response(
+        profiler.folded(profile["stacks"]),
+        mimetype="text/plain",
+        headers={"Content-Disposition": f"attachment; filename={profile_id}.folded"},
+    )
+
+
+def _clock(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+
+
+@bp.get("/queries")
+@admin_required
+def admin_queries():
+    """
+    SQL statements of every worker grouped by fingerprint, most total time
+    first, with the latest slow executions.
+    """
+    log = querylog.get_query_log()
+    if log is None:
+        abort(404)
+    collected = log.collect()
+    recent = [dict(r, at=_clock(r["at"])) for r in reversed(collected["recent_slow"])]
+    return render_template(
+        "admin_queries.html",
+        queries=collected["queries"],
+        recent=recent,
+        log=log,
+        started=_clock(collected["started"]),
+        window=querylog.WINDOW,
+        workers=collected["workers"],
+        active="queries",
+    )
+
+
+@bp.get("/queries/<fingerprint_id>")
+@admin_required
+def admin_query(fingerprint_id):
+    """
+    One fingerprint: its timings and the last captured plan.
+    """
+    log = querylog.get_query_log()
+    query = log.get(fingerprint_id) if log is not None else None
+    if query is None:
+        abort(404)
+    plan_at = _clock(query["plan_at"]) if query["plan_at"] else None
+    return render_template("admin_query.html", query=query, log=log, plan_at=plan_at, active="queries")
+
+
+@bp.post("/queries/reset")
+@admin_required
+def admin_reset_queries():
+    """
+    Start every worker's statistics over, e.g. right after a deploy.
+    """
+    log = querylog.get_query_log()
+    if log is not None:
+        log.reset()
+        flash("Query statistics reset.", "success")
+    return redirect(url_for("admin.admin_queries"))
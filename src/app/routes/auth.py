@@ -1,12 +1,22 @@
 # app/routes/auth.py
 from flask import Blueprint, request, jsonify, session, redirect, url_for, render_template, flash
+from ..cache import CATALOG, invalidate_on_commit, pet_tag
 from ..db import db
-from ..models import User
+from ..models import Pet, User
 from app.routes.auth_utils import login_required
 
 bp = Blueprint("auth", __name__)
 
 
+def _invalidate_contact(user_id):
+    """
+    Queue cache invalidation for everything that shows this user's contact
+    details: the catalog lists and each of their pets.
+    """
+    pet_ids = [pid for (pid,) in db.session.query(Pet.id).filter_by(owner_id=user_id)]
+    invalidate_on_commit(CATALOG, *[pet_tag(pid) for pid in pet_ids])
+
+
 def _normalize_username(u: str) -> str:
     """
     Take any username-like input and normalize it.
@@ -195,6 +205,7 @@ def profile_submit():
     # checkbox: if key exists in form, it's checked
     user.public_contact = "public_contact" in data
 
+    _invalidate_contact(uid)
     db.session.commit()
     flash("Profile updated successfully!", "success")
     return redirect(url_for("auth.profile_form"))
@@ -213,6 +224,7 @@ def toggle_public_contact():
     user = User.query.get(uid)
 
     user.public_contact = not user.public_contact
+    _invalidate_contact(uid)
     db.session.commit()
 
     return jsonify({"ok": True, "public_contact": user.public_contact})
@@ -1,15 +1,35 @@
 # app/routes/pets.py
 from flask import Blueprint, flash, jsonify, redirect, request, session, render_template, url_for, abort
-from sqlalchemy.sql import func
 
 from app.routes.auth_utils import login_required
+from .. import deck, deletion, geo, image_queue, images, pagination, recommend, search as pet_search, streaming, swipes
+from ..cache import CATALOG, cached, invalidate_on_commit, pet_tag
 from ..db import db
 from ..models import Favorite, Pet, User
 
 bp = Blueprint("pets", __name__)
 
+# "people who liked this also liked" cards on the pet page
+ALSO_LIKED = 4
 
-def _resolve_contact(p: Pet):
+
+def _load_owners(pets):
+    """
+    Fetch the contact fields of every owner in a result set with one query.
+
+    Returns {owner_id: row} where row has public_contact, email and phone,
+    which is all _resolve_contact needs.
+    """
+    ids = {p.owner_id for p in pets if p.owner_id is not None}
+    if not ids:
+        return {}
+    rows = db.session.query(
+        User.id, User.public_contact, User.email, User.phone
+    ).filter(User.id.in_(ids))
+    return {row.id: row for row in rows}
+
+
+def _resolve_contact(p: Pet, owners: dict = None):
     """
     Decide which contact details to show for a given pet.
 
@@ -19,8 +39,11 @@ def _resolve_contact(p: Pet):
     - Only show contact info if the owner allowed public_contact AND at least one
       of email/phone exists.
     - If not visible, return (None, None, False).
+
+    Pass owners (from _load_owners) when resolving many pets, so the lazy
+    p.owner relationship is not loaded once per pet.
     """
-    owner = p.owner
+    owner = owners.get(p.owner_id) if owners is not None else p.owner
     owner_public = owner.public_contact if owner else False
 
     email = p.contact_email_override or (owner.email if owner else None)
@@ -35,7 +58,7 @@ def _resolve_contact(p: Pet):
     return email, phone, visible
 
 
-def serialize_pet(p: Pet):
+def serialize_pet(p: Pet, owners: dict = None):
     """
     Convert a Pet ORM object into a dict suitable for JSON/API responses.
 
@@ -44,7 +67,7 @@ def serialize_pet(p: Pet):
     - Contact info (resolved via _resolve_contact)
     - Flags like adopted, public_contact, and contact_visible.
     """
-    email, phone, contact_visible = _resolve_contact(p)
+    email, phone, contact_visible = _resolve_contact(p, owners)
     return {
         "id": p.id,
         "name": p.name,
@@ -53,8 +76,11 @@ def serialize_pet(p: Pet):
         "age": p.age,
         "gender": p.gender,
         "location": p.location,
+        "latitude": p.latitude,
+        "longitude": p.longitude,
         "description": p.description,
         "image": p.image,
+        "image_status": p.image_status,
         "adopted": p.adopted,
         "source": p.source,
         "owner_id": p.owner_id,
@@ -65,15 +91,135 @@ def serialize_pet(p: Pet):
         "created_at": p.created_at.isoformat() if p.created_at else None,
     }
 
+
+def serialize_pets(pets):
+    """
+    Serialize a whole result set with a constant number of queries.
+
+    - Owners are loaded in one batch instead of one lazy load per pet.
+    """
+    owners = _load_owners(pets)
+    return [serialize_pet(p, owners) for p in pets]
+
+def _paginate_pets(query):
+    """
+    Keyset-paginate a Pet query newest first using ?cursor= and ?limit=.
+    """
+    return pagination.paginate(
+        query,
+        Pet.created_at,
+        Pet.id,
+        cursor=request.args.get("cursor"),
+        limit=pagination.request_limit(),
+    )
+
+
+def _ranked(query):
+    """
+    Apply the ?q= free-text search to a Pet query, or return None if absent.
+    """
+    text = (request.args.get("q") or "").strip()
+    if not text:
+        return None
+    return pet_search.rank_pets(query, text)
+
+
+def _search_page(query, ranked):
+    """
+    Page search results: by relevance when ranked, otherwise newest first.
+    """
+    if ranked is None:
+        return _paginate_pets(query)
+    return pet_search.ranked_page(
+        ranked,
+        cursor=request.args.get("cursor"),
+        limit=pagination.request_limit(),
+    )
+
+
+def _nearby_page(query, near):
+    """
+    Page proximity results nearest first; the cursor holds the last
+    (distance, id) so pages never overlap.
+    """
+    state = pagination.decode_cursor(request.args.get("cursor")) or {}
+    after = geo.parse_after(state.get("g"))
+    limit = pagination.request_limit()
+    results, next_after = geo.nearby(query, *near, after=after, limit=limit)
+    next_cursor = pagination.encode_cursor({"g": next_after}) if next_after else None
+    return pagination.Page([pet for pet, _ in results], next_cursor, limit)
+
+
+def _stream_pets(query):
+    """
+    Stream a Pet query newest first as a JSON array (see app/streaming.py).
+    """
+    query = query.order_by(Pet.created_at.desc(), Pet.id.desc())
+    return streaming.stream_json_array(query, serialize_pets)
+
+
+def _paginate_favorites(user_id):
+    """
+    Keyset-paginate the user's non-adopted favorites, most recently favorited first.
+    """
+    query = (
+        db.session.query(Pet, Favorite.created_at)
+        .join(Favorite, Favorite.pet_id == Pet.id)
+        .filter(Favorite.user_id == user_id, Pet.adopted.is_(False))
+    )
+    page = pagination.paginate(
+        query,
+        Favorite.created_at,
+        Pet.id,
+        cursor=request.args.get("cursor"),
+        limit=pagination.request_limit(),
+    )
+    return page._replace(items=[pet for pet, _ in page.items])
+
+
+def _catalog_tags(**kwargs):
+    return [CATALOG]
+
+
+def _pet_tags(pet_id):
+    return [pet_tag(pet_id)]
+
+
+def _pet_page_tags(pet_id):
+    # the page also shows "also liked" cards of other pets, which go away
+    # when one of those is adopted or deleted (catalog writes)
+    return [pet_tag(pet_id), CATALOG]
+
+
+def _anonymous_page():
+    """
+    True when the rendered page cannot depend on the session: nobody is
+    logged in and there are no flash messages waiting to be shown.
+    """
+    return "user_id" not in session and "_flashes" not in session
+
+
 @bp.get("/pets")
+@cached(_catalog_tags)
 def list_pets():
     """
-    Return a JSON list of all non-adopted pets in random order.
+    Return a JSON list of non-adopted pets, newest first.
+
+    - Paginated with ?limit= and ?cursor=; the next cursor is sent in the
+      X-Next-Cursor header.
+    - ?stream=1 returns every match instead, streamed from a server-side
+      cursor in constant memory.
     """
-    pets = Pet.query.filter_by(adopted=False).order_by(Pet.created_at.desc()).all()
-    return jsonify([serialize_pet(p) for p in pets])
+    q = Pet.query.filter_by(adopted=False)
+    if streaming.wants_stream(request):
+        return _stream_pets(q)
+
+    page = _paginate_pets(q)
+    response = jsonify(serialize_pets(page.items))
+    return pagination.add_page_headers(response, page)
 
 @bp.get("/pets/<int:pet_id>")
+@cached(_pet_tags)
 def pet_detail(pet_id: int):
     """
     Return JSON details for a single pet by id.
@@ -100,6 +246,7 @@ def mark_adopted(pet_id: int):
         abort(403)
 
     pet.adopted = True
+    invalidate_on_commit(CATALOG, pet_tag(pet.id))
     try:
         db.session.commit()
         flash(f"{pet.name} has been marked as adopted!", "success")
@@ -111,32 +258,50 @@ def mark_adopted(pet_id: int):
     return redirect(url_for("pets.my_listings_page"))
 
 @bp.get("/pets/search")
+@cached(_catalog_tags)
 def search():
     """
     JSON API search for pets.
 
     Filters:
+    - q: free text over name, breed, location and description; typo
+      tolerant, results ordered by relevance.
     - species: exact match (case-insensitive).
     - breed: contains substring (case-insensitive).
     - location: contains substring (case-insensitive).
+    - lat, lon, radius (km, default 30): only pets in that circle, nearest
+      first, each with distance_km.
 
-    Only returns non-adopted pets.
+    Only returns non-adopted pets, paginated (or streamed) like /pets.
     """
+    try:
+        near = geo.parse_point(request.args)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
     species = (request.args.get("species") or "").strip().lower()
     breed = (request.args.get("breed") or "").strip().lower()
     location = (request.args.get("location") or "").strip().lower()
 
-    q = Pet.query.filter_by(adopted=False)
+    q = pet_search.filter_pets(
+        Pet.query.filter_by(adopted=False),
+        species=species, breed=breed, location=location,
+    )
+    ranked = _ranked(q)
 
-    if species:
-        q = q.filter(Pet.species.ilike(species))
-    if breed:
-        q = q.filter(Pet.breed.ilike(f"%{breed}%"))
-    if location:
-        q = q.filter(Pet.location.ilike(f"%{location}%"))
+    if near is not None:
+        page = _nearby_page(ranked if ranked is not None else q, near)
+        response = jsonify(_with_distances(serialize_pets(page.items), near))
+        return pagination.add_page_headers(response, page)
 
-    pets = q.order_by(Pet.created_at.desc()).all()
-    return jsonify([serialize_pet(p) for p in pets])
+    if streaming.wants_stream(request):
+        if ranked is not None:
+            return streaming.stream_json_array(ranked, serialize_pets)
+        return _stream_pets(q)
+
+    page = _search_page(q, ranked)
+    response = jsonify(serialize_pets(page.items))
+    return pagination.add_page_headers(response, page)
 
 
 @bp.post("/pets")
@@ -147,12 +312,11 @@ def create_listing():
     Flow:
     - Require logged-in user; otherwise redirect to login.
     - Validate required fields + image.
-    - Upload image to Cloudinary.
+    - Spool the image to local disk and queue it for storage (see
+      app/image_queue.py); the listing shows a placeholder until then.
     - Create Pet row with extra adoption fields (home_type, activity_level, etc.).
     - Redirect to the newly created pet detail page (or provided 'next' URL).
     """
-    import cloudinary.uploader
-
     user_id = session.get("user_id")
     if not user_id:
         flash("Please log in to add a pet.", "error")
@@ -179,17 +343,6 @@ def create_listing():
         value = (data.get(key) or "").strip()
         return value or None
 
-    try:
-        uploaded = cloudinary.uploader.upload(
-            image_file,
-            folder="take-a-paw/pets",
-        )
-        image_url = uploaded["secure_url"]
-    except Exception as e:
-        print("Cloudinary upload error:", e)
-        flash("Image upload failed. Please try again.", "error")
-        return redirect(url_for("pets.add_pet_form"))
-
     pet = Pet(
         name=data["name"].strip(),
         species=data["species"].strip().capitalize(),
@@ -198,7 +351,6 @@ def create_listing():
         gender=data["gender"].strip(),
         location=data["location"].strip(),
         description=data["description"].strip(),
-        image=image_url,
         adopted=False,
         source="user",
         owner_id=user_id,
@@ -213,7 +365,17 @@ def create_listing():
     )
 
     db.session.add(pet)
+    try:
+        image_queue.enqueue(image_file, pet)
+    except OSError as e:
+        db.session.rollback()
+        print("Image spool error:", e)
+        flash("Image upload failed. Please try again.", "error")
+        return redirect(url_for("pets.add_pet_form"))
+    invalidate_on_commit(CATALOG)
     db.session.commit()
+    # stored in the background; the listing shows a placeholder until then
+    image_queue.submit(pet.id)
 
     flash(f"Your listing “{pet.name}” is live!", "success")
     next_url = request.form.get("next")
@@ -234,8 +396,12 @@ def my_listings_page():
         flash("Please log in to view your listings.")
         return redirect(url_for("pets.home_index"))
 
-    pets = Pet.query.filter_by(owner_id=user_id).order_by(Pet.created_at.desc()).all()
-    return render_template("my_listings.html", pets=[serialize_pet(p) for p in pets])
+    page = _paginate_pets(Pet.query.filter_by(owner_id=user_id))
+    return render_template(
+        "my_listings.html",
+        pets=serialize_pets(page.items),
+        next_url=pagination.next_page_url(page),
+    )
 
 
 @bp.post("/pets/<int:pet_id>/favorite")
@@ -248,6 +414,7 @@ def toggle_favorite(pet_id: int):
     - If user record is missing for some reason, create a basic one (fallback).
     - If pet is invalid or adopted, show error and redirect.
     - If a Favorite exists, delete it; otherwise create one.
+    - Feed the change to the "also liked" recommender (see recommend.py).
     - Flash success or error and redirect back to 'next' or Referer or home.
     """
     user_id = session.get("user_id")
@@ -279,6 +446,7 @@ def toggle_favorite(pet_id: int):
 
     try:
         db.session.commit()
+        recommend.record_favorite(user_id, pet_id, fav is None)
         flash(f"Pet {action} favorites.", "success")
     except Exception as e:
         db.session.rollback()
@@ -317,10 +485,12 @@ def delete_pet(pet_id: int):
     if pet.owner_id != user_id:
         abort(403)
 
+    name = pet.name
     try:
-        db.session.delete(pet)
+        # favorites and swipes go with it (ON DELETE CASCADE)
+        deletion.delete_pets([pet.id])
         db.session.commit()
-        flash(f"Pet '{pet.name}' has been deleted.", "success")
+        flash(f"Pet '{name}' has been deleted.", "success")
     except Exception as e:
         db.session.rollback()
         flash("Error deleting pet. Please try again.", "error")
@@ -335,18 +505,15 @@ def my_favorites_json():
     Return a JSON list of the current user's favorite pets (non-adopted only).
 
     - If the user is not logged in or has no favorites, returns an empty list.
+    - Paginated like /pets, most recently favorited first.
     """
     user_id = session.get("user_id")
     if not user_id:
         return jsonify([])
 
-    favs = Favorite.query.filter_by(user_id=user_id).all()
-    pet_ids = [f.pet_id for f in favs]
-    if not pet_ids:
-        return jsonify([])
-
-    pets = Pet.query.filter(Pet.id.in_(pet_ids), Pet.adopted == False).all()
-    return jsonify([serialize_pet(p) for p in pets])
+    page = _paginate_favorites(user_id)
+    response = jsonify(serialize_pets(page.items))
+    return pagination.add_page_headers(response, page)
 
 
 @bp.get("/favorites")
@@ -361,27 +528,162 @@ def favorites_page():
         flash("Please log in to see favorites.")
         return redirect(url_for("pets.home_index"))
 
-    favs = Favorite.query.filter_by(user_id=user_id).all()
-    ids = [f.pet_id for f in favs]
-    pets = Pet.query.filter(Pet.id.in_(ids), Pet.adopted == False).all() if ids else []
-    return render_template("favorites.html", pets=[serialize_pet(p) for p in pets])
+    page = _paginate_favorites(user_id)
+    return render_template(
+        "favorites.html",
+        pets=serialize_pets(page.items),
+        next_url=pagination.next_page_url(page),
+    )
+
+
+def _deck_seed() -> int:
+    """
+    Return the current user's swipe deck seed, creating one on first use.
+
+    The seed lives in the session so the deck order stays stable across
+    reloads and batch fetches.
+    """
+    seed = session.get("deck_seed")
+    if seed is None:
+        seed = deck.new_seed()
+        session["deck_seed"] = seed
+    return seed
+
+
+def _deck_recommendations(user_id, limit: int):
+    """
+    Pets to deal first on a fresh deck: co-favorite recommendations for
+    users with favorites, the most favorited pets for everyone else.
+    """
+    return recommend.get_recommender().for_user(user_id, limit)
+
+
+def _also_liked(pet_id: int, limit: int = ALSO_LIKED):
+    """
+    Available pets most often favorited together with this one.
+    """
+    ids = recommend.get_recommender().similar(pet_id, limit * 2)
+    if not ids:
+        return []
+    found = {p.id: p for p in Pet.query.filter(Pet.id.in_(ids), Pet.adopted.is_(False))}
+    return [found[pid] for pid in ids if pid in found][:limit]
+
+
+def _with_distances(items, near):
+    """
+    Add distance_km to serialized pets when the request was a proximity search.
+    """
+    if near is not None:
+        lat, lon, _ = near
+        for item in items:
+            if item.get("latitude") is not None:
+                item["distance_km"] = round(
+                    geo.haversine_km(lat, lon, item["latitude"], item["longitude"]), 1
+                )
+    return items
 
 
 @bp.get("/")
 def home_index():
+    """
+    Render the swipe deck with its first batch of cards.
+
+    - Excludes the user's own listings, favorites and pets already swiped.
+    - ?lat=&lon=&radius= limits the deck to nearby pets, nearest first.
+    - Otherwise likely matches (recommend.py) are dealt first.
+    - Further batches are fetched by index.html from /deck using next_cursor.
+    """
     user_id = session.get("user_id")
+    try:
+        near = geo.parse_point(request.args)
+    except ValueError as e:
+        flash(str(e), "error")
+        near = None
 
-    q = Pet.query.filter_by(adopted=False)
+    recommended = _deck_recommendations(user_id, deck.DEFAULT_BATCH) if near is None else None
+    pets, next_cursor = deck.next_batch(user_id, _deck_seed(), near=near, recommended=recommended)
+    deck_args = {}
+    if near is not None:
+        deck_args = dict(zip(("lat", "lon", "radius"), near))
 
-    if user_id:
-        own_ids = db.session.query(Pet.id).filter_by(owner_id=user_id)
-        fav_ids = db.session.query(Favorite.pet_id).filter_by(user_id=user_id)
+    return render_template(
+        "index.html",
+        pets=pets,
+        next_cursor=next_cursor,
+        deck_url=url_for("pets.deck_batch", **deck_args),
+    )
 
-        q = q.filter(~Pet.id.in_(own_ids)).filter(~Pet.id.in_(fav_ids))
 
-    pets = q.order_by(func.random()).all()
+@bp.get("/deck")
+def deck_batch():
+    """
+    JSON API returning the next batch of swipe cards.
+
+    Query params:
+    - cursor: opaque token returned by the previous batch (omit to start
+      over; a fresh deck starts with likely matches).
+    - limit: number of cards (default 10, max 50).
+    - lat, lon, radius (km, default 30): only nearby pets, nearest first.
 
-    return render_template("index.html", pets=pets)
+    Returns {"cards": [...], "next_cursor": token-or-null}; each card has
+    image_card, the sized sources of its photo.
+    """
+    user_id = session.get("user_id")
+    limit = request.args.get("limit", deck.DEFAULT_BATCH, type=int)
+    try:
+        near = geo.parse_point(request.args)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
+    cursor = request.args.get("cursor")
+    recommended = None
+    if cursor is None and near is None:
+        recommended = _deck_recommendations(user_id, max(1, min(limit, deck.MAX_BATCH)))
+    pets, next_cursor = deck.next_batch(
+        user_id, _deck_seed(), cursor, limit, near=near, recommended=recommended
+    )
+    cards = _with_distances(serialize_pets(pets), near)
+    for card in cards:
+        # sized renditions for the swipe card (see app/images.py)
+        card["image_card"] = images.variants(card["image"], "card")
+    return jsonify({
+        "cards": cards,
+        "next_cursor": next_cursor,
+    })
+
+
+@bp.post("/swipes")
+def record_swipes():
+    """
+    JSON API accepting a buffered batch of swipe decisions.
+
+    Body: {"decisions": [{"pet_id": 12, "decision": "yes"}, ...]}
+
+    - Requires login (401 JSON otherwise).
+    - Left swipes are stored so the deck stops showing those pets.
+    - Right swipes are stored and also added to favorites.
+    - Everything is written in one bulk statement per table and one commit.
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"ok": False, "error": "login required"}), 401
+
+    data = request.get_json(silent=True) or {}
+    decisions, error = swipes.parse_decisions(data.get("decisions"))
+    if error:
+        return jsonify({"ok": False, "error": error}), 400
+
+    try:
+        recorded, liked = swipes.record_decisions(user_id, decisions)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Swipe batch error: {e}")
+        return jsonify({"ok": False, "error": "could not record swipes"}), 500
+
+    for pet_id in liked:
+        recommend.record_favorite(user_id, pet_id, True)
+    return jsonify({"ok": True, "recorded": recorded, "favorited": len(liked)})
 
 
 @bp.get("/search")
@@ -395,20 +697,20 @@ def home_search():
     breed = (request.args.get("breed") or "").strip()
     location = (request.args.get("location") or "").strip()
 
-    q = Pet.query.filter_by(adopted=False)
-
-    if species:
-        q = q.filter(Pet.species.ilike(f"%{species}%"))
-    if breed:
-        q = q.filter(Pet.breed.ilike(f"%{breed}%"))
-    if location:
-        q = q.filter(Pet.location.ilike(f"%{location}%"))
-
-    pets = q.order_by(Pet.created_at.desc()).all()
-    return render_template("index.html", pets=[serialize_pet(p) for p in pets])
+    q = pet_search.filter_pets(
+        Pet.query.filter_by(adopted=False),
+        species=species, breed=breed, location=location, species_exact=False,
+    )
+    page = _search_page(q, _ranked(q))
+    return render_template(
+        "index.html",
+        pets=serialize_pets(page.items),
+        next_url=pagination.next_page_url(page),
+    )
 
 
 @bp.get("/pet/<int:pet_id>")
+@cached(_pet_page_tags, when=_anonymous_page)
 def home_pet_detail(pet_id: int):
     p = Pet.query.get(pet_id)
     if not p or p.adopted:
@@ -430,6 +732,7 @@ def home_pet_detail(pet_id: int):
         contact_phone=phone,
         contact_visible=contact_visible,
         is_favorited=is_favorited,
+        also_liked=_also_liked(pet_id),
     )
 
 @bp.get("/add-pet")
@@ -1,4 +1,6 @@
 from flask import Blueprint, jsonify, request, render_template
+from .. import matching
+from ..cache import CATALOG, cached
 from ..models import Pet
 
 bp = Blueprint("quiz", __name__)
@@ -22,11 +24,12 @@ def quiz_info():
 
 
 @bp.post("/quiz/results")
+@cached(lambda: [CATALOG])
 def quiz_results():
     """
-    Process quiz results and return matching pets.
+    Process quiz results and return the best matching pets.
 
-    Expected JSON fields:
+    Expected JSON fields (each optional, empty means "no preference"):
     - home_type
     - activity_level
     - experience
@@ -36,13 +39,13 @@ def quiz_results():
     Steps:
     - Read JSON body.
     - Validate that data exists.
-    - Build a dynamic query filtering only non-adopted pets.
-    - Apply filters only for parameters the user actually provided.
-    - Limit results to 10 newest pets.
-    - Return match list (id, name, species, breed, location) or an error message.
+    - Look up the precomputed best matches for this answer combination
+      (see app/matching.py); a mismatch on one question lowers the score
+      instead of excluding the pet.
+    - Load those (at most 10) pets in one query.
+    - Return them with their score (0-100), best first.
     """
     data = request.get_json(silent=True) or {}
-    print("Received data:", data)
 
     # basic validation
     if not data:
@@ -51,28 +54,12 @@ def quiz_results():
             "message": "Invalid data received"
         })
 
-    # start with non-adopted pets
-    query = Pet.query.filter_by(adopted=False)
-
-    # apply optional filters
-    if data.get("home_type"):
-        query = query.filter(Pet.home_type == data["home_type"])
-
-    if data.get("activity_level"):
-        query = query.filter(Pet.activity_level == data["activity_level"])
-
-    if data.get("experience"):
-        query = query.filter(Pet.experience == data["experience"])
-
-    if data.get("time_commitment"):
-        query = query.filter(Pet.time_commitment == data["time_commitment"])
-
-    if data.get("family_situation"):
-        query = query.filter(Pet.family_situation == data["family_situation"])
+    answers = matching.normalize_answers(data)
 
     # attempt to retrieve matching pets
     try:
-        pets = query.order_by(Pet.created_at.desc()).limit(10).all()
+        top = matching.get_index().results(answers)
+        pets = {p.id: p for p in Pet.query.filter(Pet.id.in_([pid for pid, _ in top]))} if top else {}
     except Exception as e:
         print("Error querying pets:", e)
         return jsonify({
@@ -97,9 +84,11 @@ def quiz_results():
                 "name": p.name,
                 "species": p.species,
                 "breed": p.breed,
-                "location": p.location
+                "location": p.location,
+                "score": round(score * 100),
             }
-            for p in pets
+            for p, score in ((pets.get(pid), score) for pid, score in top)
+            if p is not None and not p.adopted
         ]
     })
 
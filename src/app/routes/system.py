@@ -1,8 +1,24 @@
-from flask import Blueprint, jsonify
-from ..models import Pet, User
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from flask import Blueprint, Response, abort, current_app, jsonify, request
+from sqlalchemy import text
+
+from ..counters import get_counters
+from ..db import db
+from ..metrics import get_registry
 
 bp = Blueprint("system", __name__)
 
+# seconds /readyz waits for a pooled connection and SELECT 1
+DEFAULT_READY_TIMEOUT = 2.0
+
+# one thread runs the readiness query, so a hung database can only ever
+# hold one connection; probes queued behind it time out as well
+_ready_check = ThreadPoolExecutor(max_workers=1, thread_name_prefix="readyz")
+
+
 @bp.get("/health")
 def health():
     """
@@ -12,25 +28,90 @@ def health():
     return jsonify({"status": "ok", "service": "take-a-paw"}), 200
 
 
+@bp.get("/livez")
+def livez():
+    """
+    Liveness probe: the process is up and serving requests. No I/O.
+    """
+    return jsonify({"status": "ok"}), 200
+
+
+def _select_one(engine) -> float:
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    return (time.perf_counter() - start) * 1000
+
+
+def _pool_status(pool) -> dict:
+    status = {"class": type(pool).__name__}
+    # QueuePool reports its usage; other pools (e.g. SQLite's) do not
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            status[name] = method()
+    return status
+
+
+@bp.get("/readyz")
+def readyz():
+    """
+    Readiness probe: one SELECT 1 on a pooled connection.
+
+    - Waits at most READY_TIMEOUT seconds (default 2), including the wait
+      for a free connection; slower or failing checks return 503.
+    - Reports the connection pool's usage alongside.
+    """
+    engine = db.engine
+    timeout = float(current_app.config.get("READY_TIMEOUT", DEFAULT_READY_TIMEOUT))
+    try:
+        db_ms = _ready_check.submit(_select_one, engine).result(timeout=timeout)
+    except TimeoutError:
+        return jsonify({
+            "status": "unavailable",
+            "error": f"database did not answer within {timeout:g}s",
+            "pool": _pool_status(engine.pool),
+        }), 503
+    except Exception as e:
+        return jsonify({
+            "status": "unavailable",
+            "error": type(e).__name__,
+            "pool": _pool_status(engine.pool),
+        }), 503
+    return jsonify({"status": "ready", "db_ms": round(db_ms, 2), "pool": _pool_status(engine.pool)}), 200
+
+
+def _cached_counts(*names):
+    """
+    ({name: value}, age of the oldest value in seconds) from the counter
+    service. Old values are refreshed in the background, never inline.
+    """
+    snapshot = get_counters().snapshot(names=names)
+    values = {name: c["value"] for name, c in snapshot.items()}
+    return values, max(c["age"] for c in snapshot.values())
+
+
 @bp.get("/api/status")
 def api_status():
     """
     Returns a more detailed status including stub API checks.
     Later, we can extend this to verify Cat/Dog API connectivity.
+
+    Counts are cached (see app/counters.py); stats_age_seconds says how
+    old they are.
     """
     try:
-        pets_count = Pet.query.count()
-        users_count = User.query.count()
+        counts, age = _cached_counts("pets_total", "users_total")
     except Exception:
-        pets_count = None
-        users_count = None
+        counts, age = {}, None
 
     return jsonify({
         "status": "ok",
         "cat_api_working": True,
         "dog_api_working": True,
-        "pets_in_db": pets_count,
-        "users_in_db": users_count,
+        "pets_in_db": counts.get("pets_total"),
+        "users_in_db": counts.get("users_total"),
+        "stats_age_seconds": age,
         "note": "system operational"
     }), 200
 
@@ -42,19 +123,18 @@ def debug():
     Avoid exposing secrets or environment variables here.
     """
     try:
-        total_pets = Pet.query.count()
-        adopted = Pet.query.filter_by(adopted=True).count()
-        available = Pet.query.filter_by(adopted=False).count()
+        counts, age = _cached_counts("pets_total", "pets_available", "pets_adopted")
     except Exception:
-        total_pets = adopted = available = 0
+        counts, age = {}, None
 
     return jsonify({
         "ok": True,
         "stats": {
-            "total_pets": total_pets,
-            "available": available,
-            "adopted": adopted
+            "total_pets": counts.get("pets_total", 0),
+            "available": counts.get("pets_available", 0),
+            "adopted": counts.get("pets_adopted", 0)
         },
+        "stats_age_seconds": age,
         "note": "debug endpoint for developers"
     }), 200
 
@@ -62,18 +142,32 @@ def debug():
 @bp.get("/health/db")
 def health_db():
     """
-    Returns counts of key entities to confirm DB connectivity.
+    Returns cached counts of key entities. Use /readyz to check that the
+    database is reachable right now.
     """
-    try:
-        from ..models import Favorite 
-        fav_count = Favorite.query.count()
-    except Exception:
-        fav_count = 0
+    counts, age = _cached_counts("pets_total", "pets_available", "users_total", "favorites_total")
 
     return jsonify({
         "status": "ok",
-        "pets_total": Pet.query.count(),
-        "pets_available": Pet.query.filter_by(adopted=False).count(),
-        "users": User.query.count(),
-        "favorites": fav_count,
+        "pets_total": counts["pets_total"],
+        "pets_available": counts["pets_available"],
+        "users": counts["users_total"],
+        "favorites": counts["favorites_total"],
+        "stats_age_seconds": age,
     }), 200
+
+
+@bp.get("/metrics")
+def metrics():
+    """
+    Prometheus text exposition of app/metrics.py, summed over all workers.
+
+    - If METRICS_TOKEN is set, scrapers must send it as a bearer token.
+    """
+    token = current_app.config.get("METRICS_TOKEN", os.getenv("METRICS_TOKEN"))
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        abort(401)
+    registry = get_registry()
+    if registry is None:
+        abort(404)
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
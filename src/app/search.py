@@ -0,0 +1,245 @@
+# app/search.py
+import re
+
+import click
+from sqlalchemy import DDL, bindparam, event, func, literal_column, or_, text
+
+from . import pagination
+from .db import db
+from .models import Pet
+
+# PostgreSQL: weighted tsvector over the searchable columns. The same SQL is
+# used in the index definition and in queries so the planner can match them.
+PG_TSVECTOR = (
+    "(setweight(to_tsvector('simple'::regconfig, name), 'A')"
+    " || setweight(to_tsvector('simple'::regconfig, breed), 'A')"
+    " || setweight(to_tsvector('simple'::regconfig, location), 'B')"
+    " || setweight(to_tsvector('simple'::regconfig, description), 'C'))"
+)
+# PostgreSQL: short text the trigram (typo-tolerant) match runs against
+PG_TRGM_TEXT = "(name || ' ' || breed || ' ' || location)"
+
+PG_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS ix_pets_search_tsv ON pets USING gin ({PG_TSVECTOR})",
+    f"CREATE INDEX IF NOT EXISTS ix_pets_search_trgm ON pets USING gin ({PG_TRGM_TEXT} gin_trgm_ops)",
+    # serve the existing breed/location substring filters (ILIKE '%term%')
+    "CREATE INDEX IF NOT EXISTS ix_pets_breed_trgm ON pets USING gin (breed gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_pets_location_trgm ON pets USING gin (location gin_trgm_ops)",
+]
+
+# SQLite: external-content FTS5 table with the trigram tokenizer, which
+# gives substring matching and lets fuzzy queries score shared trigrams.
+# Triggers keep it in step with every insert, update and delete on pets.
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS pets_fts USING fts5("
+    " name, breed, location, description,"
+    " content='pets', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS pets_fts_ai AFTER INSERT ON pets BEGIN"
+    " INSERT INTO pets_fts(rowid, name, breed, location, description)"
+    " VALUES (new.id, new.name, new.breed, new.location, new.description);"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS pets_fts_ad AFTER DELETE ON pets BEGIN"
+    " INSERT INTO pets_fts(pets_fts, rowid, name, breed, location, description)"
+    " VALUES ('delete', old.id, old.name, old.breed, old.location, old.description);"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS pets_fts_au"
+    " AFTER UPDATE OF name, breed, location, description ON pets BEGIN"
+    " INSERT INTO pets_fts(pets_fts, rowid, name, breed, location, description)"
+    " VALUES ('delete', old.id, old.name, old.breed, old.location, old.description);"
+    " INSERT INTO pets_fts(rowid, name, breed, location, description)"
+    " VALUES (new.id, new.name, new.breed, new.location, new.description);"
+    " END",
+]
+
+# bm25 column weights for name, breed, location, description
+SQLITE_WEIGHTS = "4.0, 4.0, 2.0, 1.0"
+
+# trigram tokenizer cannot match anything shorter than this
+MIN_TRIGRAM = 3
+
+for _stmt in PG_DDL:
+    event.listen(Pet.__table__, "after_create", DDL(_stmt).execute_if(dialect="postgresql"))
+for _stmt in SQLITE_DDL:
+    event.listen(Pet.__table__, "after_create", DDL(_stmt).execute_if(dialect="sqlite"))
+event.listen(
+    Pet.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS pets_fts").execute_if(dialect="sqlite"),
+)
+
+
+def _dialect() -> str:
+    return db.session.get_bind().dialect.name
+
+
+def _fts_phrase(term: str) -> str:
+    # FTS5 string literal: double any embedded quotes
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _fts_match(expr: str):
+    fts_ids = text("SELECT rowid FROM pets_fts WHERE pets_fts MATCH :m").bindparams(m=expr)
+    return Pet.id.in_(fts_ids)
+
+
+def _substring(column, term: str):
+    """
+    Case-insensitive "column contains term" that an index can serve:
+    trigram GIN on PostgreSQL, the FTS5 trigram table on SQLite.
+    """
+    if _dialect() == "sqlite" and len(term) >= MIN_TRIGRAM:
+        return _fts_match(f"{column.key} : {_fts_phrase(term)}")
+    return column.ilike(f"%{term}%")
+
+
+def filter_pets(query, species: str = "", breed: str = "", location: str = "", species_exact: bool = True):
+    """
+    Apply the classic search filters to a Pet query.
+
+    - species: exact (or substring with species_exact=False), case-insensitive.
+    - breed / location: substring, case-insensitive, index-assisted.
+    """
+    if species:
+        query = query.filter(Pet.species.ilike(species if species_exact else f"%{species}%"))
+    if breed:
+        query = query.filter(_substring(Pet.breed, breed))
+    if location:
+        query = query.filter(_substring(Pet.location, location))
+    return query
+
+
+def _words(q: str):
+    return re.findall(r"\w+", q.lower())
+
+
+def _sqlite_fuzzy_expr(q: str):
+    """
+    Build an FTS5 query for free text on the trigram table.
+
+    Whole words are matched as phrases (substring hits) and every trigram of
+    each word is OR-ed in as well, so a misspelt word still matches rows that
+    share most of its trigrams; bm25 puts rows with more shared trigrams first.
+    """
+    parts = []
+    for word in _words(q):
+        if len(word) < MIN_TRIGRAM:
+            continue
+        parts.append(_fts_phrase(word))
+        parts.extend(
+            _fts_phrase(word[i:i + MIN_TRIGRAM]) for i in range(len(word) - MIN_TRIGRAM + 1)
+        )
+    return " OR ".join(dict.fromkeys(parts))
+
+
+def rank_pets(query, q: str):
+    """
+    Restrict a Pet query to free-text matches of q and order it by relevance.
+
+    Searches name, breed, location and description.
+    - PostgreSQL: tsvector match OR trigram word similarity (typo tolerant),
+      ranked by ts_rank + word_similarity; both predicates are GIN-indexed.
+    - SQLite: FTS5 trigram match ranked by bm25; words too short for
+      trigrams fall back to a plain substring match.
+    """
+    if _dialect() == "postgresql":
+        tsv = literal_column(PG_TSVECTOR)
+        trgm = literal_column(PG_TRGM_TEXT)
+        tsq = func.websearch_to_tsquery(literal_column("'simple'::regconfig"), bindparam("q_text", q))
+        term = bindparam("q_term", q)
+        score = func.ts_rank(tsv, tsq) + func.word_similarity(term, trgm)
+        return (
+            query.filter(or_(tsv.op("@@")(tsq), term.op("<%")(trgm)))
+            .order_by(score.desc(), Pet.id.desc())
+        )
+
+    if _dialect() == "sqlite":
+        expr = _sqlite_fuzzy_expr(q)
+        if not expr:
+            return _like_any(query, q)
+        ranked = text(
+            f"SELECT rowid, bm25(pets_fts, {SQLITE_WEIGHTS}) AS score"
+            " FROM pets_fts WHERE pets_fts MATCH :m"
+        ).bindparams(m=expr).columns(rowid=db.Integer, score=db.Float).subquery("fts")
+        return (
+            query.join(ranked, ranked.c.rowid == Pet.id)
+            .order_by(ranked.c.score, Pet.id.desc())
+        )
+
+    return _like_any(query, q)
+
+
+def _like_any(query, q: str):
+    # unranked substring match on every searchable column
+    like = f"%{q.strip()}%"
+    return query.filter(or_(
+        Pet.name.ilike(like), Pet.breed.ilike(like),
+        Pet.location.ilike(like), Pet.description.ilike(like),
+    )).order_by(Pet.created_at.desc(), Pet.id.desc())
+
+
+def contains(term: str):
+    """
+    Filter for pets whose name, breed or location contains term
+    (case-insensitive).
+
+    - PostgreSQL: ILIKE on the trigram-indexed text.
+    - SQLite: phrase match on the FTS5 trigram table; terms too short for
+      trigrams fall back to a plain substring match.
+    """
+    term = term.strip()
+    dialect = _dialect()
+    if dialect == "postgresql":
+        return literal_column(PG_TRGM_TEXT).ilike(f"%{term}%")
+    if dialect == "sqlite" and len(term) >= MIN_TRIGRAM:
+        return _fts_match(f"{{name breed location}} : {_fts_phrase(term)}")
+    like = f"%{term}%"
+    return or_(Pet.name.ilike(like), Pet.breed.ilike(like), Pet.location.ilike(like))
+
+
+def ranked_page(query, cursor: str = None, limit: int = pagination.DEFAULT_LIMIT) -> pagination.Page:
+    """
+    Page through an already ranked query.
+
+    Relevance is computed per query, so there is no stable index key to seek
+    on; the opaque cursor carries an offset instead. Ranked searches are
+    meant to be read from the top, so this stays cheap in practice.
+    """
+    state = pagination.decode_cursor(cursor) or {}
+    try:
+        offset = max(0, int(state.get("o", 0)))
+    except (ValueError, TypeError):
+        offset = 0
+
+    rows = query.offset(offset).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = pagination.encode_cursor({"o": offset + limit})
+    return pagination.Page(rows, next_cursor, limit)
+
+
+def rebuild_index():
+    """
+    Create missing search indexes and resync them with the pets table.
+
+    create_all() only runs the DDL above for a brand new table; run this once
+    on existing databases (flask --app run search-reindex).
+    """
+    dialect = _dialect()
+    if dialect == "postgresql":
+        for stmt in PG_DDL:
+            db.session.execute(text(stmt))
+    elif dialect == "sqlite":
+        for stmt in SQLITE_DDL:
+            db.session.execute(text(stmt))
+        db.session.execute(text("INSERT INTO pets_fts(pets_fts) VALUES ('rebuild')"))
+    db.session.commit()
+
+
+def init_app(app):
+    @app.cli.command("search-reindex")
+    def search_reindex_command():
+        """Create the pet search indexes and resync them."""
+        rebuild_index()
+        click.echo("Search index rebuilt.")
@@ -0,0 +1,179 @@
+# app/storage.py
+import abc
+import hashlib
+import mimetypes
+import os
+import threading
+import urllib.request
+import uuid
+
+from flask import Response, abort, current_app, send_from_directory
+
+from . import uploads
+
+# images larger than this are refused by the local and memory backends
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".avif", ".svg")
+MEDIA_URL = "/media/"
+
+
+def image_extension(source: str) -> str:
+    ext = os.path.splitext(source.split("?", 1)[0])[1].lower()
+    return ext if ext in IMAGE_EXTENSIONS else ".jpg"
+
+
+def _read(source: str) -> bytes:
+    """
+    Bytes of a local file path or an http(s) URL.
+    """
+    if "://" in source:
+        if not source.startswith(("http://", "https://")):
+            raise ValueError(f"unsupported image URL: {source[:80]}")
+        with urllib.request.urlopen(source, timeout=30) as response:
+            data = response.read(MAX_IMAGE_BYTES + 1)
+    else:
+        with open(source, "rb") as f:
+            data = f.read(MAX_IMAGE_BYTES + 1)
+    if len(data) > MAX_IMAGE_BYTES:
+        raise ValueError("image is too large")
+    return data
+
+
+def _name(data: bytes, source: str) -> str:
+    # content-addressed, so re-uploading the same image is idempotent
+    return hashlib.sha1(data).hexdigest()[:20] + image_extension(source)
+
+
+class Storage(abc.ABC):
+    """
+    Where listing and feed images are kept.
+
+    save(source) stores a local file path or an http(s) URL and returns
+    the image's public URL.
+    """
+
+    name = "storage"
+
+    @abc.abstractmethod
+    def save(self, source: str) -> str:
+        ...
+
+    def response(self, name: str):
+        """
+        Serve a stored image from /media/<name>, for backends that keep
+        the bytes themselves.
+        """
+        abort(404)
+
+    def read(self, name: str):
+        """
+        Bytes of a stored image by name, or None (see app/images.py).
+        """
+        return None
+
+
+class CloudinaryStorage(Storage):
+    """
+    Cloudinary (production). Remote URLs are fetched by Cloudinary itself.
+    """
+
+    name = "cloudinary"
+
+    def save(self, source: str) -> str:
+        return uploads.upload(source)
+
+
+class LocalStorage(Storage):
+    """
+    Files in a directory, served from /media/ (development, offline tests).
+    """
+
+    name = "local"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def save(self, source: str) -> str:
+        data = _read(source)
+        name = _name(data, source)
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return MEDIA_URL + name
+
+    def response(self, name: str):
+        return send_from_directory(self.directory, name, max_age=365 * 24 * 3600)
+
+    def read(self, name: str):
+        if "/" in name or "\\" in name or name.startswith("."):
+            return None
+        try:
+            with open(os.path.join(self.directory, name), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+
+class MemoryStorage(Storage):
+    """
+    A dict of name -> bytes (tests).
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        self.files = {}
+        self._lock = threading.Lock()
+
+    def save(self, source: str) -> str:
+        data = _read(source)
+        name = _name(data, source)
+        with self._lock:
+            self.files[name] = data
+        return MEDIA_URL + name
+
+    def read(self, name: str):
+        return self.files.get(name)
+
+    def response(self, name: str):
+        data = self.files.get(name)
+        if data is None:
+            abort(404)
+        return Response(data, mimetype=mimetypes.guess_type(name)[0] or "application/octet-stream")
+
+
+BACKENDS = ("cloudinary", "local", "memory")
+
+
+def get_storage() -> Storage:
+    return current_app.extensions["storage"]
+
+
+def _media(name):
+    return get_storage().response(name)
+
+
+def init_app(app):
+    """
+    Pick the image storage backend.
+
+    - IMAGE_STORAGE: cloudinary (default), local or memory.
+    - MEDIA_DIR: directory of the local backend (default: instance/media).
+    """
+    backend = str(app.config.get("IMAGE_STORAGE", os.getenv("IMAGE_STORAGE", "cloudinary"))).lower()
+    if backend == "local":
+        directory = app.config.get("MEDIA_DIR", os.getenv("MEDIA_DIR")) or os.path.join(app.instance_path, "media")
+        storage = LocalStorage(directory)
+    elif backend == "memory":
+        storage = MemoryStorage()
+    elif backend == "cloudinary":
+        storage = CloudinaryStorage()
+    else:
+        raise RuntimeError(f"IMAGE_STORAGE must be one of {', '.join(BACKENDS)}, not {backend!r}")
+    app.extensions["storage"] = storage
+    app.add_url_rule(f"{MEDIA_URL}<path:name>", "media", _media)
+    return storage
@@ -0,0 +1,58 @@
+# app/streaming.py
+import json
+
+from flask import Response, stream_with_context
+
+# rows fetched per round trip from the server-side cursor
+CHUNK_SIZE = 500
+
+
+def _chunks(query, size):
+    """
+    Iterate an ORM query in lists of at most `size` rows.
+
+    yield_per() makes SQLAlchemy use a server-side cursor where the driver
+    supports it (psycopg2), so only one chunk is held in memory at a time.
+    """
+    chunk = []
+    for row in query.yield_per(size):
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_json_array(query, serialize_chunk, chunk_size: int = CHUNK_SIZE) -> Response:
+    """
+    Stream the rows of a query as a JSON array.
+
+    - serialize_chunk turns a list of rows into a list of dicts; it is called
+      once per chunk so batch helpers (like serialize_pets) keep their
+      constant-queries-per-chunk behaviour.
+    - The response body is produced by a generator, so the client starts
+      receiving bytes after the first chunk and peak memory stays at one
+      chunk whatever the result size.
+    """
+    def generate():
+        yield "["
+        sep = ""
+        for chunk in _chunks(query, chunk_size):
+            # one write per chunk keeps the number of socket sends small
+            parts = []
+            for item in serialize_chunk(chunk):
+                parts.append(sep)
+                parts.append(json.dumps(item, separators=(",", ":")))
+                sep = ","
+            yield "".join(parts)
+        yield "]"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
+
+def wants_stream(request) -> bool:
+    """
+    True when the client asked for the whole result set with ?stream=1.
+    """
+    return request.args.get("stream", "").lower() in ("1", "true", "yes")
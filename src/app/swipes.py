@@ -0,0 +1,118 @@
+# app/swipes.py
+from . import daily_stats
+from .db import db
+from .models import Favorite, Pet, Swipe
+
+# largest number of decisions accepted in one POST /swipes
+MAX_BATCH = 200
+
+DECISIONS = {"yes": True, "no": False}
+
+
+def parse_decisions(payload):
+    """
+    Validate a buffered list of swipe decisions from the client.
+
+    Expected shape: [{"pet_id": 12, "decision": "yes"}, ...]
+
+    - Returns (decisions, error). decisions maps pet_id -> liked; if the same
+      pet appears twice, the last decision wins.
+    - error is a message string when the payload is unusable, otherwise None.
+    """
+    if not isinstance(payload, list) or not payload:
+        return None, "decisions must be a non-empty list"
+    if len(payload) > MAX_BATCH:
+        return None, f"at most {MAX_BATCH} decisions per request"
+
+    decisions = {}
+    for item in payload:
+        if not isinstance(item, dict):
+            return None, "each decision must be an object"
+        pet_id = item.get("pet_id")
+        decision = str(item.get("decision") or "").lower()
+        if not isinstance(pet_id, int) or isinstance(pet_id, bool) or decision not in DECISIONS:
+            return None, "each decision needs an integer pet_id and decision yes/no"
+        decisions[pet_id] = DECISIONS[decision]
+
+    return decisions, None
+
+
+def insert_stmt(model, update_cols=()):
+    """
+    Build a multi-row INSERT that tolerates rows which already exist.
+
+    - PostgreSQL / SQLite: INSERT ... ON CONFLICT (pk) DO UPDATE / DO NOTHING.
+    - MySQL: INSERT ... ON DUPLICATE KEY UPDATE.
+    """
+    dialect = db.session.get_bind().dialect.name
+    pk = [c.name for c in model.__table__.primary_key.columns]
+
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(model)
+        if update_cols:
+            return stmt.on_conflict_do_update(
+                index_elements=pk,
+                set_={c: stmt.excluded[c] for c in update_cols},
+            )
+        return stmt.on_conflict_do_nothing(index_elements=pk)
+
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+        stmt = dialect_insert(model)
+        cols = update_cols or pk[:1]
+        return stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in cols})
+
+    return None
+
+
+def record_decisions(user_id: int, decisions: dict):
+    """
+    Store a batch of swipe decisions for one user in bulk.
+
+    - Unknown or adopted pets are skipped (one lookup for the whole batch).
+    - Swipes are upserted, so re-sending a buffer is harmless.
+    - Right swipes also add the pet to favorites; existing favorites are kept.
+
+    Returns (recorded count, ids of the newly favorited pets). The caller
+    commits.
+    """
+    ids = list(decisions)
+    valid = {
+        pid for (pid,) in db.session.query(Pet.id)
+        .filter(Pet.id.in_(ids), Pet.adopted.is_(False))
+    }
+    if not valid:
+        return 0, []
+
+    swipe_rows = [
+        {"user_id": user_id, "pet_id": pid, "liked": decisions[pid]}
+        for pid in ids if pid in valid
+    ]
+    liked = [row["pet_id"] for row in swipe_rows if row["liked"]]
+    if liked:
+        already = {
+            pid for (pid,) in db.session.query(Favorite.pet_id)
+            .filter(Favorite.user_id == user_id, Favorite.pet_id.in_(liked))
+        }
+        liked = [pid for pid in liked if pid not in already]
+    fav_rows = [{"user_id": user_id, "pet_id": pid} for pid in liked]
+
+    stmt = insert_stmt(Swipe, update_cols=("liked",))
+    if stmt is not None:
+        db.session.execute(stmt, swipe_rows)
+        if fav_rows:
+            db.session.execute(insert_stmt(Favorite), fav_rows)
+            # bulk inserts bypass the ORM flush hooks
+            daily_stats.count(daily_stats.FAVORITES, len(fav_rows))
+    else:
+        # generic fallback for other backends: one merge per row
+        for row in swipe_rows:
+            db.session.merge(Swipe(**row))
+        for row in fav_rows:
+            db.session.merge(Favorite(**row))
+
+    return len(swipe_rows), liked
@@ -0,0 +1,48 @@
+# app/uploads.py
+import os
+import threading
+
+from flask import current_app, has_app_context
+
+FOLDER = "take-a-paw/pets"
+
+_lock = threading.Lock()
+_configured = False
+
+
+def _setting(name: str):
+    if has_app_context():
+        return current_app.config.get(name, os.getenv(name))
+    return os.getenv(name)
+
+
+def uploader():
+    """
+    cloudinary.uploader, imported and configured on first use.
+
+    cloudinary pulls in its HTTP stack (urllib3, certifi) on import, about
+    50 ms; workers and tests that never upload do not pay for it.
+    """
+    global _configured
+    import cloudinary
+    import cloudinary.uploader
+
+    if not _configured:
+        with _lock:
+            if not _configured:
+                cloudinary.config(
+                    cloud_name=_setting("CLOUDINARY_CLOUD_NAME"),
+                    api_key=_setting("CLOUDINARY_API_KEY"),
+                    api_secret=_setting("CLOUDINARY_API_SECRET"),
+                    secure=True,
+                )
+                _configured = True
+    return cloudinary.uploader
+
+
+def upload(file, **options) -> str:
+    """
+    Upload a file, stream or remote URL to Cloudinary; returns its URL.
+    """
+    options.setdefault("folder", FOLDER)
+    return uploader().upload(file, **options)["secure_url"]
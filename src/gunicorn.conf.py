@@ -0,0 +1,88 @@
+# gunicorn.conf.py
+"""
+Production server settings, read by `gunicorn -c gunicorn.conf.py wsgi:app`.
+
+Every setting can be overridden from the environment:
+
+- PORT: port to listen on (default 5000).
+- WEB_CONCURRENCY: worker processes (default 2 x CPUs + 1, at most 8).
+- GUNICORN_THREADS: threads per worker (default 4).
+- GUNICORN_TIMEOUT: seconds before a silent worker is killed (default 30).
+- GUNICORN_GRACEFUL_TIMEOUT: seconds workers get to finish their requests
+  on restart or shutdown (default 30).
+"""
+import glob
+import os
+import tempfile
+
+
+def _cpus() -> int:
+    # the CPUs this container may use, not every CPU of the host
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", min(2 * _cpus() + 1, 8)))
+# the app picks its response cache backend from this (see app/cache.py)
+os.environ["WEB_CONCURRENCY"] = str(workers)
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+worker_class = "gthread"
+
+# import the app once in the master; workers fork with it already loaded
+preload_app = True
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+
+# heartbeat files on tmpfs: a slow container disk cannot stall workers
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG")
+errorlog = "-"
+
+# /metrics and /admin/queries add up every worker's numbers through this directory
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), "take-a-paw-metrics"))
+
+
+def on_starting(server):
+    # numbers from workers of a previous run would otherwise be added in
+    for pattern in ("metrics_*.json", "queries_*.json"):
+        for path in glob.glob(os.path.join(os.environ["METRICS_DIR"], pattern)):
+            os.remove(path)
+
+
+def check_cache(app):
+    """
+    Refuse a per-process response cache with several workers: an
+    invalidation would only reach the worker that made it, and the others
+    would keep serving what changed (contact details made private too).
+    """
+    cache = app.extensions.get("response_cache")
+    if workers > 1 and cache is not None and cache.backend.name == "lru":
+        raise RuntimeError(
+            f"RESPONSE_CACHE=lru cannot be used with {workers} workers; use shared (or none)"
+        )
+
+
+def when_ready(server):
+    from wsgi import app
+
+    check_cache(app)
+    # the master serves nothing; close anything it opened while loading
+    if preload_app:
+        from app.db import dispose_engines
+
+        dispose_engines(app)
+
+
+def post_fork(server, worker):
+    # pooled connections must never be shared between processes
+    from app.db import dispose_engines
+    from wsgi import app
+
+    dispose_engines(app, close=False)
@@ -0,0 +1,72 @@
+"""Baseline schema: users, pets and favorites
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # databases created with db.create_all() before migrations already
+    # have these tables; only a blank database gets them here
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column("username", sa.String(64), nullable=False, unique=True),
+            sa.Column("display_name", sa.String(120), nullable=True),
+            sa.Column("email", sa.String(120), nullable=True),
+            sa.Column("phone", sa.String(50), nullable=True),
+            sa.Column("password_hash", sa.String(256), nullable=False),
+            sa.Column("public_contact", sa.Boolean(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+        )
+    if "pets" not in existing:
+        op.create_table(
+            "pets",
+            sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column("name", sa.String(120), nullable=False),
+            sa.Column("species", sa.String(30), nullable=False),
+            sa.Column("breed", sa.String(120), nullable=False),
+            sa.Column("age", sa.String(60), nullable=False),
+            sa.Column("gender", sa.String(30), nullable=False),
+            sa.Column("location", sa.String(200), nullable=False),
+            sa.Column("description", sa.Text(), nullable=False),
+            sa.Column("image", sa.String(500), nullable=False),
+            sa.Column("adopted", sa.Boolean(), nullable=False),
+            sa.Column("source", sa.String(30), nullable=False),
+            sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=True),
+            sa.Column("contact_email_override", sa.String(120), nullable=True),
+            sa.Column("contact_phone_override", sa.String(50), nullable=True),
+            sa.Column("home_type", sa.String(50), nullable=True),
+            sa.Column("activity_level", sa.String(50), nullable=True),
+            sa.Column("experience", sa.String(50), nullable=True),
+            sa.Column("time_commitment", sa.String(50), nullable=True),
+            sa.Column("family_situation", sa.String(50), nullable=True),
+            sa.Column("public_contact", sa.Boolean(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+        )
+    if "favorites" not in existing:
+        op.create_table(
+            "favorites",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("pet_id", sa.Integer(), sa.ForeignKey("pets.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+        )
+
+
+def downgrade():
+    op.drop_table("favorites")
+    op.drop_table("pets")
+    op.drop_table("users")
@@ -0,0 +1,44 @@
+"""pets.shuffle_key: random swipe deck position (app/deck.py)
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 09:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+# app.models.SHUFFLE_KEY_SPACE
+SHUFFLE_KEY_SPACE = 2 ** 31
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if "shuffle_key" not in {c["name"] for c in inspector.get_columns("pets")}:
+        # NOT NULL needs a default for the existing rows; they get their
+        # random keys right after
+        op.add_column("pets", sa.Column("shuffle_key", sa.Integer(), nullable=False, server_default="0"))
+        if bind.dialect.name == "postgresql":
+            random_key = f"floor(random() * {SHUFFLE_KEY_SPACE})::integer"
+        else:
+            random_key = f"abs(random()) % {SHUFFLE_KEY_SPACE}"
+        op.execute(f"UPDATE pets SET shuffle_key = {random_key}")
+        if bind.dialect.name == "postgresql":
+            # new rows get theirs from the model; SQLite cannot drop a
+            # default in place, and keeping it there is harmless
+            op.alter_column("pets", "shuffle_key", server_default=None)
+    if "ix_pets_deck" not in {i["name"] for i in inspector.get_indexes("pets")}:
+        op.create_index("ix_pets_deck", "pets", ["adopted", "shuffle_key", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_pets_deck", table_name="pets")
+    op.drop_column("pets", "shuffle_key")
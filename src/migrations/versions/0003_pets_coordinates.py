@@ -0,0 +1,37 @@
+"""pets.latitude/longitude/geohash: proximity search (app/geo.py)
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 09:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing rows stay NULL until `flask geocode-pets` fills them in
+    inspector = sa.inspect(op.get_bind())
+    columns = {c["name"] for c in inspector.get_columns("pets")}
+    if "latitude" not in columns:
+        op.add_column("pets", sa.Column("latitude", sa.Float(), nullable=True))
+    if "longitude" not in columns:
+        op.add_column("pets", sa.Column("longitude", sa.Float(), nullable=True))
+    if "geohash" not in columns:
+        op.add_column("pets", sa.Column("geohash", sa.String(12), nullable=True))
+    if "ix_pets_geohash" not in {i["name"] for i in inspector.get_indexes("pets")}:
+        op.create_index("ix_pets_geohash", "pets", ["adopted", "geohash"])
+
+
+def downgrade():
+    op.drop_index("ix_pets_geohash", table_name="pets")
+    op.drop_column("pets", "geohash")
+    op.drop_column("pets", "longitude")
+    op.drop_column("pets", "latitude")
@@ -0,0 +1,27 @@
+"""pets.adopted_at: adoption dates for the daily statistics (app/daily_stats.py)
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 09:15:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # pets adopted before this column existed keep NULL: their adoption
+    # day is unknown, and the stats backfill leaves them out
+    if "adopted_at" not in {c["name"] for c in sa.inspect(op.get_bind()).get_columns("pets")}:
+        op.add_column("pets", sa.Column("adopted_at", sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("pets", "adopted_at")
@@ -0,0 +1,30 @@
+"""pets.external_id: feed listing ids for the bulk importer (app/importer.py)
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 09:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if "external_id" not in {c["name"] for c in inspector.get_columns("pets")}:
+        op.add_column("pets", sa.Column("external_id", sa.String(120), nullable=True))
+    # existing rows are all NULL, and NULLs never collide
+    if "ux_pets_source_external" not in {i["name"] for i in inspector.get_indexes("pets")}:
+        op.create_index("ux_pets_source_external", "pets", ["source", "external_id"], unique=True)
+
+
+def downgrade():
+    op.drop_index("ux_pets_source_external", table_name="pets")
+    op.drop_column("pets", "external_id")
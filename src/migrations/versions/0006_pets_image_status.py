@@ -0,0 +1,26 @@
+"""pets.image_status: listing photos in the upload queue (app/image_queue.py)
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 09:25:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the server default marks every existing listing's photo as ready
+    if "image_status" not in {c["name"] for c in sa.inspect(op.get_bind()).get_columns("pets")}:
+        op.add_column("pets", sa.Column("image_status", sa.String(20), nullable=False, server_default="ready"))
+
+
+def downgrade():
+    op.drop_column("pets", "image_status")
@@ -0,0 +1,53 @@
+"""keyset pagination indexes: newest-first lists (app/pagination.py)
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_pets_created", "pets", ["created_at", "id"]),
+    ("ix_pets_available_created", "pets", ["adopted", "created_at", "id"]),
+    ("ix_pets_owner_created", "pets", ["owner_id", "created_at", "id"]),
+    ("ix_favorites_user_created", "favorites", ["user_id", "created_at", "pet_id"]),
+    ("ix_users_created", "users", ["created_at", "id"]),
+]
+
+
+def _create_index(name, table, columns):
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        if name not in {i["name"] for i in sa.inspect(bind).get_indexes(table)}:
+            op.create_index(name, table, columns)
+        return
+    valid = bind.execute(
+        sa.text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"), {"name": name}
+    ).scalar()
+    if valid:
+        return
+    # CONCURRENTLY keeps the table writable while the index builds; it cannot
+    # run in a transaction, and a failed build leaves an invalid index behind
+    with op.get_context().autocommit_block():
+        if valid is False:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+        op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        _create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
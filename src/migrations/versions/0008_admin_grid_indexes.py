@@ -0,0 +1,51 @@
+"""admin grid indexes: DataTables ordering and prefix search (app/datatables.py)
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 09:35:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_users_email", "users", ["email", "id"]),
+    ("ix_pets_name", "pets", ["name", "id"]),
+    ("ix_pets_species", "pets", ["species", "id"]),
+]
+
+
+def _create_index(name, table, columns):
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        if name not in {i["name"] for i in sa.inspect(bind).get_indexes(table)}:
+            op.create_index(name, table, columns)
+        return
+    valid = bind.execute(
+        sa.text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"), {"name": name}
+    ).scalar()
+    if valid:
+        return
+    # CONCURRENTLY keeps the table writable while the index builds; it cannot
+    # run in a transaction, and a failed build leaves an invalid index behind
+    with op.get_context().autocommit_block():
+        if valid is False:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+        op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        _create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
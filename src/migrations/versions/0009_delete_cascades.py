@@ -0,0 +1,120 @@
+"""ON DELETE CASCADE foreign keys and the pet_id indexes they use (app/deletion.py)
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17 09:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+# (table, column, referenced table) of every foreign key that cascades
+CASCADES = [
+    ("pets", "owner_id", "users"),
+    ("favorites", "user_id", "users"),
+    ("favorites", "pet_id", "pets"),
+    ("swipes", "user_id", "users"),
+    ("swipes", "pet_id", "pets"),
+]
+# let the cascade from pets find the child rows without a scan
+INDEXES = [
+    ("ix_favorites_pet", "favorites", ["pet_id"]),
+    ("ix_swipes_pet", "swipes", ["pet_id"]),
+]
+# SQLite reflects unnamed foreign keys; batch mode needs a name to drop them
+SQLITE_FK_NAME = "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"
+
+
+def _create_index(name, table, columns):
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        if name not in {i["name"] for i in sa.inspect(bind).get_indexes(table)}:
+            op.create_index(name, table, columns)
+        return
+    valid = bind.execute(
+        sa.text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"), {"name": name}
+    ).scalar()
+    if valid:
+        return
+    # CONCURRENTLY keeps the table writable while the index builds; it cannot
+    # run in a transaction, and a failed build leaves an invalid index behind
+    with op.get_context().autocommit_block():
+        if valid is False:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+        op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def _not_cascading(inspector, tables):
+    """
+    {table: [(constraint name, column, referenced table)]} of the CASCADES
+    that do not cascade yet.
+    """
+    pending = {}
+    for table, column, target in CASCADES:
+        if table not in tables:
+            continue
+        for fk in inspector.get_foreign_keys(table):
+            ondelete = (fk.get("options") or {}).get("ondelete") or ""
+            if fk["constrained_columns"] == [column] and fk["referred_table"] == target and ondelete.upper() != "CASCADE":
+                pending.setdefault(table, []).append((fk["name"], column, target))
+    return pending
+
+
+def _cascade_in_place(pending):
+    for table, fks in pending.items():
+        for name, column, target in fks:
+            op.drop_constraint(name, table, type_="foreignkey")
+            op.create_foreign_key(name, table, target, [column], ["id"], ondelete="CASCADE")
+
+
+def _cascade_sqlite(pending):
+    # SQLite cannot alter a foreign key, so batch mode copies each table into
+    # a new one. Foreign keys are off meanwhile (the pragma is ignored inside
+    # a transaction): dropping the old table would otherwise delete, or refuse
+    # to delete, the rows that reference it.
+    bind = op.get_bind()
+    with op.get_context().autocommit_block():
+        op.execute("PRAGMA foreign_keys=OFF")
+    for table, fks in pending.items():
+        # triggers are dropped with the old table (pets keeps its search index with them)
+        triggers = bind.execute(
+            sa.text("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = :table"), {"table": table}
+        ).scalars().all()
+        with op.batch_alter_table(table, recreate="always", naming_convention={"fk": SQLITE_FK_NAME}) as batch:
+            for name, column, target in fks:
+                name = name or SQLITE_FK_NAME % {
+                    "table_name": table, "column_0_name": column, "referred_table_name": target,
+                }
+                batch.drop_constraint(name, type_="foreignkey")
+                batch.create_foreign_key(name, target, [column], ["id"], ondelete="CASCADE")
+        for sql in triggers:
+            op.execute(sql)
+    with op.get_context().autocommit_block():
+        op.execute("PRAGMA foreign_keys=ON")
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+    pending = _not_cascading(inspector, tables)
+    if pending and bind.dialect.name == "sqlite":
+        _cascade_sqlite(pending)
+    elif pending:
+        _cascade_in_place(pending)
+    for name, table, columns in INDEXES:
+        if table in tables:
+            _create_index(name, table, columns)
+
+
+def downgrade():
+    # the foreign keys keep cascading: without it deletion.py would fail
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,10 @@
+# wsgi.py
+"""
+WSGI entry point: gunicorn -c gunicorn.conf.py wsgi:app
+
+Tables are not created here; run `flask --app wsgi create-tables` once
+before starting the server.
+"""
+from app import create_app
+
+app = create_app()
@@ -109,4 +109,1391 @@ def test_quiz_results(client, init_database):
 
 def test_404_page(client):
     response = client.get('/nonexistent-page')
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+
+def test_deck_batches_cover_catalog_once(client, app):
+    with app.app_context():
+        from app.models import Pet
+        for i in range(25):
+            db.session.add(Pet(
+                name=f"Pet {i}", species="Dog", breed="Mixed", age="1 year",
+                gender="Male", location="Baku", description="Test pet",
+                image="https://example.com/pet.jpg", adopted=False
+            ))
+        db.session.commit()
+
+    seen = []
+    cursor = None
+    while True:
+        url = '/deck?limit=10' + (f'&cursor={cursor}' if cursor else '')
+        data = client.get(url).get_json()
+        seen.extend(card['id'] for card in data['cards'])
+        cursor = data['next_cursor']
+        if not cursor:
+            break
+
+    assert len(seen) == 25
+    assert len(set(seen)) == 25
+
+
+def test_deck_rejects_bad_cursor(client, init_database):
+    response = client.get('/deck?cursor=not-a-cursor')
+    assert response.status_code == 200
+    assert len(response.get_json()['cards']) == 2
+
+
+def _login_test_user(client, app):
+    with app.app_context():
+        from app.models import User
+        user_id = User.query.filter_by(username="testuser").first().id
+    with client.session_transaction() as sess:
+        sess["user_id"] = user_id
+    return user_id
+
+
+def test_swipe_batch_hides_seen_pets(client, app, init_database):
+    user_id = _login_test_user(client, app)
+    with app.app_context():
+        from app.models import Pet
+        dog, cat = Pet.query.order_by(Pet.id).all()
+        dog_id, cat_id = dog.id, cat.id
+
+    response = client.post('/swipes', json={"decisions": [
+        {"pet_id": dog_id, "decision": "no"},
+        {"pet_id": cat_id, "decision": "yes"},
+        {"pet_id": 9999, "decision": "no"},
+    ]})
+    data = response.get_json()
+    assert data == {"ok": True, "recorded": 2, "favorited": 1}
+
+    # re-sending the same buffer is harmless
+    assert client.post('/swipes', json={"decisions": [
+        {"pet_id": cat_id, "decision": "yes"},
+    ]}).status_code == 200
+
+    with app.app_context():
+        from app.models import Favorite, Swipe
+        assert Swipe.query.filter_by(user_id=user_id).count() == 2
+        assert Favorite.query.filter_by(user_id=user_id).count() == 1
+
+    assert client.get('/deck').get_json()['cards'] == []
+
+
+def test_swipe_batch_validation(client, app, init_database):
+    assert client.post('/swipes', json={"decisions": []}).status_code == 401
+    _login_test_user(client, app)
+    assert client.post('/swipes', json={"decisions": []}).status_code == 400
+    response = client.post('/swipes', json={"decisions": [{"pet_id": "x", "decision": "yes"}]})
+    assert response.status_code == 400
+
+
+def test_pets_api_keyset_pagination(client, app):
+    with app.app_context():
+        from app.models import Pet
+        for i in range(5):
+            db.session.add(Pet(
+                name=f"Pet {i}", species="Dog", breed="Mixed", age="1 year",
+                gender="Male", location="Baku", description="Test pet",
+                image="https://example.com/pet.jpg", adopted=False
+            ))
+        db.session.commit()
+
+    ids = []
+    url = '/pets?limit=2'
+    while url:
+        response = client.get(url)
+        page = response.get_json()
+        assert len(page) <= 2
+        ids.extend(p['id'] for p in page)
+        cursor = response.headers.get('X-Next-Cursor')
+        url = f'/pets?limit=2&cursor={cursor}' if cursor else None
+
+    assert ids == [5, 4, 3, 2, 1]
+
+
+def test_favorites_page_paginates(client, app, init_database):
+    user_id = _login_test_user(client, app)
+    with app.app_context():
+        from app.models import Favorite, Pet
+        for pet in Pet.query.all():
+            db.session.add(Favorite(user_id=user_id, pet_id=pet.id))
+        db.session.commit()
+
+    response = client.get('/me/favorites?limit=1')
+    assert len(response.get_json()) == 1
+    assert 'X-Next-Cursor' in response.headers
+
+    response = client.get('/favorites?limit=1')
+    assert response.status_code == 200
+    assert b'cursor=' in response.data
+
+
+def _count_queries(app, fn):
+    from sqlalchemy import event
+    statements = []
+
+    def before_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", before_execute)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_execute)
+    return len(statements)
+
+
+def _add_owned_pets(app, count):
+    with app.app_context():
+        from app.models import Pet, User
+        for i in range(count):
+            owner = User(username=f"owner{count}_{i}", password_hash="x", email=f"o{i}@example.com")
+            db.session.add(owner)
+            db.session.flush()
+            db.session.add(Pet(
+                name=f"Pet {i}", species="Dog", breed="Mixed", age="1 year",
+                gender="Male", location="Baku", description="Test pet",
+                image="https://example.com/pet.jpg", adopted=False, owner_id=owner.id
+            ))
+        db.session.commit()
+
+
+@pytest.mark.parametrize("url", ["/pets", "/pets/search?species=dog", "/search?species=dog", "/deck?limit=50"])
+def test_pet_lists_use_constant_queries(app, client, url):
+    # measure the database work, not the response cache
+    app.extensions["response_cache"] = None
+    _add_owned_pets(app, 2)
+    # first request also builds per-process indexes (recommendations)
+    client.get(url)
+    few = _count_queries(app, lambda: client.get(url))
+
+    _add_owned_pets(app, 15)
+    many = _count_queries(app, lambda: client.get(url))
+
+    assert many == few
+
+
+@pytest.mark.parametrize("url", [
+    "/admin/pets/data?draw=1&start=0&length=10",
+    "/admin/users/data?draw=1&start=0&length=10&order[0][column]=1&order[0][dir]=asc",
+])
+def test_admin_grids_constant_queries(app, client, url):
+    with client.session_transaction() as sess:
+        sess["role"] = "admin"
+    _add_owned_pets(app, 2)
+    # first request also fills the cached table counters
+    client.get(url)
+    few = _count_queries(app, lambda: client.get(url))
+
+    _add_owned_pets(app, 15)
+    many = _count_queries(app, lambda: client.get(url))
+
+    assert many == few
+
+
+def test_admin_grids_follow_datatables_protocol(app, client):
+    _add_owned_pets(app, 25)
+    assert client.get('/admin/pets/data').status_code == 403
+    with client.session_transaction() as sess:
+        sess["role"] = "admin"
+
+    data = client.get('/admin/pets/data?draw=3&start=10&length=5'
+                      '&order[0][column]=0&order[0][dir]=desc').get_json()
+    assert data["draw"] == 3
+    assert data["recordsTotal"] == data["recordsFiltered"] == 25
+    assert [row["id"] for row in data["data"]] == list(range(15, 10, -1))
+    assert set(data["data"][0]) == {"id", "name", "species", "age", "owner"}
+
+    # unsortable column falls back to id; search narrows the count
+    data = client.get('/admin/pets/data?draw=4&length=100&order[0][column]=4'
+                      '&search[value]=Pet 1').get_json()
+    assert data["recordsTotal"] == 25
+    assert data["recordsFiltered"] == len(data["data"]) == 11
+    assert data["data"][0]["id"] == 20
+
+    data = client.get('/admin/users/data?order[0][column]=1&order[0][dir]=asc'
+                      '&search[value]=owner25_2').get_json()
+    assert data["recordsFiltered"] == 6
+    assert [row["username"] for row in data["data"]][:2] == ["owner25_2", "owner25_20"]
+    assert data["data"][0]["pets"] == 1
+
+
+def test_pets_stream_returns_every_pet(app, client):
+    _add_owned_pets(app, 30)
+
+    response = client.get('/pets?stream=1&limit=5')
+    assert response.is_streamed
+    data = response.get_json()
+    assert len(data) == 30
+    assert all('contact_visible' in p for p in data)
+
+    response = client.get('/pets/search?species=dog&stream=1')
+    assert len(response.get_json()) == 30
+
+
+def test_pets_stream_empty(client):
+    assert client.get('/pets?stream=1').get_json() == []
+
+
+def test_response_cache_hits_and_invalidates(app, client, init_database):
+    user_id = _login_test_user(client, app)
+    with app.app_context():
+        from app.models import Pet
+        pet = Pet.query.filter_by(name="Test Dog").first()
+        pet.owner_id = user_id
+        db.session.commit()
+        pet_id = pet.id
+
+    assert client.get(f'/pets/{pet_id}').headers['X-Cache'] == 'MISS'
+    assert client.get(f'/pets/{pet_id}').headers['X-Cache'] == 'HIT'
+    assert client.get('/pets').headers['X-Cache'] == 'MISS'
+    assert client.get('/pets').headers['X-Cache'] == 'HIT'
+
+    client.post(f'/pets/{pet_id}/delete')
+
+    assert client.get(f'/pets/{pet_id}').status_code == 404
+    response = client.get('/pets')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert len(response.get_json()) == 1
+
+
+def test_profile_change_invalidates_contact(app, client, init_database):
+    user_id = _login_test_user(client, app)
+    with app.app_context():
+        from app.models import Pet
+        pet = Pet.query.filter_by(name="Test Dog").first()
+        pet.owner_id = user_id
+        db.session.commit()
+        pet_id = pet.id
+
+    assert client.get(f'/pets/{pet_id}').get_json()['contact_visible'] is True
+    client.post('/profile/toggle-contact')
+    assert client.get(f'/pets/{pet_id}').get_json()['contact_visible'] is False
+
+
+def test_cache_stats_endpoint(client, init_database):
+    client.get('/pets')
+    client.get('/pets')
+    assert client.get('/admin/cache').status_code == 403
+
+    with client.session_transaction() as sess:
+        sess["role"] = "admin"
+    stats = client.get('/admin/cache').get_json()
+    assert stats['hits'] == 1
+    assert stats['endpoints']['pets.list_pets'] == {"hits": 1, "misses": 1}
+
+
+def test_shared_cache_backend_sees_other_process_invalidation(tmp_path):
+    from app.cache import SharedLocalBackend
+    path = str(tmp_path / "cache.sqlite3")
+    first, second = SharedLocalBackend(path), SharedLocalBackend(path)
+
+    first.set("k", {"body": b"x", "status": 200, "headers": [], "tags": {"catalog": 0}, "expires": 9e12})
+    assert second.get("k")["body"] == b"x"
+
+    second.bump({"catalog"})
+    assert first.tag_versions(["catalog"]) == {"catalog": 1}
+
+
+
+def test_cache_is_shared_when_several_workers_serve(monkeypatch, tmp_path):
+    from app.cache import pet_tag
+
+    monkeypatch.delenv("RESPONSE_CACHE", raising=False)
+    monkeypatch.setenv("RESPONSE_CACHE_PATH", str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    assert create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"}).extensions["response_cache"].backend.name == "lru"
+
+    # two workers: an invalidation in one reaches the other
+    monkeypatch.setenv("WEB_CONCURRENCY", "2")
+    first, second = (create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"}).extensions["response_cache"]
+                     for _ in range(2))
+    assert first.backend.name == second.backend.name == "shared"
+    first.invalidate(pet_tag(7))
+    assert second.backend.tag_versions([pet_tag(7)]) == {pet_tag(7): 1}
+
+def test_search_ranks_and_tolerates_typos(app, client, init_database):
+    with app.app_context():
+        from app.models import Pet
+        db.session.add(Pet(
+            name="Goldie", species="Dog", breed="Labrador", age="3 years",
+            gender="Female", location="Ganja", description="Calm golden retriever mix",
+            image="https://example.com/lab.jpg", adopted=False
+        ))
+        db.session.commit()
+
+    names = [p['name'] for p in client.get('/pets/search?q=golden retriever').get_json()]
+    assert names[0] == "Test Dog"
+    assert "Goldie" in names
+
+    # misspelt breed still finds the retriever
+    names = [p['name'] for p in client.get('/pets/search?q=retreiver').get_json()]
+    assert names[0] == "Test Dog"
+
+    # old parameters keep their substring semantics
+    names = [p['name'] for p in client.get('/pets/search?breed=siam').get_json()]
+    assert names == ["Test Cat"]
+    names = [p['name'] for p in client.get('/pets/search?location=shelter&species=cat').get_json()]
+    assert names == ["Test Cat"]
+
+
+def test_search_index_follows_writes(app, client, init_database):
+    with app.app_context():
+        from app.models import Pet
+        pet = Pet.query.filter_by(name="Test Cat").first()
+        pet.breed = "Persian"
+        db.session.commit()
+
+    assert client.get('/pets/search?breed=siamese').get_json() == []
+    assert [p['name'] for p in client.get('/pets/search?q=persian').get_json()] == ["Test Cat"]
+
+
+def test_listings_are_geocoded_and_searchable_by_distance(app, client):
+    with app.app_context():
+        from app.models import Pet
+        for name, location in [("Near", "Baku, Azerbaijan"), ("Close", "Xırdalan"),
+                               ("Far", "Ganja"), ("Nowhere", "Test Shelter")]:
+            db.session.add(Pet(
+                name=name, species="Dog", breed="Mixed", age="1 year",
+                gender="Male", location=location, description="Test pet",
+                image="https://example.com/pet.jpg", adopted=False
+            ))
+        db.session.commit()
+        assert Pet.query.filter_by(name="Nowhere").first().geohash is None
+        assert Pet.query.filter_by(name="Near").first().geohash.startswith("tp5")
+
+    data = client.get('/pets/search?lat=40.41&lon=49.87&radius=30').get_json()
+    assert [p['name'] for p in data] == ["Near", "Close"]
+    assert data[0]['distance_km'] < data[1]['distance_km']
+
+    data = client.get('/pets/search?lat=40.41&lon=49.87&radius=400&limit=1')
+    assert [p['name'] for p in data.get_json()] == ["Near"]
+    cursor = data.headers['X-Next-Cursor']
+    names = [p['name'] for p in client.get(f'/pets/search?lat=40.41&lon=49.87&radius=400&cursor={cursor}').get_json()]
+    assert names == ["Close", "Far"]
+
+    # tampered cursors fall back to the first page
+    from app import pagination
+    for bad in (["x", 1], [1.5, "2"], [1.5], [True, 1], [1.5, 2, 3], "g"):
+        bad_cursor = pagination.encode_cursor({"g": bad})
+        response = client.get(f'/pets/search?lat=40.41&lon=49.87&radius=400&cursor={bad_cursor}')
+        assert response.status_code == 200 and response.get_json()[0]['name'] == "Near"
+        response = client.get(f'/deck?lat=40.41&lon=49.87&radius=30&cursor={bad_cursor}')
+        assert response.status_code == 200 and response.get_json()['cards'][0]['name'] == "Near"
+
+    cards = client.get('/deck?lat=40.41&lon=49.87&radius=30').get_json()['cards']
+    assert [c['name'] for c in cards] == ["Near", "Close"]
+
+    assert client.get('/pets/search?lat=abc&lon=1').status_code == 400
+
+
+def test_quiz_ranks_partial_matches(app, client):
+    with app.app_context():
+        from app.models import Pet
+        traits = {
+            "Perfect": ("apartment", "low", "beginner", "low", "small_children"),
+            "Close": ("apartment", "medium", "beginner", "low", "small_children"),
+            "Poor": ("farm", "high", "advanced", "high", "no_children"),
+        }
+        for name, (home, activity, exp, time_, family) in traits.items():
+            db.session.add(Pet(
+                name=name, species="Dog", breed="Mixed", age="1 year",
+                gender="Male", location="Baku", description="Test pet",
+                image="https://example.com/pet.jpg", adopted=False,
+                home_type=home, activity_level=activity, experience=exp,
+                time_commitment=time_, family_situation=family,
+            ))
+        db.session.commit()
+
+    answers = {"home_type": "apartment", "activity_level": "low", "experience": "beginner",
+               "time_commitment": "low", "family_situation": "small_children"}
+    matches = client.post('/quiz/results', json=answers).get_json()['matches']
+    assert [m['name'] for m in matches] == ["Perfect", "Close", "Poor"]
+    assert matches[0]['score'] == 100
+    assert matches[0]['score'] > matches[1]['score'] > matches[2]['score']
+
+    # adopting a pet takes it out of the index right after the commit
+    with app.app_context():
+        from app.models import Pet
+        Pet.query.filter_by(name="Perfect").first().adopted = True
+        db.session.commit()
+    answers["home_type"] = ""
+    matches = client.post('/quiz/results', json=answers).get_json()['matches']
+    assert [m['name'] for m in matches] == ["Close", "Poor"]
+
+
+def _full_ranking(profiles, answers, k=10):
+    # score and sort every pet (score desc, newer listing first), the
+    # answer the precomputed table has to give
+    from app.matching import TRAIT_NAMES, WEIGHTS, _compat_row
+
+    total = sum(WEIGHTS[t] for t in answers)
+    ranked = []
+    for pet_id, codes in profiles.items():
+        score = 1.0 if not total else sum(
+            WEIGHTS[t] * _compat_row(t, answers[t])[code]
+            for t, code in zip(TRAIT_NAMES, codes) if t in answers
+        ) / total
+        ranked.append((-round(score, 6), -pet_id))
+    ranked.sort()
+    return [(-neg_id, -neg_score) for neg_score, neg_id in ranked[:k]]
+
+
+def test_quiz_results_match_full_ranking():
+    # timings live in benchmarks/bench_quiz_scoring.py; this checks that the
+    # table picks the same pets, in the same order, as a full ranking
+    import numpy as np
+    from app.matching import TRAIT_NAMES, TRAITS, MatchIndex
+
+    rng = np.random.default_rng(0)
+    values = [[None] + options for options in TRAITS.values()]
+    rows = [(i, *[vals[rng.integers(len(vals))] for vals in values]) for i in range(1, 20_001)]
+    index = MatchIndex()
+    index.load(rows)
+    profiles = {
+        pet_id: [TRAITS[t].index(v) + 1 if v is not None else 0 for t, v in zip(TRAIT_NAMES, traits)]
+        for pet_id, *traits in rows
+    }
+
+    for answers in ({"home_type": "apartment", "activity_level": "low", "experience": "beginner"},
+                    {t: TRAITS[t][-1] for t in TRAIT_NAMES}, {}):
+        top = index.results(answers)
+        expected = _full_ranking(profiles, answers)
+        assert [pet_id for pet_id, _ in top] == [pet_id for pet_id, _ in expected]
+        assert [round(score, 5) for _, score in top] == [round(score, 5) for _, score in expected]
+    assert len(index) == 20_000
+    assert MatchIndex().results({}) == []
+
+
+def test_quiz_result_table_matches_full_scoring():
+    import random
+    import numpy as np
+    from app.matching import MatchIndex, TRAITS, TRAIT_NAMES
+
+    rng = np.random.default_rng(1)
+    values = [[None] + options for options in TRAITS.values()]
+    profiles = {i: [int(rng.integers(len(v))) for v in values] for i in range(1, 301)}
+    index = MatchIndex()
+    index.load(
+        (i, *[values[col][code] for col, code in enumerate(codes)])
+        for i, codes in profiles.items()
+    )
+
+    def random_answers():
+        return {t: random.choice(TRAITS[t]) for t in TRAIT_NAMES if random.random() < 0.6}
+
+    random.seed(0)
+    for step in range(200):
+        # new listings, edited traits and removals only refresh the
+        # combinations they touch; the table must stay exact
+        pet_id = random.randint(1, 400)
+        if step % 3:
+            profiles[pet_id] = [int(rng.integers(len(v))) for v in values]
+            index.upsert(pet_id, np.array(profiles[pet_id], dtype=np.int8))
+        else:
+            profiles.pop(pet_id, None)
+            index.remove(pet_id)
+        answers = random_answers()
+        assert [(p, round(s, 5)) for p, s in index.results(answers)] == \
+            [(p, round(s, 5)) for p, s in _full_ranking(profiles, answers)]
+    # on average a write refreshes a small share of the 1280 combinations
+    assert (index.table.refreshed - 1280) / 200 < 1280 / 4
+
+
+def _rebuilt(app, name, get):
+    # stale (and new) indexes are built in the background; wait for the build
+    import time
+
+    old = get()
+    deadline = time.monotonic() + 10
+    while app.extensions[name] is old and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return app.extensions[name]
+
+
+def _reloaded_match_index(app):
+    from app import matching
+    return _rebuilt(app, "match_index", matching.get_index)
+
+
+def test_stale_match_index_reloads_in_the_background(app, client, init_database, monkeypatch):
+    import threading
+    import time
+    from app import matching
+    from app.models import Pet
+
+    with app.app_context():
+        old = matching.get_index()
+        # a listing written by another process, which this one never saw
+        db.session.execute(Pet.__table__.insert().values(
+            name="Elsewhere", species="Dog", breed="Mixed", age="1 year", gender="Male",
+            location="Baku", description="x", image="https://example.com/e.jpg", adopted=False,
+            public_contact=True,
+        ))
+        db.session.commit()
+        other_id = db.session.query(db.func.max(Pet.id)).scalar()
+        assert other_id not in {pid for pid, _ in old.results({})}
+
+    loading, release = threading.Event(), threading.Event()
+    load_from_db = matching.MatchIndex.load_from_db
+
+    def slow_load(index):
+        load_from_db(index)
+        loading.set()
+        release.wait(10)
+
+    monkeypatch.setattr(matching.MatchIndex, "load_from_db", slow_load)
+    old.loaded_at = time.monotonic() - old.max_age - 1
+    # the stale table answers right away while the reload runs
+    assert [m["name"] for m in client.post('/quiz/results', json={"home_type": ""}).get_json()["matches"]] \
+        == ["Test Cat", "Test Dog"]
+    assert loading.wait(10)
+    with app.app_context():
+        assert matching.get_index() is old
+        # a listing committed after the reload's snapshot reaches the new index too
+        pet = Pet(name="During", species="Cat", breed="Mixed", age="1 year", gender="Female",
+                  location="Baku", description="x", image="https://example.com/d.jpg")
+        db.session.add(pet)
+        db.session.commit()
+        during_id = pet.id
+    release.set()
+    with app.app_context():
+        fresh = _reloaded_match_index(app)
+    assert fresh is not old
+    assert {other_id, during_id} <= {pid for pid, _ in fresh.results({})}
+
+
+def test_recommendations_deal_likely_matches_first(client, app, init_database, monkeypatch):
+    user_id = _login_test_user(client, app)
+    with app.app_context():
+        from app.models import Favorite, Pet, User
+        pets = {}
+        for name in ["Alpha", "Bravo", "Charlie", *[f"Filler {i}" for i in range(12)]]:
+            pet = Pet(
+                name=name, species="Dog", breed="Mixed", age="1 year",
+                gender="Male", location="Baku", description="Test pet",
+                image="https://example.com/pet.jpg", adopted=False,
+            )
+            db.session.add(pet)
+            pets[name] = pet
+        db.session.flush()
+        for i, liked in enumerate([("Alpha", "Bravo"), ("Alpha", "Bravo"), ("Alpha", "Charlie")]):
+            other = User(username=f"fan{i}", password_hash="x")
+            db.session.add(other)
+            db.session.flush()
+            for name in liked:
+                db.session.add(Favorite(user_id=other.id, pet_id=pets[name].id))
+        db.session.commit()
+        ids = {name: pet.id for name, pet in pets.items()}
+
+    # the index builds in the background; popular pets lead meanwhile (and
+    # for this user afterwards too, who has no favorites yet)
+    import threading
+    from app import recommend
+    building, release = threading.Event(), threading.Event()
+    build = recommend.CoFavoriteIndex.build
+
+    def slow_build(index, *args):
+        building.set()
+        release.wait(10)
+        build(index, *args)
+
+    monkeypatch.setattr(recommend.CoFavoriteIndex, "build", slow_build)
+    cards = client.get('/deck?limit=2').get_json()['cards']
+    assert [c['name'] for c in cards] == ["Alpha", "Bravo"]
+    assert building.wait(10) and app.extensions["recommender"].built_at is None
+    release.set()
+    with app.app_context():
+        assert _rebuilt(app, "recommender", recommend.get_recommender).built_at is not None
+
+    # a new favorite is applied incrementally, no rebuild needed
+    client.post(f"/pets/{ids['Alpha']}/favorite")
+    seen = []
+    url = '/deck?limit=5'
+    while url:
+        data = client.get(url).get_json()
+        seen.extend(c['name'] for c in data['cards'])
+        url = f"/deck?limit=5&cursor={data['next_cursor']}" if data['next_cursor'] else None
+    assert seen[:2] == ["Bravo", "Charlie"]
+    # every other card still comes exactly once
+    assert len(seen) == len(set(seen)) == 16
+
+    with app.app_context():
+        from app.recommend import get_recommender
+        assert get_recommender().for_user(user_id, 2) == [ids["Bravo"], ids["Charlie"]]
+
+    page = client.get(f"/pet/{ids['Alpha']}").get_data(as_text=True)
+    assert "also liked" in page
+    assert page.index("Bravo") < page.index("Charlie")
+
+    # anonymous pages are cached; adopting a recommended pet drops its card
+    anonymous = app.test_client()
+    assert "Bravo" in anonymous.get(f"/pet/{ids['Alpha']}").get_data(as_text=True)
+    with app.app_context():
+        from app.cache import CATALOG, invalidate_on_commit, pet_tag
+        db.session.get(Pet, ids["Bravo"]).adopted = True
+        invalidate_on_commit(CATALOG, pet_tag(ids["Bravo"]))
+        db.session.commit()
+    page = anonymous.get(f"/pet/{ids['Alpha']}").get_data(as_text=True)
+    assert "Bravo" not in page and "Charlie" in page
+
+
+def test_daily_stats_rollup_tracks_writes(client, app, init_database):
+    from app import daily_stats
+
+    user_id = _login_test_user(client, app)
+    with app.app_context():
+        from app.models import Favorite, Pet
+        dog, cat = Pet.query.order_by(Pet.id).all()
+        dog_id = dog.id
+        db.session.add(Favorite(user_id=user_id, pet_id=dog.id))
+        cat.owner_id = user_id
+        db.session.commit()
+        cat_id = cat.id
+
+    # bulk favorites from swipes and an adoption through the route
+    client.post('/swipes', json={"decisions": [{"pet_id": cat_id, "decision": "yes"},
+                                               {"pet_id": dog_id, "decision": "yes"}]})
+    client.post(f'/pets/{cat_id}/adopt')
+
+    with app.app_context():
+        _, series, totals = daily_stats.window(7)
+        assert series["signups"][-1] == 1
+        assert series["listings"][-1] == 2
+        assert series["favorites"][-1] == 2
+        assert series["adoptions"][-1] == 1
+        assert daily_stats.breakdown(totals, daily_stats.SPECIES) == {"Cat": 1, "Dog": 1}
+        incremental = dict(totals)
+
+        # a rebuild from history lands on the same numbers
+        daily_stats.backfill()
+        assert dict(daily_stats.window(7)[2]) == incremental
+
+    with client.session_transaction() as sess:
+        sess["role"] = "admin"
+    for days in (30, 365):
+        assert _count_queries(app, lambda: client.get(f'/admin/charts?days={days}')) == 1
+    page = client.get('/admin/charts?days=90').get_data(as_text=True)
+    assert "in the last 90 days" in page
+
+
+def test_dashboard_counters_are_cached_and_track_activity(client, app, init_database):
+    _login_test_user(client, app)
+    client.get('/quiz')
+    client.get('/quiz')  # same day: not written twice
+
+    with app.app_context():
+        from app.models import UserActivity
+        assert UserActivity.query.count() == 1
+
+    with client.session_transaction() as sess:
+        sess["role"] = "admin"
+    counters = client.get('/admin/counters').get_json()['counters']
+    assert counters['pets_available']['value'] == 2
+    assert counters['users_total'] == {"value": 1, "source": "exact", "age": 0.0}
+    assert counters['users_created_today']['value'] == 1
+    assert counters['users_created_today']['source'] == "maintained"
+    assert counters['users_active_today']['value'] == 1
+
+    # served from the counter cache until the TTL runs out
+    assert _count_queries(app, lambda: client.get('/admin/dashboard')) == 0
+    assert b"Active today: 1" in client.get('/admin/dashboard').data
+
+
+def test_bulk_import_validates_dedupes_and_queues_images(app, client):
+    import io
+    from app import daily_stats, image_queue, importer, matching
+    from app.models import ImageFetch, Pet
+
+    header = "external_id,name,species,breed,age,gender,location,description,image,home_type\n"
+    feed = header + (
+        "a1,Rex,dog,Beagle,2 years,Male,Baku,Good boy,https://shelter.example/rex.jpg,Apartment\n"
+        "a2,Tom,cat,Tabby,1 year,Male,Nowhere,Calm,https://res.cloudinary.com/x/tom.jpg,\n"
+        "a3,,dog,Pug,1 year,Male,Baku,No name,https://shelter.example/pug.jpg,\n"
+        "a1,Rex again,dog,Beagle,2 years,Male,Baku,Duplicate,https://shelter.example/rex.jpg,\n"
+        "a4,Spot,dog,Mixed,3 years,Female,Baku,Bad image,ftp://shelter.example/spot.jpg,\n"
+    )
+    with app.app_context():
+        matching.get_index()
+        report = importer.import_pets(io.BytesIO(feed.encode()), "csv", source="shelter", batch_size=2)
+        summary = report.as_dict()
+        assert (summary["rows"], summary["inserted"], summary["duplicates"], summary["failed"]) == (5, 2, 1, 2)
+        assert [e["line"] for e in summary["errors"]] == [4, 6]
+        assert "name" in summary["errors"][0]["error"]
+
+        rex = Pet.query.filter_by(source="shelter", external_id="a1").one()
+        assert rex.species == "Dog" and rex.home_type == "Apartment" and rex.geohash
+        # only the image that is not already on our storage is queued
+        assert [j.pet_id for j in ImageFetch.query] == [rex.id]
+        _, _, totals = daily_stats.window(1)
+        assert totals[daily_stats.LISTINGS] == 2
+        assert rex.id in {pid for pid, _ in _reloaded_match_index(app).results({})}
+
+        # re-importing the same feed adds nothing
+        again = importer.import_pets(io.BytesIO(feed.encode()), "csv", source="shelter").as_dict()
+        assert (again["inserted"], again["duplicates"]) == (0, 3)
+
+    # the cached catalog shows the copied image once the queue has run
+    assert b"shelter.example/rex.jpg" in client.get('/pets').data
+    with app.app_context():
+        result = image_queue.process_pending(save=lambda url: "https://cdn.example/rex.jpg")
+        assert result == {"copied": 1, "failed": 0, "pending": 0}
+        assert db.session.get(Pet, rex.id).image == "https://cdn.example/rex.jpg"
+    page = client.get('/pets').data
+    assert b"cdn.example/rex.jpg" in page and b"shelter.example/rex.jpg" not in page
+
+    jsonl = b'{"external_id": 7, "name": "Mia", "species": "Cat", "breed": "Persian", "age": "4 years",' \
+            b' "gender": "Female", "location": "Baku", "description": "Fluffy",' \
+            b' "image": "https://shelter.example/mia.jpg", "adopted": true}\nnot json\n'
+    assert client.post('/admin/import', data={"file": (io.BytesIO(jsonl), "feed.jsonl")}).status_code == 403
+    with client.session_transaction() as sess:
+        sess["role"] = "admin"
+    data = client.post('/admin/import', data={"file": (io.BytesIO(jsonl), "feed.jsonl")}).get_json()
+    assert (data["inserted"], data["failed"]) == (1, 1)
+    with app.app_context():
+        assert Pet.query.filter_by(external_id="7").one().adopted_at is not None
+
+
+def _owner_with_favorited_pets(pets, fans):
+    from app.models import Favorite, Pet, Swipe, User
+    owner = User(username=f"lister{pets}", password_hash="x")
+    users = [User(username=f"fan{pets}_{i}", password_hash="x") for i in range(fans)]
+    db.session.add_all([owner] + users)
+    db.session.flush()
+    listed = [
+        Pet(name=f"Pet {i}", species="Dog", breed="Mixed", age="1 year", gender="Male",
+            location="Baku", description="x", image="https://example.com/p.jpg", owner_id=owner.id)
+        for i in range(pets)
+    ]
+    db.session.add_all(listed)
+    db.session.flush()
+    for pet in listed:
+        for user in users:
+            db.session.add(Favorite(user_id=user.id, pet_id=pet.id))
+            db.session.add(Swipe(user_id=user.id, pet_id=pet.id, liked=True))
+    db.session.commit()
+    return owner.id, [p.id for p in listed]
+
+
+def test_deletes_cascade_in_constant_statements(app, client):
+    from app import deletion, matching
+    from app.models import Favorite, Pet, Swipe, User
+
+    with app.app_context():
+        small, _ = _owner_with_favorited_pets(1, 1)
+        large, large_pets = _owner_with_favorited_pets(20, 5)
+        index = matching.get_index()
+        assert large_pets[-1] in {pid for pid, _ in index.results({})}
+
+        def delete(user_id):
+            deletion.delete_users([user_id])
+            db.session.commit()
+
+        few = _count_queries(app, lambda: delete(small))
+        many = _count_queries(app, lambda: delete(large))
+        assert many == few
+        assert Pet.query.count() == Favorite.query.count() == Swipe.query.count() == 0
+        assert User.query.count() == 6
+        assert not index.results({})
+
+        owner, pets = _owner_with_favorited_pets(3, 2)
+
+    with client.session_transaction() as sess:
+        sess["role"] = "admin"
+    client.post('/admin/pets/delete', data={"ids": [str(pets[0]), str(pets[1])]})
+    with app.app_context():
+        assert [p.id for p in Pet.query] == [pets[2]]
+        assert Favorite.query.count() == 2
+    client.post('/admin/users/delete', data={"ids": [str(owner)]})
+    with app.app_context():
+        assert Pet.query.count() == Favorite.query.count() == 0
+
+
+def test_probes_are_cheap_and_stats_are_cached(app, client, init_database):
+    import time
+    from app.models import Pet
+
+    assert _count_queries(app, lambda: client.get('/livez')) == 0
+    ready = client.get('/readyz')
+    assert ready.status_code == 200
+    assert ready.get_json()["status"] == "ready" and "pool" in ready.get_json()
+
+    assert client.get('/health/db').get_json()["pets_total"] == 2
+    assert _count_queries(app, lambda: client.get('/health/db')) == 0
+    client.get('/debug')
+    assert _count_queries(app, lambda: client.get('/api/status')) == 0
+
+    # once stale, the old value is served while a thread recomputes it
+    with app.app_context():
+        db.session.add(Pet(name="New", species="Dog", breed="Mixed", age="1 year", gender="Male",
+                           location="Baku", description="x", image="https://example.com/p.jpg"))
+        db.session.commit()
+    app.extensions["counters"].ttl = 0
+    assert client.get('/health/db').get_json()["pets_total"] == 2
+    deadline = time.time() + 5
+    while client.get('/api/status').get_json()["pets_in_db"] != 3:
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_metrics_endpoint_reports_requests_and_queries(app, client, init_database, tmp_path):
+    from app import metrics
+
+    # measure the database work, not the response cache
+    app.extensions["response_cache"] = None
+    client.get('/pets')
+    client.get('/pets')
+    client.get('/no-such-page')
+    text = client.get('/metrics').get_data(as_text=True)
+    assert '# TYPE http_request_duration_seconds histogram' in text
+    assert 'http_request_duration_seconds_count{endpoint="pets.list_pets",method="GET",status="200"} 2' in text
+    assert 'http_request_duration_seconds_count{endpoint="unmatched",method="GET",status="404"} 1' in text
+    assert 'db_queries_per_request_count{endpoint="pets.list_pets"} 2' in text
+    assert 'db_queries_per_request_bucket{endpoint="pets.list_pets",le="0.0"} 0' in text
+    # the scrape itself is still in flight
+    assert 'http_requests_in_flight 1.0' in text
+
+    # worker files in a shared directory are added together
+    registry = metrics.Registry(str(tmp_path))
+    registry.observe("image_upload_seconds", 0.3, outcome="ok")
+    registry.flush()
+    # as if written by another (since exited) worker process
+    os.replace(tmp_path / f"metrics_{os.getpid()}.json", tmp_path / "metrics_999999.json")
+    other = metrics.Registry(str(tmp_path))
+    other.observe("image_upload_seconds", 0.7, outcome="ok")
+    assert 'image_upload_seconds_count{outcome="ok"} 2' in other.render()
+
+    app.config["METRICS_TOKEN"] = "s3cret"
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={"Authorization": "Bearer s3cret"}).status_code == 200
+
+
+def test_profiler_samples_armed_and_signed_requests(app, client, init_database, tmp_path):
+    import time
+    from app import profiler
+
+    prof = app.extensions["profiler"]
+    prof.directory = str(tmp_path)
+    client.get('/pets')
+    assert prof.list() == []
+
+    with client.session_transaction() as sess:
+        sess["role"] = "admin"
+    client.post('/admin/profiles/arm', data={"endpoint": "pets.list_pets", "count": "1"})
+    client.get('/pets')
+    client.get('/pets')  # only the next request was armed
+    client.get('/pets', headers={profiler.HEADER: "forged"})
+    assert [p["endpoint"] for p in prof.list()] == ["pets.list_pets"]
+
+    client.get('/quiz', headers={profiler.HEADER: prof.make_token("quiz.quiz_page")})
+    client.get('/pets', headers={profiler.HEADER: prof.make_token("quiz.quiz_page")})
+    profiles = prof.list()
+    assert len(profiles) == 2 and profiles[0]["endpoint"] == "quiz.quiz_page"
+
+    page = client.get(f"/admin/profiles/{profiles[0]['id']}")
+    assert page.status_code == 200
+    assert client.get(f"/admin/profiles/{profiles[0]['id']}/folded").status_code == 200
+    assert client.get('/admin/profiles/..%2Fetc/folded').status_code == 404
+    assert b"pets.list_pets" in client.get('/admin/profiles').data
+
+    # a busy thread shows up in the collapsed stacks
+    import threading
+
+    def spin():
+        end = time.time() + 0.1
+        while time.time() < end:
+            pass
+
+    worker = threading.Thread(target=spin)
+    worker.start()
+    stacks = profiler.Sampler(worker.ident, 0.001).start()
+    worker.join()
+    stacks = stacks.stop()
+    assert any(stack.endswith(")") and "spin (" in stack for stack in stacks)
+    assert profiler.folded({"a;b": 2}) == "a;b 2\n"
+
+
+def test_query_log_fingerprints_and_captures_plans(monkeypatch, tmp_path):
+    import json
+    import time
+    from app import querylog
+
+    assert querylog.fingerprint(
+        "SELECT * FROM pets WHERE id IN (?, ?, ?) AND name = 'Rex'  -- x\n LIMIT 10"
+    ) == "SELECT * FROM pets WHERE id IN (...) AND name = ? LIMIT ?"
+    assert querylog.fingerprint("INSERT INTO t (a, b) VALUES (%(a)s, 1), (%(b)s, 2)") == \
+        "INSERT INTO t (a, b) VALUES (...)"
+
+    # a database file, so plans are captured on a connection of their own
+    directory = tmp_path / "queries"
+    monkeypatch.setenv("QUERY_LOG_DIR", str(directory))
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path}/app.db"})
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    log = app.extensions["query_log"]
+    log.reset()
+    log.slow_ms = 0.0  # everything is slow, so plans get captured
+    app.extensions["response_cache"] = None
+    for _ in range(3):
+        client.get('/pets')
+
+    def select_pets():
+        return [q for q in log.summaries() if q["sql"].startswith("SELECT") and "FROM pets" in q["sql"]]
+
+    selects = select_pets()
+    assert selects and selects[0]["count"] == 3
+    assert selects[0]["p50_ms"] <= selects[0]["p99_ms"] <= selects[0]["max_ms"]
+    assert log.recent_slow and log.recent_slow[-1]["endpoint"] == "pets.list_pets"
+    # plans are captured in the background, after the response
+    deadline = time.monotonic() + 10
+    while not log.get(selects[0]["id"])["plan"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert log.get(selects[0]["id"])["plan"]  # SQLite's EXPLAIN QUERY PLAN rows
+
+    # another worker's numbers, as it writes them to the shared directory
+    other = querylog.QueryLog()
+    other.record("SELECT count(*) FROM pets WHERE adopted = 1", 7.0)
+    other.record(selects[0]["sql"], 1.0)
+    stale = dict(other.snapshot(), pid=999999)
+    with open(directory / "queries_999999.json", "w") as f:
+        json.dump(stale, f)
+    assert log.get(selects[0]["id"])["count"] == 4
+    assert any(q["sql"] == "SELECT count(*) FROM pets WHERE adopted = ?" for q in log.summaries())
+
+    with client.session_transaction() as sess:
+        sess["role"] = "admin"
+    page = client.get('/admin/queries')
+    assert page.status_code == 200 and b"FROM pets" in page.data and b"2 workers" in page.data
+    assert client.get(f"/admin/queries/{selects[0]['id']}").status_code == 200
+    assert client.get('/admin/queries/nope').status_code == 404
+
+    # a reset clears every worker, including numbers written from before it
+    client.post('/admin/queries/reset')
+    with open(directory / "queries_999999.json", "w") as f:
+        json.dump(stale, f)
+    assert not any(q["sql"] == selects[0]["sql"] for q in log.summaries())
+    assert not any("adopted" in q["sql"] for q in log.summaries())
+
+
+def test_statements_are_timed_once_and_failures_leave_nothing_behind(app):
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+    from app import db as db_module
+
+    timed = []
+
+    def spy(conn, cursor, statement, parameters, executemany, seconds):
+        timed.append(statement)
+
+    db_module.on_statement(spy)
+    try:
+        with app.app_context():
+            # metrics and the query log share one pair of listeners
+            engine = db.engine
+            assert len(engine.dispatch.before_cursor_execute) == 1
+            # the pooled connection's info outlives the Connection
+            info = db.session.connection().info
+            db.session.execute(text("SELECT 42"))
+            assert timed.count("SELECT 42") == 1
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    db.session.execute(text("SELECT * FROM no_such_table"))
+                db.session.rollback()
+            db.session.execute(text("SELECT 43"))
+            assert db.session.connection().info is info
+            assert "statement_start" not in info
+            assert "no_such_table" not in " ".join(timed)
+    finally:
+        db_module._statement_callbacks.remove(spy)
+
+def test_create_tables_command_and_gunicorn_settings(monkeypatch, tmp_path):
+    import runpy
+    from alembic.script import ScriptDirectory
+    from sqlalchemy import inspect, text
+    from app.db import MIGRATIONS_DIR
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path}/fresh.db"})
+    with app.app_context():
+        assert "pets" not in inspect(db.engine).get_table_names()
+    result = app.test_cli_runner().invoke(args=["create-tables"])
+    assert result.exit_code == 0
+    with app.app_context():
+        assert {"pets", "users", "favorites"} <= set(inspect(db.engine).get_table_names())
+        # a blank database is created whole and marked as fully migrated
+        version = db.session.execute(text("SELECT version_num FROM alembic_version")).scalar()
+        assert version == ScriptDirectory(MIGRATIONS_DIR).get_current_head()
+
+    monkeypatch.setenv("METRICS_DIR", str(tmp_path / "metrics"))
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    monkeypatch.setenv("PORT", "8123")
+    conf = runpy.run_path(os.path.join(os.path.dirname(__file__), "../src/gunicorn.conf.py"))
+    assert conf["preload_app"] and conf["workers"] == 3 and conf["bind"] == "0.0.0.0:8123"
+    assert conf["threads"] >= 1 and conf["graceful_timeout"] > 0
+    assert callable(conf["post_fork"])
+
+    # several workers must share one response cache
+    assert os.environ["WEB_CONCURRENCY"] == "3"
+    monkeypatch.setenv("RESPONSE_CACHE", "lru")
+    with pytest.raises(RuntimeError):
+        conf["check_cache"](create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"}))
+    monkeypatch.delenv("RESPONSE_CACHE")
+    monkeypatch.setenv("RESPONSE_CACHE_PATH", str(tmp_path / "cache.sqlite3"))
+    conf["check_cache"](create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"}))
+
+
+
+def test_create_tables_migrates_a_baseline_database(tmp_path):
+    from flask_migrate import upgrade
+    from sqlalchemy import inspect, text
+    from app.db import MIGRATIONS_DIR
+
+    # a database created by db.create_all() before the schema changes
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path}/deployed.db"})
+    with app.app_context():
+        upgrade(directory=MIGRATIONS_DIR, revision="0001")
+        db.session.execute(text("DELETE FROM alembic_version"))
+        db.session.execute(text(
+            "INSERT INTO pets (name, species, breed, age, gender, location, description, image,"
+            " adopted, source, public_contact) VALUES ('Old', 'Dog', 'Mixed', '3 years', 'Male',"
+            " 'Baku', 'x', 'https://example.com/old.jpg', 0, 'catalog', 1)"
+        ))
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["create-tables"])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        pets = inspect(db.engine)
+        assert {"shuffle_key", "latitude", "longitude", "geohash", "adopted_at",
+                "external_id", "image_status"} <= {c["name"] for c in pets.get_columns("pets")}
+        assert {"ix_pets_deck", "ix_pets_geohash", "ux_pets_source_external", "ix_pets_created",
+                "ix_pets_available_created", "ix_pets_owner_created", "ix_pets_name",
+                "ix_pets_species"} <= {i["name"] for i in pets.get_indexes("pets")}
+        assert {"ix_users_created", "ix_users_email"} <= {i["name"] for i in pets.get_indexes("users")}
+        assert "ix_favorites_user_created" in {i["name"] for i in pets.get_indexes("favorites")}
+        assert db.session.execute(text("SELECT count(*) FROM pets WHERE shuffle_key IS NULL")).scalar() == 0
+        # the models' queries work against the migrated table
+        from app.models import Pet
+        old = Pet.query.filter_by(name="Old").one()
+        assert old.image_status == "ready" and old.external_id is None and old.latitude is None
+
+    # running it again is a no-op
+    assert app.test_cli_runner().invoke(args=["create-tables"]).exit_code == 0
+
+
+def test_create_tables_makes_existing_foreign_keys_cascade(tmp_path):
+    from sqlalchemy import inspect, text
+    from app import deletion, search
+
+    # foreign keys from before deletes cascaded, with the search triggers on pets
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path}/legacy.db"})
+    with app.app_context():
+        for stmt in [
+            "CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR(64) NOT NULL UNIQUE,"
+            " display_name VARCHAR(120), email VARCHAR(120), phone VARCHAR(50),"
+            " password_hash VARCHAR(256) NOT NULL, public_contact BOOLEAN NOT NULL, created_at DATETIME)",
+            "CREATE TABLE pets (id INTEGER PRIMARY KEY, name VARCHAR(120) NOT NULL, species VARCHAR(30) NOT NULL,"
+            " breed VARCHAR(120) NOT NULL, age VARCHAR(60) NOT NULL, gender VARCHAR(30) NOT NULL,"
+            " location VARCHAR(200) NOT NULL, description TEXT NOT NULL, image VARCHAR(500) NOT NULL,"
+            " adopted BOOLEAN NOT NULL, source VARCHAR(30) NOT NULL, owner_id INTEGER REFERENCES users (id),"
+            " contact_email_override VARCHAR(120), contact_phone_override VARCHAR(50), home_type VARCHAR(50),"
+            " activity_level VARCHAR(50), experience VARCHAR(50), time_commitment VARCHAR(50),"
+            " family_situation VARCHAR(50), public_contact BOOLEAN NOT NULL, created_at DATETIME)",
+            "CREATE TABLE favorites (user_id INTEGER NOT NULL REFERENCES users (id),"
+            " pet_id INTEGER NOT NULL REFERENCES pets (id), created_at DATETIME, PRIMARY KEY (user_id, pet_id))",
+            "CREATE TABLE swipes (user_id INTEGER NOT NULL REFERENCES users (id),"
+            " pet_id INTEGER NOT NULL REFERENCES pets (id), liked BOOLEAN NOT NULL, created_at DATETIME,"
+            " PRIMARY KEY (user_id, pet_id))",
+            *search.SQLITE_DDL,
+            "INSERT INTO users (id, username, password_hash, public_contact) VALUES (1, 'lister', 'x', 1)",
+            "INSERT INTO pets (id, name, species, breed, age, gender, location, description, image, adopted,"
+            " source, owner_id, public_contact) VALUES (1, 'Rex', 'Dog', 'Mixed', '2 years', 'Male', 'Baku',"
+            " 'x', 'https://example.com/rex.jpg', 0, 'catalog', 1, 1)",
+            "INSERT INTO favorites (user_id, pet_id) VALUES (1, 1)",
+            "INSERT INTO swipes (user_id, pet_id, liked) VALUES (1, 1, 1)",
+        ]:
+            db.session.execute(text(stmt))
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["create-tables"])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        schema = inspect(db.engine)
+        for table in ("pets", "favorites", "swipes"):
+            assert {fk["options"].get("ondelete") for fk in schema.get_foreign_keys(table)} == {"CASCADE"}, table
+        assert "ix_favorites_pet" in {i["name"] for i in schema.get_indexes("favorites")}
+        assert "ix_swipes_pet" in {i["name"] for i in schema.get_indexes("swipes")}
+        # rows survive the rebuild and the search index still follows writes
+        assert db.session.execute(text("SELECT count(*) FROM favorites")).scalar() == 1
+        db.session.execute(text("UPDATE pets SET name = 'Biscuit' WHERE id = 1"))
+        found = text("SELECT rowid FROM pets_fts WHERE pets_fts MATCH 'biscuit'")
+        assert db.session.execute(found).scalars().all() == [1]
+
+        assert deletion.delete_users([1]) == 1
+        db.session.commit()
+        assert [db.session.execute(text(f"SELECT count(*) FROM {t}")).scalar()
+                for t in ("pets", "favorites", "swipes")] == [0, 0, 0]
+
+    assert app.test_cli_runner().invoke(args=["create-tables"]).exit_code == 0
+
+
+def _slowest_imports(importtime: str, top: int = 8):
+    # "import time: self [us] | cumulative | package", top level only
+    rows = []
+    for line in importtime.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit() and not parts[2].startswith("  "):
+            rows.append((int(parts[1]) / 1e6, parts[2].strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def test_startup_defers_heavy_imports(record_property, capsys):
+    import json
+    import subprocess
+
+    src = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "from app import create_app\n"
+        "imported = time.perf_counter()\n"
+        "create_app()\n"
+        "created = time.perf_counter()\n"
+        "print(json.dumps({'import': imported - start, 'create_app': created - imported,\n"
+        "                  'lazy': [m for m in ('cloudinary', 'urllib3', 'requests', 'PIL') if m in sys.modules]}))\n"
+    )
+    env = dict(os.environ, DATABASE_URL="sqlite:///:memory:", STARTUP_LOG="off")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          cwd=src, env=env, capture_output=True, text=True, check=True)
+    timings = json.loads(proc.stdout.strip().splitlines()[-1])
+    slowest = _slowest_imports(proc.stderr)
+    record_property("import_seconds", round(timings["import"], 3))
+    record_property("create_app_seconds", round(timings["create_app"], 3))
+    record_property("slowest_imports", slowest)
+
+    # timings are reported, not asserted: wall-clock limits flake on busy
+    # CI runners (see benchmarks/bench_serving.py for cold-start numbers)
+    assert timings["lazy"] == [], f"upload and imaging dependencies must load on first use: {slowest}"
+
+    # boot messages only when asked for
+    capsys.readouterr()
+    create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
+    assert "Registered routes" not in capsys.readouterr().out
+    create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:", "STARTUP_LOG": "on"})
+    assert "Registered routes" in capsys.readouterr().out
+
+
+def test_listing_photos_upload_in_the_background(app, client, init_database, tmp_path):
+    import io
+    import time
+    from app import image_queue, storage
+    from app.models import ImageFetch, Pet
+
+    class SlowStorage(storage.MemoryStorage):
+        # fails `failures` times, then takes `delay` seconds per upload
+        def __init__(self, delay=0.0, failures=0):
+            super().__init__()
+            self.delay, self.failures = delay, failures
+
+        def save(self, source):
+            if self.failures:
+                self.failures -= 1
+                raise OSError("storage unavailable")
+            time.sleep(self.delay)
+            return super().save(source)
+
+    queue = app.extensions["upload_queue"]
+    queue.spool_dir = str(tmp_path / "spool")
+    queue.retry_delay = 0.01
+    app.extensions["response_cache"] = None
+    _login_test_user(client, app)
+
+    def create(name, photo=b"\x89PNG fake image bytes"):
+        form = {"name": name, "species": "dog", "breed": "Mixed", "age": "2 years", "gender": "Male",
+                "location": "Baku", "description": "Friendly", "image": (io.BytesIO(photo), "photo.png")}
+        start = time.perf_counter()
+        response = client.post('/pets', data=form, content_type="multipart/form-data")
+        assert response.status_code == 302
+        with app.app_context():
+            pet = Pet.query.filter_by(name=name).one()
+            return pet.id, pet.image, pet.image_status, time.perf_counter() - start
+
+    # the request returns long before the upload finishes
+    app.extensions["storage"] = SlowStorage(delay=0.5)
+    pet_id, image, status, seconds = create("Slowpoke")
+    assert (image, status) == (image_queue.PLACEHOLDER_IMAGE, "processing") and seconds < 0.4
+    assert b"Photo processing" in client.get(f'/pet/{pet_id}').data
+    assert queue.wait(timeout=10)
+    with app.app_context():
+        pet = db.session.get(Pet, pet_id)
+        assert pet.image_status == "ready" and pet.image.startswith(storage.MEDIA_URL)
+        assert db.session.get(ImageFetch, pet_id) is None
+    assert client.get(pet.image).data == b"\x89PNG fake image bytes"
+    assert os.listdir(tmp_path / "spool") == []
+
+    # failures are retried, and given up on after MAX_ATTEMPTS
+    app.extensions["storage"] = SlowStorage(failures=2)
+    pet_id, *_ = create("Flaky")
+    assert queue.wait(timeout=10)
+    with app.app_context():
+        assert db.session.get(Pet, pet_id).image_status == "ready"
+
+    app.extensions["storage"] = SlowStorage(failures=100)
+    pet_id, *_ = create("Doomed")
+    assert queue.wait(timeout=10)
+    with app.app_context():
+        assert db.session.get(Pet, pet_id).image_status == "failed"
+        assert db.session.get(ImageFetch, pet_id).attempts == image_queue.MAX_ATTEMPTS
+
+    # the local backend writes files and serves them from /media/
+    local = storage.LocalStorage(str(tmp_path / "media"))
+    app.extensions["storage"] = local
+    source = tmp_path / "cat.jpg"
+    source.write_bytes(b"jpeg bytes")
+    url = local.save(str(source))
+    assert url == local.save(str(source))  # content-addressed
+    assert client.get(url).data == b"jpeg bytes"
+    assert client.get('/media/../cat.jpg').status_code == 404
+
+    # every backend has to store images
+    with pytest.raises(TypeError):
+        storage.Storage()
+
+
+def test_pet_photos_are_served_as_sized_variants(app, client, init_database):
+    import io
+    from PIL import Image
+    from app import images, storage
+    from app.models import Pet
+
+    app.extensions["storage"] = store = storage.MemoryStorage()
+    app.extensions["response_cache"] = None
+    photo = io.BytesIO()
+    Image.new("RGB", (2000, 1500), (200, 120, 40)).save(photo, "PNG")
+    store.files["abc123.png"] = photo.getvalue()
+
+    # Cloudinary images get transformation URLs; other URLs are kept as is
+    cloud = "https://res.cloudinary.com/demo/image/upload/v1/take-a-paw/pets/rex.jpg"
+    card = images.variants(cloud, "card")
+    assert card["src"] == ("https://res.cloudinary.com/demo/image/upload/"
+                           "c_fill,w_600,h_488,f_auto,q_auto/v1/take-a-paw/pets/rex.jpg")
+    assert card["srcset"].count("w, ") == 2 and "c_fill,w_800,h_650" in card["srcset"]
+    assert images.variants("https://example.com/dog.jpg", "thumb")["srcset"] is None
+
+    # the memory backend gets resized renditions in both formats
+    local = images.variants("/media/abc123.png", "thumb")
+    assert local["src"] == "/media/v/thumb/320/abc123.png.jpg"
+    assert "/media/v/thumb/320/abc123.png.webp 320w" in local["webp_srcset"]
+    for fmt, mimetype in (("jpg", "image/jpeg"), ("webp", "image/webp")):
+        response = client.get(f"/media/v/thumb/320/abc123.png.{fmt}")
+        assert response.status_code == 200 and response.mimetype == mimetype
+        assert Image.open(io.BytesIO(response.data)).size == (320, 213)
+        assert len(response.data) < len(store.files["abc123.png"]) / 10
+    detail = client.get("/media/v/detail/640/abc123.png.jpg")
+    assert Image.open(io.BytesIO(detail.data)).size == (640, 480)
+    for url in ("/media/v/thumb/333/abc123.png.jpg", "/media/v/huge/320/abc123.png.jpg",
+                "/media/v/thumb/320/abc123.png.gif", "/media/v/thumb/320/missing.png.jpg"):
+        assert client.get(url).status_code == 404
+
+    # pages use srcset, lazy-load below the fold and defer deck cards
+    with app.app_context():
+        for i in range(4):
+            db.session.add(Pet(name=f"Pup {i}", species="Dog", breed="Mixed", age="1 year", gender="Male",
+                               location="Baku", description="x", image="/media/abc123.png", adopted=False))
+        db.session.commit()
+        pet_id = Pet.query.filter_by(name="Pup 0").one().id
+    home = client.get("/").data.decode()
+    assert 'type="image/webp"' in home and 'fetchpriority="high"' in home
+    assert 'loading="lazy"' in home and "data-srcset=" in home
+    page = client.get(f"/pet/{pet_id}").data.decode()
+    assert 'srcset="/media/v/detail/640/abc123.png.jpg 640w' in page
+    deck = client.get("/deck").get_json()["cards"]
+    assert {card["image_card"]["sizes"] for card in deck} == {images.VARIANTS["card"].sizes}
+
+
+def test_vendor_files_are_pinned_and_committed(app):
+    import hashlib
+    import re
+    from app import assets
+
+    for name, (url, sha256) in assets.VENDOR.items():
+        assert url.startswith("https://") and re.fullmatch(r"[0-9a-f]{64}", sha256 or ""), name
+        with open(os.path.join(app.static_folder, name), "rb") as f:
+            assert hashlib.sha256(f.read()).hexdigest() == sha256, name
+
+
+def test_static_assets_are_fingerprinted_and_precompressed(app, client, init_database, tmp_path, monkeypatch):
+    import gzip
+    import hashlib
+    import io
+    from flask import url_for
+    from app import assets
+
+    static = app.extensions["static_assets"]
+    static.build_dir = str(tmp_path / "dist")
+    # before a build: plain files, vendor scripts from static/vendor/
+    with app.test_request_context():
+        assert url_for("static", filename="style.css") == "/static/style.css"
+    jquery = "vendor/jquery-3.7.1.min.js"
+    served = client.get(f"/static/{jquery}")
+    assert served.status_code == 200 and hashlib.sha256(served.data).hexdigest() == assets.VENDOR[jquery][1]
+    # the pinned hash travels with the tag, so any other copy is rejected too
+    assert 'integrity="sha256-/JqT3SQfawRcv/BIHPThkBvs0OEvtFFmqPF/lYI/Cxo="' in client.get("/").data.decode()
+
+    # downloads are written only when they match their pinned sha256
+    class Download(io.BytesIO):
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+    vendor_dir = tmp_path / "static"
+    (vendor_dir / "vendor").mkdir(parents=True)
+    (vendor_dir / "vendor" / "tampered.js").write_bytes(b"changed after it was committed")
+    good = b"jQuery"
+    with monkeypatch.context() as m:
+        m.setattr(assets, "VENDOR", {
+            "vendor/good.js": ("https://cdn.example/good.js", hashlib.sha256(good).hexdigest()),
+            "vendor/tampered.js": ("https://cdn.example/tampered.js", hashlib.sha256(b"other").hexdigest()),
+        })
+        m.setattr(assets.urllib.request, "urlopen", lambda url, timeout: Download(good))
+        assert assets.fetch_vendor(str(vendor_dir)) == ["vendor/tampered.js"]
+        # a missing vendor file goes to its CDN in debug mode only
+        assert client.get("/static/vendor/tampered.js").status_code == 404
+        app.debug = True
+        fallback = client.get("/static/vendor/tampered.js")
+        app.debug = False
+        assert fallback.status_code == 302 and fallback.location == "https://cdn.example/tampered.js"
+    assert sorted(os.listdir(vendor_dir / "vendor")) == ["good.js"]
+
+    result = app.test_cli_runner().invoke(args=["build-assets", "--offline"])
+    assert result.exit_code == 0 and "Built" in result.output
+    with app.test_request_context():
+        url = url_for("static", filename="style.css")
+    assert url.startswith("/static/dist/style.") and url.endswith(".css") and url != "/static/dist/style.css"
+    home = client.get("/").data.decode()
+    assert url in home and "code.jquery.com" not in home
+
+    with open(os.path.join(app.static_folder, "style.css"), "rb") as f:
+        original = f.read()
+    plain = client.get(url)
+    assert plain.data == original and plain.content_encoding is None
+    assert plain.cache_control.immutable and plain.cache_control.max_age == assets.IMMUTABLE_MAX_AGE
+    assert "Accept-Encoding" in plain.vary
+    zipped = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert zipped.content_encoding == "gzip" and gzip.decompress(zipped.data) == original
+    if assets._brotli() is not None:
+        br = client.get(url, headers={"Accept-Encoding": "gzip, br"})
+        assert br.content_encoding == "br" and assets._brotli().decompress(br.data) == original
+        assert len(br.data) < len(zipped.data) < len(original) / 3
+
+    # unhashed paths keep working (pets still point at the placeholder)
+    assert client.get("/static/processing.svg").status_code == 200
+    assert client.get("/static/dist/style.0000.css").status_code == 404
+    app.debug = True
+    with app.test_request_context():
+        assert url_for("static", filename="style.css") == "/static/style.css"
+